@@ -1,3 +1,12 @@
-from .aimpact_super_agent import AImpactSuperAgent
+def __getattr__(name: str):
+    # The agent is built on first access, so importing the package stays cheap
+    if name == "AImpactSuperAgent":
+        from .aimpact_super_agent import AImpactSuperAgent
 
-root_agent = AImpactSuperAgent()
\ No newline at end of file
+        return AImpactSuperAgent
+    if name == "root_agent":
+        from .aimpact_super_agent import AImpactSuperAgent
+
+        agent = globals()["root_agent"] = AImpactSuperAgent()
+        return agent
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,260 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import weakref
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from agents.tools.cache import BaseCacheBackend, InMemoryCacheBackend
+
+logger = logging.getLogger("aimpact.orchestrator.gemini")
+
+# Standardized, non-deprecated default model
+DEFAULT_GEMINI_MODEL = "gemini-2.0-flash-001"
+
+
+class GeminiTransport(ABC):
+    """Abstract base class for what actually talks to a Gemini model."""
+
+    @abstractmethod
+    def generate(self, model: str, prompt: str, config: Dict[str, Any]) -> str:
+        """Blocking generation; returns the full text."""
+        pass
+
+    @abstractmethod
+    async def agenerate(self, model: str, prompt: str, config: Dict[str, Any]) -> str:
+        pass
+
+    @abstractmethod
+    def astream(self, model: str, prompt: str, config: Dict[str, Any]) -> AsyncIterator[str]:
+        """Yields the text in chunks as the model produces it."""
+        pass
+
+
+class GenerativeAITransport(GeminiTransport):
+    """
+    The google.generativeai SDK. It is imported, and configured with
+    GOOGLE_GENERATIVEAI_API_KEY (or `api_key`), on first use.
+    """
+
+    def __init__(self, api_key: Optional[str] = None):
+        self.api_key = api_key
+        self._lock = threading.Lock()
+        self._models: Dict[str, Any] = {}
+        self._genai = None
+
+    def _model(self, model: str):
+        with self._lock:
+            if self._genai is None:
+                import google.generativeai as genai
+
+                api_key = self.api_key or os.getenv("GOOGLE_GENERATIVEAI_API_KEY")
+                if not api_key:
+                    raise ValueError("GOOGLE_GENERATIVEAI_API_KEY not found in environment variables.")
+                genai.configure(api_key=api_key)
+                self._genai = genai
+            if model not in self._models:
+                self._models[model] = self._genai.GenerativeModel(model)
+            return self._models[model]
+
+    def generate(self, model: str, prompt: str, config: Dict[str, Any]) -> str:
+        return self._model(model).generate_content(prompt, generation_config=config or None).text
+
+    async def agenerate(self, model: str, prompt: str, config: Dict[str, Any]) -> str:
+        response = await self._model(model).generate_content_async(prompt, generation_config=config or None)
+        return response.text
+
+    async def astream(self, model: str, prompt: str, config: Dict[str, Any]) -> AsyncIterator[str]:
+        response = await self._model(model).generate_content_async(prompt, generation_config=config or None, stream=True)
+        async for chunk in response:
+            yield chunk.text
+
+
+class GeminiClient:
+    """
+    Text generation with a Gemini model, through a pluggable transport.
+
+    - `apredict` and `astream` run at most `max_concurrency` requests at once per event
+      loop; more wait their turn. `predict_many` runs a list of prompts that way.
+    - With `cache_ttl` set, answers to deterministic calls (temperature 0) are kept for
+      that many seconds, keyed on model, prompt and generation config. The default cache
+      is an in-process LRU of `cache_max_entries`. Identical deterministic prompts that
+      are in flight at the same time share one request.
+
+    Generation config (temperature, max_output_tokens, ...) is passed as keyword
+    arguments. Failed calls are logged and answered with an "Error: ..." string.
+    """
+
+    def __init__(
+        self,
+        model_name: str = None,
+        transport: Optional[GeminiTransport] = None,
+        max_concurrency: int = 8,
+        cache_ttl: Optional[float] = None,
+        cache_max_entries: int = 1000,
+        cache: Optional[BaseCacheBackend] = None,
+    ):
+        self.model_name = model_name or DEFAULT_GEMINI_MODEL
+        self.transport = transport or GenerativeAITransport()
+        self.max_concurrency = max_concurrency
+        self.cache_ttl = cache_ttl
+        self.cache = cache if cache is not None else (InMemoryCacheBackend(max_entries=cache_max_entries) if cache_ttl else None)
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+        self._inflight: Dict[str, "asyncio.Task[str]"] = {}
+        self.requests = 0
+        self.cache_hits = 0
+        self.shared = 0
+        self.errors = 0
+        self.active = 0
+        self.peak_active = 0
+
+    @classmethod
+    def from_env(cls, **kwargs) -> "GeminiClient":
+        cache_ttl = os.getenv("GEMINI_CACHE_TTL_SECONDS")
+        kwargs.setdefault("model_name", os.getenv("GEMINI_MODEL"))
+        kwargs.setdefault("max_concurrency", int(os.getenv("GEMINI_MAX_CONCURRENCY", 8)))
+        kwargs.setdefault("cache_ttl", float(cache_ttl) if cache_ttl else None)
+        kwargs.setdefault("cache_max_entries", int(os.getenv("GEMINI_CACHE_MAX_ENTRIES", 1000)))
+        return cls(**kwargs)
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(max(1, self.max_concurrency))
+        return semaphore
+
+    def _cache_key(self, prompt: str, config: Dict[str, Any]) -> Optional[str]:
+        if self.cache is None or not self.cache_ttl or config.get("temperature") != 0:
+            return None
+        canonical = json.dumps([self.model_name, prompt, config], sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def _cached(self, key: Optional[str]) -> Optional[str]:
+        if key is None:
+            return None
+        entry = self.cache.get(key)
+        if entry is None:
+            return None
+        text, stored_at = entry
+        if time.time() - stored_at > self.cache_ttl:
+            self.cache.delete(key)
+            return None
+        self.cache_hits += 1
+        return text
+
+    def _store(self, key: Optional[str], text: str) -> None:
+        if key is not None:
+            self.cache.set(key, "gemini", text, time.time())
+
+    def _failed(self, e: Exception) -> str:
+        self.errors += 1
+        logger.warning("Error during Gemini prediction: %s", e)
+        return f"Error: {e}"
+
+    def predict(self, prompt: str, **kwargs) -> str:
+        """Blocking form of `apredict`."""
+        key = self._cache_key(prompt, kwargs)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+        self.requests += 1
+        try:
+            text = self.transport.generate(self.model_name, prompt, kwargs)
+        except Exception as e:
+            return self._failed(e)
+        self._store(key, text)
+        return text
+
+    async def _generate(self, prompt: str, config: Dict[str, Any], key: Optional[str]) -> str:
+        async with self._semaphore():
+            self.requests += 1
+            self.active += 1
+            self.peak_active = max(self.peak_active, self.active)
+            try:
+                text = await self.transport.agenerate(self.model_name, prompt, config)
+            except Exception as e:
+                return self._failed(e)
+            finally:
+                self.active -= 1
+        self._store(key, text)
+        return text
+
+    def _forget(self, key: str, task: "asyncio.Task[str]") -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    async def apredict(self, prompt: str, **kwargs) -> str:
+        key = self._cache_key(prompt, kwargs)
+        if key is None:
+            return await self._generate(prompt, kwargs, None)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+        loop = asyncio.get_running_loop()
+        task = self._inflight.get(key)
+        if task is not None and task.get_loop() is loop:
+            self.shared += 1
+        else:
+            task = self._inflight[key] = loop.create_task(self._generate(prompt, kwargs, key))
+            task.add_done_callback(lambda done: self._forget(key, done))
+        # Shielded: a caller that gives up does not cancel the answer the others wait for
+        return await asyncio.shield(task)
+
+    async def astream(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        """
+        Yields the answer in chunks as they arrive. A cached answer is yielded whole, and
+        a deterministic answer streamed to the end is cached.
+        """
+        key = self._cache_key(prompt, kwargs)
+        cached = self._cached(key)
+        if cached is not None:
+            yield cached
+            return
+        chunks: List[str] = []
+        async with self._semaphore():
+            self.requests += 1
+            self.active += 1
+            self.peak_active = max(self.peak_active, self.active)
+            try:
+                async for chunk in self.transport.astream(self.model_name, prompt, kwargs):
+                    chunks.append(chunk)
+                    yield chunk
+            except Exception as e:
+                yield self._failed(e)
+                return
+            finally:
+                self.active -= 1
+        self._store(key, "".join(chunks))
+
+    async def predict_many(self, prompts: List[str], **kwargs) -> List[str]:
+        """Answers every prompt, `max_concurrency` at a time; results are in prompt order."""
+        return list(await asyncio.gather(*(self.apredict(prompt, **kwargs) for prompt in prompts)))
+
+    def metrics(self) -> dict:
+        return {
+            "model": self.model_name,
+            "requests": self.requests,
+            "cache_hits": self.cache_hits,
+            "shared_in_flight": self.shared,
+            "errors": self.errors,
+            "peak_concurrency": self.peak_active,
+            "cache": self.cache.stats() if self.cache is not None else None,
+        }
+
+
+_client: Optional[GeminiClient] = None
+_client_lock = threading.Lock()
+
+
+def get_gemini_client() -> GeminiClient:
+    """The shared Gemini client, created from the environment on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = GeminiClient.from_env()
+        return _client
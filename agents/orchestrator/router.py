@@ -0,0 +1,133 @@
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Iterable, Optional, Tuple
+
+from .instructions import GUIDELINES, ToolGuideline, build_instruction, estimate_tokens
+
+logger = logging.getLogger("aimpact.orchestrator.router")
+
+# Session state key holding the guideline names of the last routed turn
+STATE_KEY = "aimpact_routed_guidelines"
+
+
+@dataclass(frozen=True)
+class Route:
+    guidelines: Tuple[str, ...]
+    tools: FrozenSet[str]
+    # "matched", "previous" (nothing matched; the last turn's selection) or "all"
+    reason: str
+
+
+def user_text(ctx: Any) -> str:
+    """The text of the user message that started the invocation."""
+    content = getattr(ctx, "user_content", None)
+    if content is None or not content.parts:
+        return ""
+    return "\n".join(part.text for part in content.parts if getattr(part, "text", None))
+
+
+class IntentRouter:
+    """
+    Picks the tool guidelines and tools each model request needs, so the model is not
+    sent the schema and usage notes of every tool on every turn.
+
+    The routing is a plain heuristic: each guideline's trigger patterns are matched
+    against the user's message. A message that matches nothing (a follow-up such as
+    "yes, do that for Canada too") keeps the previous turn's selection, and with no
+    previous turn every guideline is sent.
+
+    Use `instruction` as the agent's instruction provider and `before_model` as its
+    before_model_callback. Tools that no guideline mentions are never filtered out, and
+    filtered tools stay callable; they are only left out of what the model is shown.
+    """
+
+    def __init__(self, guidelines: Optional[Dict[str, ToolGuideline]] = None):
+        self.guidelines = GUIDELINES if guidelines is None else guidelines
+        self.routed_tools = frozenset(tool for g in self.guidelines.values() for tool in g.tools)
+        self._instructions: Dict[Tuple[str, ...], str] = {}
+        self._lock = threading.Lock()
+        self.full_instruction_tokens = estimate_tokens(build_instruction(guidelines=self.guidelines))
+        self.requests = 0
+        self.reasons = {"matched": 0, "previous": 0, "all": 0}
+        self.instruction_tokens = 0
+        self.declared_tools = 0
+        self.last: Optional[dict] = None
+
+    def route(self, text: str, previous: Optional[Iterable[str]] = None) -> Route:
+        guidelines = self.guidelines.values()
+        selected = {g.name for g in guidelines if not g.requires_any and g.matches(text)}
+        selected |= {g.name for g in guidelines if g.requires_any and selected.intersection(g.requires_any) and g.matches(text)}
+        for name in list(selected):
+            selected.update(n for n in self.guidelines[name].includes if n in self.guidelines)
+        if selected:
+            reason = "matched"
+        else:
+            selected = {name for name in previous or () if name in self.guidelines}
+            reason = "previous" if selected else "all"
+            if not selected:
+                selected = set(self.guidelines)
+        names = tuple(name for name in self.guidelines if name in selected)
+        tools = frozenset(tool for name in names for tool in self.guidelines[name].tools)
+        return Route(names, tools, reason)
+
+    def route_for(self, ctx: Any) -> Route:
+        return self.route(user_text(ctx), ctx.state.get(STATE_KEY))
+
+    def build(self, names: Tuple[str, ...]) -> str:
+        instruction = self._instructions.get(names)
+        if instruction is None:
+            instruction = self._instructions[names] = build_instruction(names, self.guidelines)
+        return instruction
+
+    def instruction(self, ctx: Any) -> str:
+        """Instruction provider: the core instruction plus the routed guidelines."""
+        return self.build(self.route_for(ctx).guidelines)
+
+    def before_model(self, callback_context: Any, llm_request: Any) -> None:
+        """Leaves only the routed tools in the request and records its instruction size."""
+        route = self.route_for(callback_context)
+        declared = 0
+        kept_tools = []
+        for tool in llm_request.config.tools or []:
+            declarations = getattr(tool, "function_declarations", None)
+            if declarations:
+                tool.function_declarations = [
+                    d for d in declarations if d.name in route.tools or d.name not in self.routed_tools
+                ]
+                if not tool.function_declarations:
+                    continue
+                declared += len(tool.function_declarations)
+            kept_tools.append(tool)
+        if llm_request.config.tools is not None:
+            llm_request.config.tools = kept_tools
+        if list(route.guidelines) != callback_context.state.get(STATE_KEY):
+            callback_context.state[STATE_KEY] = list(route.guidelines)
+
+        tokens = estimate_tokens(llm_request.config.system_instruction or "")
+        with self._lock:
+            self.requests += 1
+            self.reasons[route.reason] += 1
+            self.instruction_tokens += tokens
+            self.declared_tools += declared
+            self.last = {"guidelines": list(route.guidelines), "reason": route.reason, "tools": declared, "instruction_tokens": tokens}
+        logger.info(
+            "Routed %s: %d guideline(s), %d tool(s), ~%d instruction tokens (all guidelines: ~%d).",
+            route.reason, len(route.guidelines), declared, tokens, self.full_instruction_tokens,
+        )
+        return None
+
+    def metrics(self) -> dict:
+        with self._lock:
+            requests = max(self.requests, 1)
+            return {
+                "requests": self.requests,
+                "reasons": dict(self.reasons),
+                "avg_instruction_tokens": self.instruction_tokens / requests,
+                "avg_declared_tools": self.declared_tools / requests,
+                "full_instruction_tokens": self.full_instruction_tokens,
+                "last": self.last,
+            }
+
+
+intent_router = IntentRouter()
@@ -1,12 +1,35 @@
+import asyncio
+import threading
+import time
 from abc import ABC, abstractmethod
-from typing import Any, Dict, Optional
+from typing import AbstractSet, Any, Dict, FrozenSet, Iterable, Optional, Tuple
+
+# Dirty state of a session that has nothing left to write
+_CLEAN = frozenset()
 
 class Session:
-    """Represents a user session."""
-    def __init__(self, session_id: str, metadata: Optional[Dict[str, Any]] = None):
+    """
+    Represents a user session.
+
+    `created_at` and `last_accessed_at` are Unix timestamps; session services use them
+    for expiry. Slots keep the per-session overhead small when millions are held.
+
+    The session tracks which metadata keys changed through `set` and `delete` since it
+    was last stored, so persistent services can write only those keys. A value changed
+    in place (a list appended to, say) or a `metadata` dict replaced wholesale is not
+    seen; call `mark_dirty` for it. A lock covers the tracking and the metadata changes
+    made through these methods, so a service may store the session from another thread.
+    """
+    __slots__ = ("session_id", "metadata", "created_at", "last_accessed_at", "_dirty", "_lock")
+
+    def __init__(self, session_id: str, metadata: Optional[Dict[str, Any]] = None, created_at: Optional[float] = None):
         self.session_id = session_id
         self.metadata = metadata if metadata is not None else {}
-        # You can add other common session attributes here, e.g., creation_time, last_accessed_time
+        self.created_at = created_at if created_at is not None else time.time()
+        self.last_accessed_at = self.created_at
+        # None: everything must be written, as for a session no service has stored yet
+        self._dirty: Optional[AbstractSet[str]] = None
+        self._lock = threading.Lock()
 
     def get(self, key: str, default: Optional[Any] = None) -> Optional[Any]:
         """Gets a value from session metadata."""
@@ -14,13 +37,64 @@ class Session:
 
     def set(self, key: str, value: Any) -> None:
         """Sets a value in session metadata."""
-        self.metadata[key] = value
+        with self._lock:
+            self.metadata[key] = value
+            self._mark(key)
+
+    def delete(self, key: str) -> None:
+        """Removes a key from session metadata, if present."""
+        with self._lock:
+            self.metadata.pop(key, None)
+            self._mark(key)
+
+    def _mark(self, key: Optional[str]) -> None:
+        if key is None:
+            self._dirty = None
+        elif self._dirty is _CLEAN:
+            self._dirty = {key}
+        elif self._dirty is not None:
+            self._dirty.add(key)
+
+    def mark_dirty(self, key: Optional[str] = None) -> None:
+        """Records that `key` changed, or with no key, that the whole session did."""
+        with self._lock:
+            self._mark(key)
+
+    def mark_clean(self) -> None:
+        """Records that the session as it is now has been stored."""
+        with self._lock:
+            self._dirty = _CLEAN
+
+    @property
+    def dirty_keys(self) -> Optional[FrozenSet[str]]:
+        """Keys changed since the session was last stored; None if it must be written whole."""
+        with self._lock:
+            return None if self._dirty is None else frozenset(self._dirty)
+
+    def take_changes(self) -> Tuple[Optional[AbstractSet[str]], Dict[str, Any]]:
+        """
+        Marks the session clean, for a service about to store it, and returns `dirty_keys`
+        with a copy of the current values of those keys (of every key if None). A changed
+        key missing from the copy was deleted.
+        """
+        with self._lock:
+            changes, self._dirty = self._dirty, _CLEAN
+            metadata = self.metadata
+            if changes is None:
+                return None, dict(metadata)
+            return changes, {key: metadata[key] for key in changes if key in metadata}
 
     def __str__(self) -> str:
         return f"Session(session_id='{self.session_id}', metadata={self.metadata})"
 
 class BaseSessionService(ABC):
-    """Abstract base class for session management services."""
+    """
+    Abstract base class for session management services.
+
+    Implementations provide the four single-session methods. The bulk methods default
+    to looping over them, and the async methods default to running the sync ones on a
+    worker thread; implementations override either when they can do better.
+    """
 
     @abstractmethod
     def get_session(self, session_id: str) -> Optional[Session]:
@@ -40,4 +114,44 @@ class BaseSessionService(ABC):
     @abstractmethod
     def delete_session(self, session_id: str) -> None:
         """Deletes a session by its ID."""
-        pass
\ No newline at end of file
+        pass
+
+    def get_many(self, session_ids: Iterable[str]) -> Dict[str, Session]:
+        """Retrieves several sessions; IDs that are not found are left out."""
+        found = {}
+        for session_id in session_ids:
+            session = self.get_session(session_id)
+            if session is not None:
+                found[session_id] = session
+        return found
+
+    def save_many(self, sessions: Iterable[Session]) -> None:
+        """Saves several sessions."""
+        for session in sessions:
+            self.save_session(session)
+
+    def delete_many(self, session_ids: Iterable[str]) -> None:
+        """Deletes several sessions by ID."""
+        for session_id in session_ids:
+            self.delete_session(session_id)
+
+    async def aget_session(self, session_id: str) -> Optional[Session]:
+        return await asyncio.to_thread(self.get_session, session_id)
+
+    async def acreate_session(self, session_id: Optional[str] = None, metadata: Optional[Dict[str, Any]] = None) -> Session:
+        return await asyncio.to_thread(self.create_session, session_id, metadata)
+
+    async def asave_session(self, session: Session) -> None:
+        await asyncio.to_thread(self.save_session, session)
+
+    async def adelete_session(self, session_id: str) -> None:
+        await asyncio.to_thread(self.delete_session, session_id)
+
+    async def aget_many(self, session_ids: Iterable[str]) -> Dict[str, Session]:
+        return await asyncio.to_thread(self.get_many, list(session_ids))
+
+    async def asave_many(self, sessions: Iterable[Session]) -> None:
+        await asyncio.to_thread(self.save_many, list(sessions))
+
+    async def adelete_many(self, session_ids: Iterable[str]) -> None:
+        await asyncio.to_thread(self.delete_many, list(session_ids))
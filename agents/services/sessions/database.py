@@ -1,36 +1,391 @@
-from typing import Dict, Optional, Any
+import atexit
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+import weakref
+from typing import Any, Dict, Iterable, List, Optional
 
 from .base import BaseSessionService, Session
 
+logger = logging.getLogger("aimpact.sessions.database")
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS sessions ("
+    " session_id TEXT PRIMARY KEY,"
+    " created_at REAL NOT NULL,"
+    " updated_at REAL NOT NULL,"
+    " expires_at REAL"
+    ") WITHOUT ROWID",
+    # Partial index: sessions without a TTL never show up in expiry sweeps
+    "CREATE INDEX IF NOT EXISTS sessions_expires_at ON sessions (expires_at) WHERE expires_at IS NOT NULL",
+    # A rowid table, since values can be far larger than a WITHOUT ROWID row should be
+    "CREATE TABLE IF NOT EXISTS session_values ("
+    " session_id TEXT NOT NULL,"
+    " key TEXT NOT NULL,"
+    " value TEXT NOT NULL,"
+    " PRIMARY KEY (session_id, key)"
+    ")",
+)
+
+# Constant statement text, so each connection's statement cache reuses the prepared form.
+# Values are read in rowid order, which keeps metadata keys in the order they were added.
+_SELECT = (
+    "SELECT s.created_at, v.key, v.value FROM sessions AS s"
+    " LEFT JOIN session_values AS v ON v.session_id = s.session_id"
+    " WHERE s.session_id = ? AND (s.expires_at IS NULL OR s.expires_at > ?) ORDER BY v.rowid"
+)
+_INSERT_IF_ABSENT = (
+    "INSERT INTO sessions (session_id, created_at, updated_at, expires_at) VALUES (?, ?, ?, ?)"
+    " ON CONFLICT (session_id) DO UPDATE SET"
+    " created_at = excluded.created_at, updated_at = excluded.updated_at, expires_at = excluded.expires_at"
+    " WHERE sessions.expires_at IS NOT NULL AND sessions.expires_at <= excluded.updated_at"
+)
+_UPSERT = (
+    "INSERT INTO sessions (session_id, created_at, updated_at, expires_at) VALUES (?, ?, ?, ?)"
+    " ON CONFLICT (session_id) DO UPDATE SET updated_at = excluded.updated_at, expires_at = excluded.expires_at"
+)
+# Refreshes a live session before a delta is written; no row means the delta has no base
+_TOUCH = (
+    "UPDATE sessions SET updated_at = ?, expires_at = ?"
+    " WHERE session_id = ? AND (expires_at IS NULL OR expires_at > ?)"
+)
+_SET_VALUE = (
+    "INSERT INTO session_values (session_id, key, value) VALUES (?, ?, ?)"
+    " ON CONFLICT (session_id, key) DO UPDATE SET value = excluded.value"
+)
+_DELETE_VALUE = "DELETE FROM session_values WHERE session_id = ? AND key = ?"
+_DELETE_VALUES = "DELETE FROM session_values WHERE session_id = ?"
+_DELETE = "DELETE FROM sessions WHERE session_id = ?"
+_SWEEP_VALUES = (
+    "DELETE FROM session_values WHERE session_id IN"
+    " (SELECT session_id FROM sessions WHERE expires_at IS NOT NULL AND expires_at <= ?)"
+)
+_SWEEP = "DELETE FROM sessions WHERE expires_at IS NOT NULL AND expires_at <= ?"
+# IDs per `get_many` query, under SQLite's default limit of 999 bound parameters
+_BATCH = 500
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def _flush_periodically(service_ref: "weakref.ref[DatabaseSessionService]", interval: float, stop: threading.Event) -> None:
+    while not stop.wait(interval):
+        service = service_ref()
+        if service is None:
+            return
+        try:
+            service.flush()
+        except Exception:
+            logger.exception("Write-behind flush failed; the sessions stay queued for the next one.")
+        del service
+
+
+def _flush_at_exit(service_ref: "weakref.ref[DatabaseSessionService]") -> None:
+    service = service_ref()
+    if service is not None:
+        service.flush()
+
+
 class DatabaseSessionService(BaseSessionService):
-    """A database-backed session service implementation (e.g., Redis, PostgreSQL)."""
+    """
+    A session service backed by a SQLite file, shared by every thread and worker process
+    that opens the same path.
+
+    `connection_details` keys:
+        path: the database file (default "sessions.sqlite3").
+        ttl_seconds: how long a session lives after its last save; None keeps it forever.
+        busy_timeout_ms: how long a writer waits for another process's lock (default 5000).
+        synchronous: SQLite's synchronous pragma (default "NORMAL", durable with WAL
+            except for the last commits on power loss).
+        write_behind_seconds: when set, saves are queued and written together by a
+            background thread at this interval (see below). Off by default.
+
+    Each thread gets its own connection in WAL mode, so readers never block the writer.
+    Each metadata key is a row of compact JSON; values that are not JSON types are stored
+    as their string form. Saving a session this service returned writes only the keys
+    its `Session.dirty_keys` names; any other session is written in full.
+
+    In write-behind mode, a saved session is held in memory until the next flush, and
+    `get_session` returns that same object meanwhile, so a session saved on every turn
+    costs one write per interval. The queue is flushed by `flush()`, by `close()`, and
+    when the interpreter exits normally; sessions saved less than an interval before a
+    crash are lost.
+
+    `get_many` reads up to 500 IDs per query and `save_many` and `delete_many` write a
+    whole batch in one transaction; the async methods run on a worker thread, since
+    sqlite3 calls block.
+    """
 
     def __init__(self, connection_details: Dict[str, Any]):
         self.connection_details = connection_details
-        # Initialize database connection here
-        print(f"DatabaseSessionService initialized with {connection_details}") # Placeholder
+        self.path = connection_details.get("path", "sessions.sqlite3")
+        self.ttl_seconds: Optional[float] = connection_details.get("ttl_seconds")
+        self.busy_timeout_ms = int(connection_details.get("busy_timeout_ms", 5000))
+        self.synchronous = str(connection_details.get("synchronous", "NORMAL"))
+        self.write_behind_seconds = float(connection_details.get("write_behind_seconds") or 0)
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self._pending: Dict[str, Session] = {}
+        # Taken from the queue by the flush in progress; still read until it commits
+        self._flushing: Dict[str, Session] = {}
+        self._pending_lock = threading.Lock()
+        # Held for a whole flush, so a delete or an exit-time flush waits for one in progress
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        self._stats_lock = threading.Lock()
+        self._stats = {"full_writes": 0, "delta_writes": 0, "values_written": 0, "bytes_serialized": 0, "flushes": 0, "coalesced": 0}
+        with self._connection() as conn:
+            for statement in _SCHEMA:
+                conn.execute(statement)
+        if self.write_behind_seconds > 0:
+            atexit.register(_flush_at_exit, weakref.ref(self))
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000, check_same_thread=False, cached_statements=64)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA synchronous={self.synchronous}")
+            conn.execute(f"PRAGMA busy_timeout={self.busy_timeout_ms}")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def _expires_at(self, now: float) -> Optional[float]:
+        return now + self.ttl_seconds if self.ttl_seconds else None
+
+    def _queued(self, session_id: str) -> Optional[Session]:
+        if not self.write_behind_seconds:
+            return None
+        with self._pending_lock:
+            queued = self._pending.get(session_id)
+            return queued if queued is not None else self._flushing.get(session_id)
+
+    def _write(self, conn: sqlite3.Connection, session: Session, now: float, expires_at: Optional[float]) -> tuple:
+        """Writes one session inside the caller's transaction; returns (full, values, bytes)."""
+        session_id = session.session_id
+        # A copy taken under the session's lock; the live metadata may change meanwhile
+        changes, values = session.take_changes()
+        if changes is not None and conn.execute(_TOUCH, (now, expires_at, session_id, now)).rowcount:
+            removed = [(session_id, key) for key in changes if key not in values]
+            if removed:
+                conn.executemany(_DELETE_VALUE, removed)
+            full = False
+        else:
+            if changes is not None:
+                # The stored row expired or was deleted, so the delta is not enough
+                session.mark_dirty()
+                changes, values = session.take_changes()
+            conn.execute(_UPSERT, (session_id, session.created_at, now, expires_at))
+            conn.execute(_DELETE_VALUES, (session_id,))
+            full = True
+        rows = [(session_id, key, _dumps(value)) for key, value in values.items()]
+        conn.executemany(_SET_VALUE, rows)
+        return full, len(rows), sum(len(row[2].encode("utf-8")) for row in rows)
+
+    def _write_all(self, sessions: List[Session]) -> None:
+        if not sessions:
+            return
+        now = time.time()
+        expires_at = self._expires_at(now)
+        results = []
+        try:
+            with self._connection() as conn:
+                for session in sessions:
+                    results.append(self._write(conn, session, now, expires_at))
+        except Exception:
+            # The transaction was rolled back, but the changes were already taken from
+            # the sessions; writing them in full next time is always correct
+            for session in sessions:
+                session.mark_dirty()
+            raise
+        with self._stats_lock:
+            for full, values, size in results:
+                self._stats["full_writes" if full else "delta_writes"] += 1
+                self._stats["values_written"] += values
+                self._stats["bytes_serialized"] += size
+
+    def _ensure_flusher(self) -> None:
+        if self._flusher is not None:
+            return
+        with self._pending_lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(
+                    target=_flush_periodically,
+                    args=(weakref.ref(self), self.write_behind_seconds, self._stop),
+                    name="session-write-behind",
+                    daemon=True,
+                )
+                self._flusher.start()
+
+    def _enqueue(self, sessions: Iterable[Session]) -> None:
+        coalesced = 0
+        with self._pending_lock:
+            for session in sessions:
+                queued = self._pending.get(session.session_id)
+                if queued is session:
+                    coalesced += 1
+                    continue
+                if queued is not None:
+                    # A different object replaces the queued one; only a full write is safe
+                    session.mark_dirty()
+                self._pending[session.session_id] = session
+        if coalesced:
+            with self._stats_lock:
+                self._stats["coalesced"] += coalesced
+        self._ensure_flusher()
+
+    def _session(self, session_id: str, created_at: float, values: Dict[str, str]) -> Session:
+        session = Session(session_id, {key: json.loads(value) for key, value in values.items()}, created_at=created_at)
+        session.mark_clean()
+        return session
 
     def get_session(self, session_id: str) -> Optional[Session]:
-        # Implement database lookup logic here
-        print(f"Attempting to get session {session_id} from database") # Placeholder
-        return None # Placeholder
+        queued = self._queued(session_id)
+        if queued is not None:
+            return queued
+        rows = self._connection().execute(_SELECT, (session_id, time.time())).fetchall()
+        if not rows:
+            return None
+        return self._session(session_id, rows[0][0], {key: value for _, key, value in rows if key is not None})
 
     def create_session(self, session_id: Optional[str] = None, metadata: Optional[Dict[str, Any]] = None) -> Session:
-        # Implement database creation logic here
-        import uuid
         if session_id is None:
             session_id = str(uuid.uuid4())
+        queued = self._queued(session_id)
+        if queued is not None:
+            return queued
         session = Session(session_id, metadata)
-        print(f"Attempting to create session {session} in database") # Placeholder
-        # Save to database
-        return session # Placeholder
+        now = session.created_at
+        rows = [(session_id, key, _dumps(value)) for key, value in session.metadata.items()]
+        with self._connection() as conn:
+            created = conn.execute(_INSERT_IF_ABSENT, (session_id, now, now, self._expires_at(now))).rowcount
+            if created:
+                # Values left by an expired session of the same ID
+                conn.execute(_DELETE_VALUES, (session_id,))
+                conn.executemany(_SET_VALUE, rows)
+        if not created:
+            # Like the in-memory service, an existing session is returned as it is
+            existing = self.get_session(session_id)
+            if existing is not None:
+                return existing
+        session.mark_clean()
+        return session
 
     def save_session(self, session: Session) -> None:
-        # Implement database save/update logic here
-        print(f"Attempting to save session {session} to database") # Placeholder
-        pass # Placeholder
+        if self.write_behind_seconds:
+            self._enqueue((session,))
+        else:
+            self._write_all([session])
 
     def delete_session(self, session_id: str) -> None:
-        # Implement database deletion logic here
-        print(f"Attempting to delete session {session_id} from database") # Placeholder
-        pass # Placeholder
\ No newline at end of file
+        self.delete_many((session_id,))
+
+    def get_many(self, session_ids: Iterable[str]) -> Dict[str, Session]:
+        ids = list(dict.fromkeys(session_ids))
+        found = {}
+        if self.write_behind_seconds:
+            with self._pending_lock:
+                found = {
+                    session_id: self._pending.get(session_id) or self._flushing[session_id]
+                    for session_id in ids
+                    if session_id in self._pending or session_id in self._flushing
+                }
+            ids = [session_id for session_id in ids if session_id not in found]
+        conn = self._connection()
+        now = time.time()
+        for start in range(0, len(ids), _BATCH):
+            chunk = ids[start:start + _BATCH]
+            rows = conn.execute(
+                "SELECT s.session_id, s.created_at, v.key, v.value FROM sessions AS s"
+                " LEFT JOIN session_values AS v ON v.session_id = s.session_id"
+                f" WHERE s.session_id IN ({','.join('?' * len(chunk))}) AND (s.expires_at IS NULL OR s.expires_at > ?)"
+                " ORDER BY v.rowid",
+                (*chunk, now),
+            )
+            sessions: Dict[str, tuple] = {}
+            for session_id, created_at, key, value in rows:
+                values = sessions.setdefault(session_id, (created_at, {}))[1]
+                if key is not None:
+                    values[key] = value
+            for session_id, (created_at, values) in sessions.items():
+                found[session_id] = self._session(session_id, created_at, values)
+        return found
+
+    def save_many(self, sessions: Iterable[Session]) -> None:
+        # One transaction, so the batch costs a single commit
+        if self.write_behind_seconds:
+            self._enqueue(sessions)
+        else:
+            self._write_all(list(sessions))
+
+    def delete_many(self, session_ids: Iterable[str]) -> None:
+        rows = [(session_id,) for session_id in session_ids]
+        # Waiting out a flush in progress keeps it from writing a deleted session back
+        with self._flush_lock:
+            with self._pending_lock:
+                for (session_id,) in rows:
+                    self._pending.pop(session_id, None)
+            with self._connection() as conn:
+                conn.executemany(_DELETE_VALUES, rows)
+                conn.executemany(_DELETE, rows)
+
+    def flush(self) -> int:
+        """Writes every queued session in one transaction; returns how many."""
+        with self._flush_lock:
+            with self._pending_lock:
+                pending, self._pending = self._pending, {}
+                self._flushing = pending
+            if not pending:
+                return 0
+            try:
+                self._write_all(list(pending.values()))
+            except Exception:
+                with self._pending_lock:
+                    for session_id, session in pending.items():
+                        self._pending.setdefault(session_id, session)
+                    self._flushing = {}
+                raise
+            # Only now is the committed row as new as the queued object
+            with self._pending_lock:
+                self._flushing = {}
+            with self._stats_lock:
+                self._stats["flushes"] += 1
+            return len(pending)
+
+    def sweep_expired(self) -> int:
+        """Deletes expired sessions; returns how many. Uses the expires_at index."""
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute(_SWEEP_VALUES, (now,))
+            return conn.execute(_SWEEP, (now,)).rowcount
+
+    def count(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def metrics(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        with self._pending_lock:
+            stats["pending"] = len(self._pending)
+        return stats
+
+    def close(self) -> None:
+        """
+        Flushes queued sessions and closes every thread's connection. The service must
+        not be used afterwards.
+        """
+        self._stop.set()
+        self.flush()
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
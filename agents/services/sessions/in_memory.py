@@ -1,39 +1,354 @@
+import collections
+import json
+import threading
+import time
 import uuid
-from typing import Dict, Optional, Any
+import weakref
+from typing import Any, Callable, Dict, Iterable, List, Optional
 
 from .base import BaseSessionService, Session
 
+# Expired sessions removed per write, so cleanup cost stays constant per operation
+_LAZY_SWEEP_LIMIT = 2
+# The background sweeper releases a shard's lock after this many removals
+_SWEEP_CHUNK = 1000
+
+
+def _metadata_bytes(metadata: Dict[str, Any]) -> int:
+    return len(json.dumps(metadata, separators=(",", ":"), ensure_ascii=False, default=str))
+
+
+def _sweep_periodically(service_ref: "weakref.ref[InMemorySessionService]", interval: float, stop: threading.Event) -> None:
+    # Holds only a weak reference, so an abandoned service is still garbage collected
+    while not stop.wait(interval):
+        service = service_ref()
+        if service is None:
+            return
+        service.sweep_expired()
+        del service
+
+
+class _Shard:
+    """
+    One lock-striped partition of the sessions. Every method expects the caller to hold
+    `lock`.
+    """
+
+    def __init__(self, idle_ttl: Optional[float], absolute_ttl: Optional[float], max_entries: Optional[int], max_bytes: Optional[int]):
+        self.idle_ttl = idle_ttl
+        self.absolute_ttl = absolute_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.sessions: "collections.OrderedDict[str, Session]" = collections.OrderedDict()
+        # Sessions in created_at order, which sweep_front relies on to stop at the first live one
+        self.created: "collections.OrderedDict[str, float]" = collections.OrderedDict()
+        self.sizes: Dict[str, int] = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = {"idle_ttl": 0, "absolute_ttl": 0, "max_entries": 0, "max_bytes": 0}
+
+    def expired(self, session: Session, now: float) -> Optional[str]:
+        if self.idle_ttl is not None and session.last_accessed_at + self.idle_ttl <= now:
+            return "idle_ttl"
+        if self.absolute_ttl is not None and session.created_at + self.absolute_ttl <= now:
+            return "absolute_ttl"
+        return None
+
+    def remove(self, session_id: str, reason: Optional[str] = None) -> None:
+        del self.sessions[session_id]
+        self.created.pop(session_id, None)
+        self.bytes -= self.sizes.pop(session_id, 0)
+        if reason is not None:
+            self.evictions[reason] += 1
+
+    def add_created(self, session_id: str, created_at: float) -> None:
+        """
+        Queues a session by creation time. A session stored again after it was replaced or
+        evicted is older than the back of the queue, so the newer ones are moved behind it.
+        """
+        newer = []
+        for other_id in reversed(self.created):
+            if self.created[other_id] <= created_at:
+                break
+            newer.append(other_id)
+        self.created[session_id] = created_at
+        for other_id in reversed(newer):
+            self.created.move_to_end(other_id)
+
+    def sweep_front(self, now: float, limit: Optional[int]) -> int:
+        """Removes expired sessions from the front of the LRU and creation queues."""
+        removed = 0
+        while self.sessions and (limit is None or removed < limit):
+            session_id, session = next(iter(self.sessions.items()))
+            if self.idle_ttl is None or session.last_accessed_at + self.idle_ttl > now:
+                break
+            self.remove(session_id, "idle_ttl")
+            removed += 1
+        while self.created and (limit is None or removed < limit):
+            session_id, created_at = next(iter(self.created.items()))
+            if created_at + self.absolute_ttl > now:
+                break
+            self.remove(session_id, "absolute_ttl")
+            removed += 1
+        return removed
+
+    def lookup(self, session_id: str, now: float) -> Optional[Session]:
+        session = self.sessions.get(session_id)
+        if session is None:
+            self.misses += 1
+            return None
+        reason = self.expired(session, now)
+        if reason is not None:
+            self.remove(session_id, reason)
+            self.misses += 1
+            return None
+        self.sessions.move_to_end(session_id)
+        session.last_accessed_at = now
+        self.hits += 1
+        return session
+
+    def store(self, session: Session, now: float) -> None:
+        session_id = session.session_id
+        current = self.sessions.get(session_id)
+        if current is not None and current is not session:
+            self.remove(session_id)
+        if (
+            session_id not in self.sessions
+            and self.absolute_ttl is not None
+            and session.created_at + self.absolute_ttl <= now
+        ):
+            # Stored again after its lifetime ran out; a lookup would only drop it
+            self.evictions["absolute_ttl"] += 1
+            self.sweep_front(now, _LAZY_SWEEP_LIMIT)
+            return
+        session.last_accessed_at = now
+        if session_id in self.sessions:
+            self.sessions.move_to_end(session_id)
+        elif self.absolute_ttl is not None:
+            self.add_created(session_id, session.created_at)
+        self.sessions[session_id] = session
+        if self.max_bytes is not None:
+            size = _metadata_bytes(session.metadata)
+            self.bytes += size - self.sizes.get(session_id, 0)
+            self.sizes[session_id] = size
+        self.sweep_front(now, _LAZY_SWEEP_LIMIT)
+        if self.max_entries is not None:
+            while len(self.sessions) > self.max_entries:
+                self.remove(next(iter(self.sessions)), "max_entries")
+        if self.max_bytes is not None:
+            # The session just stored is kept even if it alone is over the limit
+            while self.bytes > self.max_bytes and len(self.sessions) > 1:
+                self.remove(next(iter(self.sessions)), "max_bytes")
+
+
 class InMemorySessionService(BaseSessionService):
-    """An in-memory session service implementation."""
+    """
+    An in-memory session service implementation.
+
+    Optional limits, all off by default:
+        idle_ttl: seconds since a session was last read or saved before it expires.
+        absolute_ttl: seconds since a session was created before it expires.
+        max_entries: the least recently used sessions are evicted beyond this count.
+        max_bytes: the same, for the total size of session metadata as compact JSON.
+            Sizes are measured on create and save.
+
+    Sessions are spread over `shards` partitions by ID, each with its own lock, so
+    threads working on different sessions rarely wait for each other. Without size limits
+    the default is 16 shards. With `max_entries` or `max_bytes` set it is one shard, so
+    the limits hold for the whole service and eviction is an exact LRU; passing more
+    shards splits each limit evenly between them, with eviction least recently used
+    within a shard.
+
+    Within a shard, sessions are kept in least-recently-used order, and in creation
+    order when `absolute_ttl` is set, so every limit is enforced from the front of a
+    queue in constant time. Expired sessions are dropped when they are looked up, a
+    couple more on each write, and all of them every `sweep_interval` seconds by a
+    daemon thread.
+    """
 
-    def __init__(self):
-        self._sessions: Dict[str, Session] = {}
+    def __init__(
+        self,
+        idle_ttl: Optional[float] = None,
+        absolute_ttl: Optional[float] = None,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        sweep_interval: float = 60.0,
+        shards: Optional[int] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.idle_ttl = idle_ttl
+        self.absolute_ttl = absolute_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self._clock = clock
+        if shards is None:
+            shards = 16 if max_entries is None and max_bytes is None else 1
+        count = max(1, shards)
+        self._shards = [
+            _Shard(
+                idle_ttl,
+                absolute_ttl,
+                -(-max_entries // count) if max_entries is not None else None,
+                -(-max_bytes // count) if max_bytes is not None else None,
+            )
+            for _ in range(count)
+        ]
+        self._stop = threading.Event()
+        self._sweeper: Optional[threading.Thread] = None
+        self._sweeper_lock = threading.Lock()
+        self.sweeps = 0
+
+    def _shard(self, session_id: str) -> _Shard:
+        return self._shards[hash(session_id) % len(self._shards)]
+
+    def _group(self, session_ids: Iterable[str]) -> Dict[int, List[str]]:
+        groups: Dict[int, List[str]] = {}
+        for session_id in session_ids:
+            groups.setdefault(hash(session_id) % len(self._shards), []).append(session_id)
+        return groups
+
+    def _ensure_sweeper(self) -> None:
+        if self._sweeper is not None or self.sweep_interval <= 0 or (self.idle_ttl is None and self.absolute_ttl is None):
+            return
+        with self._sweeper_lock:
+            if self._sweeper is None:
+                self._sweeper = threading.Thread(
+                    target=_sweep_periodically,
+                    args=(weakref.ref(self), self.sweep_interval, self._stop),
+                    name="session-sweeper",
+                    daemon=True,
+                )
+                self._sweeper.start()
 
     def get_session(self, session_id: str) -> Optional[Session]:
-        return self._sessions.get(session_id)
+        shard = self._shard(session_id)
+        with shard.lock:
+            return shard.lookup(session_id, self._clock())
 
     def create_session(self, session_id: Optional[str] = None, metadata: Optional[Dict[str, Any]] = None) -> Session:
         if session_id is None:
             session_id = str(uuid.uuid4())
-        
-        if session_id in self._sessions:
-            # Or raise an error, or return existing session, depending on desired behavior
-            return self._sessions[session_id] 
-            
-        session = Session(session_id, metadata)
-        self._sessions[session_id] = session
+        shard = self._shard(session_id)
+        with shard.lock:
+            # Checked and inserted under one lock, so concurrent creates of the same ID
+            # all get the same session. An existing session is returned as it is,
+            # unless it has expired.
+            now = self._clock()
+            session = shard.lookup(session_id, now)
+            if session is None:
+                session = Session(session_id, metadata, created_at=now)
+                shard.store(session, now)
+        self._ensure_sweeper()
         return session
 
     def save_session(self, session: Session) -> None:
-        # In-memory save is implicit when attributes of the session object are modified,
-        # but this method is here to conform to the interface and for potential future logic.
-        if session.session_id not in self._sessions:
-            # Optionally, handle cases where a session is saved without being formally created
-            # For now, we'll just add it.
-            self._sessions[session.session_id] = session
-        # If it exists, it's already the same object in memory, so changes are reflected.
-        return
+        # The session object is shared, so changes to it are already visible; saving
+        # refreshes its position and size, or adds a session that was never created here
+        shard = self._shard(session.session_id)
+        with shard.lock:
+            shard.store(session, self._clock())
+        self._ensure_sweeper()
 
     def delete_session(self, session_id: str) -> None:
-        if session_id in self._sessions:
-            del self._sessions[session_id]
\ No newline at end of file
+        shard = self._shard(session_id)
+        with shard.lock:
+            if session_id in shard.sessions:
+                shard.remove(session_id)
+
+    def get_many(self, session_ids: Iterable[str]) -> Dict[str, Session]:
+        found = {}
+        for index, ids in self._group(session_ids).items():
+            shard = self._shards[index]
+            with shard.lock:
+                now = self._clock()
+                for session_id in ids:
+                    session = shard.lookup(session_id, now)
+                    if session is not None:
+                        found[session_id] = session
+        return found
+
+    def save_many(self, sessions: Iterable[Session]) -> None:
+        by_id = {session.session_id: session for session in sessions}
+        for index, ids in self._group(by_id).items():
+            shard = self._shards[index]
+            with shard.lock:
+                now = self._clock()
+                for session_id in ids:
+                    shard.store(by_id[session_id], now)
+        self._ensure_sweeper()
+
+    def delete_many(self, session_ids: Iterable[str]) -> None:
+        for index, ids in self._group(session_ids).items():
+            shard = self._shards[index]
+            with shard.lock:
+                for session_id in ids:
+                    if session_id in shard.sessions:
+                        shard.remove(session_id)
+
+    # Every operation only holds a shard lock for microseconds, so the async forms run
+    # inline instead of hopping to a worker thread
+
+    async def aget_session(self, session_id: str) -> Optional[Session]:
+        return self.get_session(session_id)
+
+    async def acreate_session(self, session_id: Optional[str] = None, metadata: Optional[Dict[str, Any]] = None) -> Session:
+        return self.create_session(session_id, metadata)
+
+    async def asave_session(self, session: Session) -> None:
+        self.save_session(session)
+
+    async def adelete_session(self, session_id: str) -> None:
+        self.delete_session(session_id)
+
+    async def aget_many(self, session_ids: Iterable[str]) -> Dict[str, Session]:
+        return self.get_many(session_ids)
+
+    async def asave_many(self, sessions: Iterable[Session]) -> None:
+        self.save_many(sessions)
+
+    async def adelete_many(self, session_ids: Iterable[str]) -> None:
+        self.delete_many(session_ids)
+
+    def sweep_expired(self) -> int:
+        """Removes every expired session; returns how many."""
+        removed = 0
+        for shard in self._shards:
+            while True:
+                with shard.lock:
+                    swept = shard.sweep_front(self._clock(), _SWEEP_CHUNK)
+                removed += swept
+                if swept < _SWEEP_CHUNK:
+                    break
+        self.sweeps += 1
+        return removed
+
+    def close(self) -> None:
+        """Stops the background sweeper."""
+        self._stop.set()
+
+    def __len__(self) -> int:
+        return sum(len(shard.sessions) for shard in self._shards)
+
+    def metrics(self) -> dict:
+        evictions = {reason: 0 for reason in self._shards[0].evictions}
+        hits = misses = size = count = 0
+        for shard in self._shards:
+            with shard.lock:
+                hits += shard.hits
+                misses += shard.misses
+                size += shard.bytes
+                count += len(shard.sessions)
+                for reason, n in shard.evictions.items():
+                    evictions[reason] += n
+        return {
+            "sessions": count,
+            "shards": len(self._shards),
+            "bytes": size if self.max_bytes is not None else None,
+            "hits": hits,
+            "misses": misses,
+            "sweeps": self.sweeps,
+            "evictions": evictions,
+        }
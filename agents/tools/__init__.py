@@ -1,5 +1,18 @@
-from .seo_keyword_generator import seo_keyword_generator_tool
+from .registry import AGENT_TOOLS, TOOL_MODULES, load_tools, resolve
 
 __all__ = [
-    "seo_keyword_generator_tool"
-]
\ No newline at end of file
+    "AGENT_TOOLS",
+    "load_tools",
+    *TOOL_MODULES,
+]
+
+
+def __getattr__(name: str):
+    # Tools are imported on first access; see registry.TOOL_MODULES
+    value = resolve(name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(TOOL_MODULES))
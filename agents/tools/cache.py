@@ -0,0 +1,355 @@
+import asyncio
+import collections
+import concurrent.futures
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Optional, Tuple, Type
+
+from pydantic import BaseModel
+
+from .offload import run_in_background
+
+logger = logging.getLogger("aimpact.tools.cache")
+
+
+def normalize(value: Any) -> Any:
+    """Canonical form of tool inputs: case- and whitespace-insensitive strings, sorted keys."""
+    if isinstance(value, BaseModel):
+        value = value.model_dump()
+    if isinstance(value, str):
+        return " ".join(value.split()).casefold()
+    if isinstance(value, dict):
+        return {str(k): normalize(v) for k, v in sorted(value.items())}
+    if isinstance(value, (list, tuple)):
+        return [normalize(v) for v in value]
+    return value
+
+
+def cache_key(tool_name: str, inputs: Any) -> str:
+    canonical = json.dumps(normalize(inputs), sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(f"{tool_name}:{canonical}".encode("utf-8")).hexdigest()
+
+
+class BaseCacheBackend(ABC):
+    """Abstract base class for where cached tool results live. Values are JSON strings."""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        """Returns (value, stored_at) or None."""
+        pass
+
+    @abstractmethod
+    def set(self, key: str, tool_name: str, value: str, stored_at: float) -> None:
+        pass
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        pass
+
+    @abstractmethod
+    def clear(self, tool_name: Optional[str] = None) -> None:
+        pass
+
+    def stats(self) -> dict:
+        return {}
+
+
+class InMemoryCacheBackend(BaseCacheBackend):
+    """Process-local LRU bounded by entry count and total value size."""
+
+    def __init__(self, max_entries: int = 1000, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "collections.OrderedDict[str, Tuple[str, str, float]]" = collections.OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1], entry[2]
+
+    def set(self, key: str, tool_name: str, value: str, stored_at: float) -> None:
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[1])
+            self._entries[key] = (tool_name, value, stored_at)
+            self._bytes += len(value)
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, (_, dropped, _) = self._entries.popitem(last=False)
+                self._bytes -= len(dropped)
+                self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[1])
+
+    def clear(self, tool_name: Optional[str] = None) -> None:
+        with self._lock:
+            for key in [k for k, e in self._entries.items() if tool_name is None or e[0] == tool_name]:
+                self._bytes -= len(self._entries.pop(key)[1])
+
+    def stats(self) -> dict:
+        return {"backend": "memory", "entries": len(self._entries), "bytes": self._bytes, "evictions": self.evictions}
+
+
+class SQLiteCacheBackend(BaseCacheBackend):
+    """
+    On-disk cache in a local SQLite file, shared by every process on the machine and kept
+    across restarts. Least recently read entries are evicted past `max_entries`.
+    """
+
+    def __init__(self, path: str = ".tool_cache.sqlite3", max_entries: int = 10000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tool_cache ("
+            " key TEXT PRIMARY KEY, tool TEXT NOT NULL, value TEXT NOT NULL,"
+            " stored_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tool_cache_accessed ON tool_cache (accessed_at)")
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            row = self._conn.execute("SELECT value, stored_at FROM tool_cache WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self._conn.execute("UPDATE tool_cache SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            return row
+
+    def set(self, key: str, tool_name: str, value: str, stored_at: float) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO tool_cache (key, tool, value, stored_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, tool_name, value, stored_at, time.time()),
+            )
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM tool_cache").fetchone()
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM tool_cache WHERE key IN (SELECT key FROM tool_cache ORDER BY accessed_at LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+                self.evictions += count - self.max_entries
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM tool_cache WHERE key = ?", (key,))
+
+    def clear(self, tool_name: Optional[str] = None) -> None:
+        with self._lock:
+            if tool_name is None:
+                self._conn.execute("DELETE FROM tool_cache")
+            else:
+                self._conn.execute("DELETE FROM tool_cache WHERE tool = ?", (tool_name,))
+
+    def stats(self) -> dict:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM tool_cache").fetchone()
+        return {"backend": "sqlite", "path": self.path, "entries": count, "evictions": self.evictions}
+
+
+def never_cache(func: Callable) -> Callable:
+    """Marks a side-effecting tool; `ToolCache.cached` refuses to wrap it."""
+    func._never_cache = True
+    return func
+
+
+class ToolCache:
+    """
+    Caches the results of deterministic tool calls, keyed on their normalized inputs.
+
+    Within `ttl` a cached result is returned as is. Between `ttl` and `ttl + stale_ttl` it
+    is still returned at once, and the tool is re-run in the background to refresh it
+    (stale-while-revalidate). Older entries are a miss. Concurrent misses for the same key
+    share one tool run. Results the `cacheable` check rejects (typically errors) are
+    returned but not stored.
+
+    TTLs can be overridden per tool with TOOL_CACHE_<TOOL>_TTL_SECONDS and
+    TOOL_CACHE_<TOOL>_STALE_SECONDS.
+    """
+
+    def __init__(self, backend: BaseCacheBackend, enabled: bool = True, clock: Callable[[], float] = time.time):
+        self.backend = backend
+        self.enabled = enabled
+        self._clock = clock
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self._refreshing: Dict[str, "concurrent.futures.Future"] = {}
+        self.counters: Dict[str, collections.Counter] = collections.defaultdict(collections.Counter)
+
+    @classmethod
+    def from_env(cls) -> "ToolCache":
+        if os.getenv("TOOL_CACHE_BACKEND", "memory") == "sqlite":
+            backend = SQLiteCacheBackend(
+                path=os.getenv("TOOL_CACHE_PATH", ".tool_cache.sqlite3"),
+                max_entries=int(os.getenv("TOOL_CACHE_MAX_ENTRIES", 10000)),
+            )
+        else:
+            backend = InMemoryCacheBackend(
+                max_entries=int(os.getenv("TOOL_CACHE_MAX_ENTRIES", 1000)),
+                max_bytes=int(os.getenv("TOOL_CACHE_MAX_BYTES", 64 * 1024 * 1024)),
+            )
+        return cls(backend, enabled=os.getenv("TOOL_CACHE_ENABLED", "1").lower() not in ("0", "false", "no"))
+
+    def cached(
+        self,
+        tool_name: str,
+        ttl: float,
+        stale_ttl: float = 0.0,
+        key_inputs: Optional[Callable[..., Any]] = None,
+        output_model: Optional[Type[BaseModel]] = None,
+        cacheable: Callable[[Any], bool] = bool,
+        still_valid: Optional[Callable[[Any], bool]] = None,
+    ):
+        """
+        Decorates an async tool function.
+
+        `key_inputs(*args, **kwargs)` returns what the key is built from (default: the bound
+        arguments); returning None skips the cache for that call. `output_model` rebuilds
+        Pydantic results from their JSON form. `still_valid(result)` can reject an entry on
+        read, e.g. when the file it points at is gone.
+        """
+        env_name = tool_name.upper()
+        ttl = float(os.getenv(f"TOOL_CACHE_{env_name}_TTL_SECONDS", ttl))
+        stale_ttl = float(os.getenv(f"TOOL_CACHE_{env_name}_STALE_SECONDS", stale_ttl))
+
+        def decorator(func):
+            if getattr(func, "_never_cache", False):
+                raise ValueError(f"{func.__name__} has side effects and must not be cached.")
+            signature = inspect.signature(func)
+
+            def inputs_of(args, kwargs):
+                if key_inputs is not None:
+                    return key_inputs(*args, **kwargs)
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                return dict(bound.arguments)
+
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                inputs = inputs_of(args, kwargs) if self.enabled and ttl > 0 else None
+                if inputs is None:
+                    self.counters[tool_name]["bypass"] += 1
+                    return await func(*args, **kwargs)
+                key = cache_key(tool_name, inputs)
+                counters = self.counters[tool_name]
+
+                entry = self._read(key, output_model, still_valid)
+                if entry is not None:
+                    value, age = entry
+                    if age < ttl:
+                        counters["hits"] += 1
+                        return value
+                    if age < ttl + stale_ttl:
+                        counters["stale_hits"] += 1
+                        self._refresh_in_background(key, tool_name, func, args, kwargs, cacheable)
+                        return value
+
+                loop = asyncio.get_running_loop()
+                task = self._in_flight.get(key)
+                if task is not None and task.get_loop() is loop:
+                    counters["coalesced"] += 1
+                else:
+                    counters["misses"] += 1
+                    task = self._in_flight[key] = loop.create_task(
+                        self._run_and_store(key, tool_name, func, args, kwargs, cacheable)
+                    )
+                    task.add_done_callback(lambda done: self._forget(key, done))
+                # Shielded: a caller that gives up does not cancel the run the others wait for
+                return await asyncio.shield(task)
+
+            wrapper.cache_name = tool_name
+            return wrapper
+
+        return decorator
+
+    def _forget(self, key: str, task: "asyncio.Task") -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+
+    def _read(self, key: str, output_model, still_valid) -> Optional[Tuple[Any, float]]:
+        try:
+            entry = self.backend.get(key)
+        except Exception as e:
+            logger.warning("Tool cache read failed: %s", e)
+            return None
+        if entry is None:
+            return None
+        raw, stored_at = entry
+        try:
+            value = json.loads(raw)
+            if output_model is not None:
+                value = output_model.model_validate(value)
+            valid = still_valid is None or still_valid(value)
+        except Exception as e:
+            # Corrupt, or written before the output model changed: treated as a miss
+            logger.warning("Dropping unreadable tool cache entry %s: %s", key, e)
+            valid = False
+        if not valid:
+            try:
+                self.backend.delete(key)
+            except Exception as e:
+                logger.warning("Tool cache delete failed: %s", e)
+            return None
+        return value, self._clock() - stored_at
+
+    async def _run_and_store(self, key, tool_name, func, args, kwargs, cacheable):
+        result = await func(*args, **kwargs)
+        if cacheable(result):
+            payload = result.model_dump(mode="json") if isinstance(result, BaseModel) else result
+            try:
+                self.backend.set(key, tool_name, json.dumps(payload, default=str), self._clock())
+                self.counters[tool_name]["stores"] += 1
+            except Exception as e:
+                logger.warning("Tool cache write failed: %s", e)
+        else:
+            self.counters[tool_name]["not_cacheable"] += 1
+        return result
+
+    def _refresh_in_background(self, key, tool_name, func, args, kwargs, cacheable) -> None:
+        refreshing = self._refreshing.get(key)
+        if refreshing is not None and not refreshing.done():
+            return
+
+        async def refresh():
+            try:
+                await self._run_and_store(key, tool_name, func, args, kwargs, cacheable)
+                self.counters[tool_name]["refreshes"] += 1
+            except Exception as e:
+                self.counters[tool_name]["refresh_errors"] += 1
+                logger.warning("Background refresh of %s failed: %s", tool_name, e)
+            finally:
+                self._refreshing.pop(key, None)
+
+        # On the background loop: the turn that found the stale entry may end before the refresh does
+        self._refreshing[key] = run_in_background(refresh())
+
+    def invalidate(self, tool_name: Optional[str] = None) -> None:
+        self.backend.clear(tool_name)
+
+    def metrics(self) -> dict:
+        tools = {}
+        for tool_name, counters in self.counters.items():
+            lookups = counters["hits"] + counters["stale_hits"] + counters["misses"] + counters["coalesced"]
+            tools[tool_name] = dict(counters, hit_rate=round((lookups - counters["misses"]) / lookups, 4) if lookups else 0.0)
+        return {"enabled": self.enabled, "tools": tools, **self.backend.stats()}
+
+
+tool_cache = ToolCache.from_env()
@@ -0,0 +1,203 @@
+import asyncio
+import logging
+import os
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, TypeVar
+
+from .reddit_content_idea_scraper import fetch_reddit_content_ideas
+from .youtube_to_twitter_thread_generator import generate_twitter_threads
+
+logger = logging.getLogger("aimpact.tools.fan_out")
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+DEFAULT_CONCURRENCY = int(os.getenv("N8N_FAN_OUT_CONCURRENCY", 4))
+
+
+def split_items(value: str) -> List[str]:
+    """Splits a comma-separated string, dropping blanks and case-insensitive repeats."""
+    seen = set()
+    items = []
+    for item in value.split(","):
+        item = item.strip()
+        if item and item.lower() not in seen:
+            seen.add(item.lower())
+            items.append(item)
+    return items
+
+
+async def iter_fan_out(
+    items: Iterable[T],
+    call: Callable[[T], Awaitable[R]],
+    concurrency: Optional[int] = None,
+) -> AsyncIterator[Tuple[T, R]]:
+    """
+    Runs `call(item)` for every item with at most `concurrency` in flight and yields
+    `(item, result)` pairs in the order they finish, so callers can use partial results
+    while slower items are still running. An exception from `call` is yielded as the result.
+    `concurrency` defaults to N8N_FAN_OUT_CONCURRENCY.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency or DEFAULT_CONCURRENCY))
+
+    async def run(item):
+        async with semaphore:
+            try:
+                return item, await call(item)
+            except Exception as e:
+                return item, e
+
+    tasks = [asyncio.ensure_future(run(item)) for item in items]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def iter_reddit_content_ideas(keywords: str, subreddits: str) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Yields `(keyword, ideas)` as each keyword's request finishes, or `(keyword, exception)`
+    when it failed. One request per keyword, each covering every subreddit, so 20 keywords
+    cost 20 n8n workflow runs however many subreddits there are.
+    """
+    subreddit_list = ", ".join(split_items(subreddits))
+    async for keyword, ideas in iter_fan_out(
+        split_items(keywords), lambda keyword: fetch_reddit_content_ideas(keyword, subreddit_list)
+    ):
+        if not isinstance(ideas, (list, Exception)):
+            ideas = ValueError(f"unexpected response: {ideas!r:.200}")
+        yield keyword, ideas
+
+
+async def get_reddit_content_ideas_batch(keywords: str, subreddits: str) -> list:
+    """
+    Fetches Reddit content ideas for many keywords at once.
+
+    Each keyword is sent to the Reddit webhook as its own request covering all the
+    subreddits, several at a time, and the ideas are merged into one list with duplicates
+    removed. Use this instead of get_reddit_content_ideas when there are several keywords.
+    Each keyword is one n8n workflow run.
+
+    Args:
+        keywords (str): A comma-separated string of keywords.
+        subreddits (str): A comma-separated string of subreddits.
+
+    Returns:
+        list: The merged content ideas. If some keywords failed, the last item is a
+        dictionary with an "error" key and a "failed_keywords" list; the ideas before it
+        are the partial result from the keywords that succeeded.
+    """
+    merged = []
+    seen = set()
+    failed = {}
+    async for keyword, ideas in iter_reddit_content_ideas(keywords, subreddits):
+        if isinstance(ideas, Exception):
+            logger.warning("Reddit ideas for %r failed: %s", keyword, ideas)
+            failed[keyword] = str(ideas)
+            continue
+        logger.info("Reddit ideas for %r: %d", keyword, len(ideas))
+        for idea in ideas:
+            key = _idea_key(idea)
+            if key not in seen:
+                seen.add(key)
+                merged.append(idea)
+    if failed:
+        merged.append({
+            "error": f"No ideas could be fetched for {len(failed)} keyword(s); the list above is partial.",
+            "failed_keywords": [k for k in split_items(keywords) if k in failed],
+            "details": failed,
+        })
+    return merged
+
+
+def _idea_key(idea) -> str:
+    if isinstance(idea, dict):
+        for field in ("url", "link", "permalink", "title"):
+            if idea.get(field):
+                return f"{field}:{str(idea[field]).strip().lower()}"
+    return repr(idea)
+
+
+async def iter_twitter_threads(keywords: str, target_audience: str, content_type: str) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Yields `(keyword, result)` as each keyword's threads are generated; `result` is what
+    generate_twitter_threads returned, with an exception turned into its error dictionary.
+    """
+    async for keyword, result in iter_fan_out(
+        split_items(keywords),
+        lambda keyword: generate_twitter_threads(keyword, target_audience, content_type),
+    ):
+        if isinstance(result, Exception):
+            result = {"error": f"An unexpected error occurred: {result}"}
+        yield keyword, result
+
+
+# Per-video fields of a generate_twitter_threads result, renumbered with each thread
+_VIDEO_FIELDS = ("video_title", "video_url", "video_views", "video_channel")
+
+
+def merge_twitter_threads(results: Dict[str, Any]) -> dict:
+    """
+    Merges per-keyword generate_twitter_threads results into that tool's own shape:
+    `thread_<n>_title` / `thread_<n>_content`, numbered across keywords, plus
+    `thread_<n>_keyword` and the video fields of the video each thread came from. Threads
+    with the same content are kept once. Failed keywords are listed under "failed".
+    """
+    merged: Dict[str, Any] = {}
+    seen = set()
+    failed = {}
+    n = 0
+    for keyword, result in results.items():
+        if not isinstance(result, dict):
+            result = {"thread_1_content": result}
+        if "error" in result:
+            failed[keyword] = result["error"]
+            continue
+        i = 1
+        while f"thread_{i}_content" in result:
+            content = result[f"thread_{i}_content"]
+            if str(content).strip() not in seen:
+                seen.add(str(content).strip())
+                n += 1
+                merged[f"thread_{n}_keyword"] = keyword
+                if f"thread_{i}_title" in result:
+                    merged[f"thread_{n}_title"] = result[f"thread_{i}_title"]
+                merged[f"thread_{n}_content"] = content
+                for field in _VIDEO_FIELDS:
+                    if field in result:
+                        merged[f"thread_{n}_{field}"] = result[field]
+            i += 1
+    if failed:
+        merged["failed"] = failed
+        if not n:
+            merged["error"] = f"Twitter threads could not be generated for any of {len(failed)} keyword(s)."
+    merged["status"] = "failed" if not n and failed else "partial" if failed else "complete"
+    return merged
+
+
+async def generate_twitter_threads_batch(keywords: str, target_audience: str, content_type: str) -> dict:
+    """
+    Generates Twitter threads for several keywords at once.
+
+    Each keyword is sent to the YouTube-to-Twitter webhook as its own request, several at
+    a time. Use this instead of generate_twitter_threads when the user gives more than one
+    keyword or topic.
+
+    Args:
+        keywords (str): A comma-separated string of keywords or topics.
+        target_audience (str): The intended audience for the Twitter threads.
+        content_type (str): The style or type of content (e.g., "Educational", "Casual").
+
+    Returns:
+        dict: The threads in generate_twitter_threads' shape, numbered across keywords
+        (`thread_1_title`, `thread_1_content`, ...), each with a `thread_<n>_keyword`.
+        "status" is "complete", "partial" (some keywords failed; see "failed", which maps
+        each to its error) or "failed", which also sets "error".
+    """
+    results = {}
+    async for keyword, result in iter_twitter_threads(keywords, target_audience, content_type):
+        logger.info("Twitter threads for %r finished%s", keyword, " with an error" if "error" in result else "")
+        results[keyword] = result
+    # Numbered in the order the keywords were given, not the order they finished
+    return merge_twitter_threads({keyword: results[keyword] for keyword in split_items(keywords)})
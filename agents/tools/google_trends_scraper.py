@@ -1,12 +1,100 @@
+import asyncio
 import os
+import tempfile
 import httpx
-from google.adk.tools import FunctionTool
 
-async def google_trends_scraper(output_filename: str = "google_trends_output.csv") -> str:
+from .cache import tool_cache
+from .offload import run_blocking
+from .registry import lazy_tools
+from .webhook_client import webhook_client
+
+CHUNK_SIZE = 1024 * 1024
+PREVIEW_LINES = 6  # Header and the first five rows
+
+def _open_temp(output_filename: str):
+    # Same directory as the target, so the final os.replace is an atomic rename
+    directory = os.path.dirname(os.path.abspath(output_filename))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".google_trends_", suffix=".part")
+    return os.fdopen(fd, "wb"), temp_path
+
+def _commit(f, temp_path: str, output_filename: str) -> None:
+    f.close()
+    os.replace(temp_path, output_filename)
+
+def _discard(f, temp_path: str) -> None:
+    f.close()
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+
+async def _stream_to_file(response: httpx.Response, output_filename: str) -> dict:
+    """
+    Copies the response body to `output_filename` chunk by chunk. Writes happen on the tool
+    thread pool, each overlapping the download of the next chunk, so memory use stays at a
+    couple of chunks and the event loop never waits on the disk. The file only appears once
+    the download is complete.
+    """
+    f, temp_path = await run_blocking(_open_temp, output_filename)
+    size = 0
+    newlines = 0
+    last_byte = b""
+    head = b""
+    pending = None
+    try:
+        async for chunk in response.aiter_bytes(CHUNK_SIZE):
+            size += len(chunk)
+            newlines += chunk.count(b"\n")
+            last_byte = chunk[-1:]
+            if head.count(b"\n") < PREVIEW_LINES:
+                head += chunk[:64 * 1024]
+            if pending is not None:
+                await pending
+            pending = asyncio.ensure_future(run_blocking(f.write, chunk))
+        if pending is not None:
+            await pending
+        await run_blocking(_commit, f, temp_path, output_filename)
+    except BaseException:
+        if pending is not None and not pending.done():
+            # A write cannot be stopped mid-way; remove the file once it has finished
+            def discard_after_write(task):
+                if not task.cancelled():
+                    task.exception()  # Retrieved so it is not reported as unhandled
+                asyncio.ensure_future(run_blocking(_discard, f, temp_path))
+            pending.add_done_callback(discard_after_write)
+        else:
+            await asyncio.shield(run_blocking(_discard, f, temp_path))
+        raise
+
+    lines = newlines + (1 if last_byte not in (b"", b"\n") else 0)
+    preview = head.decode("utf-8", errors="replace").splitlines()[:PREVIEW_LINES]
+    return {
+        "status": "success",
+        "output_filename": output_filename,
+        "rows": max(0, lines - 1),  # Not counting the header
+        "bytes": size,
+        "preview": preview,
+    }
+
+def _saved_file_intact(result: dict) -> bool:
+    path = result["output_filename"]
+    return os.path.exists(path) and os.path.getsize(path) == result["bytes"]
+
+# Not served stale: the result describes a file that should reflect the cached run
+@tool_cache.cached(
+    "google_trends",
+    ttl=3600,
+    cacheable=lambda result: result.get("status") == "success",
+    still_valid=_saved_file_intact,
+)
+async def google_trends_scraper(output_filename: str = "google_trends_output.csv") -> dict:
     """
     Triggers an n8n workflow to scrape Google Trends data and saves the output to a CSV file.
     This tool does not send any payload to the n8n webhook, it merely triggers the workflow.
     It expects a CSV response from the n8n webhook.
+
+    Returns:
+        dict: On success, `status` "success", the `output_filename`, the number of data
+        `rows`, the file size in `bytes` and a `preview` holding the header and first rows.
+        On failure, `status` "error" and a `message`.
     """
     n8n_webhook_url = os.getenv("N8N_GTRENDS_WEBHOOK_URL")
     n8n_api_key = os.getenv("N8N_GTRENDS_WEBHOOK_API_KEY")
@@ -21,19 +109,18 @@ async def google_trends_scraper(output_filename: str = "google_trends_output.csv
     }
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(n8n_webhook_url, headers=headers, timeout=160.0)
+        # Streamed, so exports of any size are never held in memory
+        async with webhook_client.astream("google_trends", headers=headers) as response:
+            if response.is_error:
+                await response.aread()
             response.raise_for_status()  # Raise an exception for 4xx or 5xx responses
-            
-            # Save the content to a CSV file
-            with open(output_filename, "w", encoding="utf-8") as f:
-                f.write(response.text)
-            
-            return f"CSV data saved to {output_filename}"
+            return await _stream_to_file(response, output_filename)
     except httpx.RequestError as exc:
-        return f"An error occurred while requesting {exc.request.url!r}: {exc}"
+        return {"status": "error", "message": f"An error occurred while requesting {exc.request.url!r}: {exc}"}
     except httpx.HTTPStatusError as exc:
-        return f"Error response {exc.response.status_code} while requesting {exc.request.url!r}: {exc.response.text}"
+        return {"status": "error", "message": f"Error response {exc.response.status_code} while requesting {exc.request.url!r}: {exc.response.text}"}
+    except OSError as exc:
+        return {"status": "error", "message": f"Could not save the CSV to {output_filename!r}: {exc}"}
 
-# --- CORRECTED INITIALIZATION ---
-google_trends_scraper_tool = FunctionTool(func=google_trends_scraper)
\ No newline at end of file
+# google_trends_scraper_tool: built on first access
+__getattr__ = lazy_tools(__name__, google_trends_scraper_tool=google_trends_scraper)
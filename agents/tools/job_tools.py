@@ -0,0 +1,66 @@
+from .google_trends_scraper import google_trends_scraper
+from .jobs import job_scheduler
+from .seo_keyword_generator import generate_seo_keywords
+
+# Longest a single wait_for_job call holds the agent turn
+MAX_WAIT_SECONDS = 60
+
+
+async def start_seo_keywords_job(**kwargs) -> dict:
+    """
+    Starts SEO keyword generation as a background job and returns its job ID at once.
+    Takes the same inputs as generate_seo_keywords. Use it when the user does not need the
+    keywords in this reply, then check on it with get_job_status or wait_for_job.
+    """
+    job = job_scheduler.submit("seo_keywords", generate_seo_keywords, **kwargs)
+    return {"job_id": job.job_id, "status": job.status}
+
+
+async def start_google_trends_job(output_filename: str = "google_trends_output.csv") -> dict:
+    """
+    Starts the Google Trends scrape as a background job and returns its job ID at once.
+    The scrape can take minutes; check on it with get_job_status or wait_for_job.
+
+    Args:
+        output_filename (str): Where to save the CSV export.
+    """
+    job = job_scheduler.submit("google_trends", google_trends_scraper, output_filename=output_filename)
+    return {"job_id": job.job_id, "status": job.status}
+
+
+def _report(job_id: str, job) -> dict:
+    if job is None:
+        return {"job_id": job_id, "status": "unknown", "error": "No such job, or its result has expired."}
+    report = job.to_dict()
+    result = report.get("result")
+    if hasattr(result, "model_dump"):
+        report["result"] = result.model_dump()
+    report["recent_events"] = job.events[-5:]
+    return report
+
+
+async def get_job_status(job_id: str) -> dict:
+    """
+    Reports a background job's status, progress and latest events, and its result once
+    it has succeeded.
+
+    Args:
+        job_id (str): The ID returned when the job was started.
+    """
+    job_id = job_id.strip()
+    return _report(job_id, job_scheduler.get(job_id))
+
+
+async def wait_for_job(job_id: str, timeout_seconds: int = 30) -> dict:
+    """
+    Waits up to `timeout_seconds` (at most 60) for a background job to finish, then
+    reports it as get_job_status does. If it is still running, the report shows its
+    progress and the job carries on.
+
+    Args:
+        job_id (str): The ID returned when the job was started.
+        timeout_seconds (int): How long to wait.
+    """
+    job_id = job_id.strip()
+    job = await job_scheduler.wait(job_id, timeout=max(0, min(int(timeout_seconds), MAX_WAIT_SECONDS)))
+    return _report(job_id, job)
@@ -0,0 +1,531 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import logging
+import os
+import threading
+import time
+import uuid
+import weakref
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+from .offload import run_in_background
+from .webhook_client import webhook_client
+
+logger = logging.getLogger("aimpact.tools.jobs")
+
+# Job states
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+# Status words n8n workflows report when polled
+_DONE_STATUSES = ("succeeded", "success", "completed", "done")
+_FAILED_STATUSES = ("failed", "error")
+
+
+class WorkflowFailed(Exception):
+    """An n8n workflow reported that it failed."""
+
+
+@dataclass
+class Job:
+    job_id: str
+    kind: str
+    status: str = QUEUED
+    progress: Optional[float] = None
+    message: Optional[str] = None
+    result: Any = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    events: List[dict] = field(default_factory=list)
+    next_seq: int = 1
+
+    @property
+    def done(self) -> bool:
+        return self.status in FINISHED
+
+    def to_dict(self, include_events: bool = False) -> dict:
+        state = {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": self.progress,
+            "message": self.message,
+            "error": self.error,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+            "finished_at": self.finished_at,
+        }
+        if self.status == SUCCEEDED:
+            state["result"] = self.result
+        if include_events:
+            state["events"] = list(self.events)
+        return state
+
+
+class BaseJobStore(ABC):
+    """Abstract base class for where jobs and their results are kept."""
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Job]:
+        pass
+
+    @abstractmethod
+    def put(self, job: Job) -> None:
+        pass
+
+    @abstractmethod
+    def sweep(self, now: Optional[float] = None) -> int:
+        """Drops finished jobs whose results have expired; returns how many."""
+        pass
+
+    def stats(self) -> dict:
+        return {}
+
+
+class InMemoryJobStore(BaseJobStore):
+    """
+    Keeps jobs in process memory. A finished job, and its result, is kept for `ttl`
+    seconds; past `max_jobs`, the oldest finished jobs are dropped first.
+    """
+
+    def __init__(self, ttl: float = 3600.0, max_jobs: int = 10000):
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self.expired = 0
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None and job.done and time.time() - job.finished_at > self.ttl:
+            return None
+        return job
+
+    def put(self, job: Job) -> None:
+        with self._lock:
+            self._jobs[job.job_id] = job
+            over = len(self._jobs) - self.max_jobs
+        if over > 0:
+            self._evict(over)
+
+    def _evict(self, count: int) -> None:
+        with self._lock:
+            finished = sorted((j for j in self._jobs.values() if j.done), key=lambda j: j.finished_at)
+            for job in finished[:count]:
+                del self._jobs[job.job_id]
+                self.expired += 1
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        cutoff = (now or time.time()) - self.ttl
+        with self._lock:
+            stale = [job_id for job_id, job in self._jobs.items() if job.done and job.finished_at < cutoff]
+            for job_id in stale:
+                del self._jobs[job_id]
+            self.expired += len(stale)
+        return len(stale)
+
+    def stats(self) -> dict:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        counts: Dict[str, int] = {}
+        for job in jobs:
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {"jobs": len(jobs), "by_status": counts, "expired": self.expired}
+
+
+# The job whose work is running in the current task, for progress reports and callbacks
+current_job: contextvars.ContextVar[Optional[Job]] = contextvars.ContextVar("current_job", default=None)
+
+
+class JobScheduler:
+    """
+    Runs long tool work in the background and tracks it as jobs.
+
+    `submit` returns a queued Job at once; its work runs on the process's background
+    loop (see `offload.background_loop`), so it outlives the agent turn that started it,
+    at most `concurrency` at a time, and is failed after `timeout` seconds. The work can
+    report progress with `report_progress`, and an n8n workflow that answers 202 is
+    finished by polling its status URL or by a call to `complete` from the callback
+    endpoint (see `callback_app`). Progress and status changes are recorded as numbered
+    events that `events` streams.
+
+    Updates may come from another thread (the callback server), so waiters are woken
+    on their own loops.
+    """
+
+    def __init__(
+        self,
+        store: Optional[BaseJobStore] = None,
+        concurrency: int = 4,
+        timeout: float = 900.0,
+        poll_interval: float = 2.0,
+        max_poll_interval: float = 15.0,
+        callback_url: Optional[str] = None,
+        max_events: int = 100,
+    ):
+        self.store = store or InMemoryJobStore()
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.callback_url = callback_url.rstrip("/") if callback_url else None
+        self.max_events = max_events
+        self._lock = threading.Lock()
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+        self._tasks: Dict[str, "concurrent.futures.Future"] = {}
+        self._watchers: Dict[str, List[asyncio.Future]] = {}
+        self._callbacks: Dict[str, asyncio.Future] = {}
+        self._early_callbacks: Dict[str, dict] = {}
+        self._swept_at = time.monotonic()
+        self.submitted = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.running = 0
+        self.peak_running = 0
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(max(1, self.concurrency))
+        return semaphore
+
+    def submit(self, kind: str, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Job:
+        """Queues `func(*args, **kwargs)` as a job and returns it without waiting."""
+        job = Job(job_id=uuid.uuid4().hex, kind=kind)
+        self.store.put(job)
+        with self._lock:
+            self._record(job, "status")
+        self.submitted += 1
+        if time.monotonic() - self._swept_at > 60:
+            self._swept_at = time.monotonic()
+            self.store.sweep()
+        future = run_in_background(self._run(job, func, args, kwargs))
+        self._tasks[job.job_id] = future
+        future.add_done_callback(lambda _: self._tasks.pop(job.job_id, None))
+        return job
+
+    async def _run(self, job: Job, func, args, kwargs) -> None:
+        current_job.set(job)
+        try:
+            async with self._semaphore():
+                self._update(job, status=RUNNING)
+                self.running += 1
+                self.peak_running = max(self.peak_running, self.running)
+                try:
+                    result = await asyncio.wait_for(func(*args, **kwargs), self.timeout)
+                finally:
+                    self.running -= 1
+        except asyncio.CancelledError:
+            self._update(job, status=CANCELLED, error="Cancelled.")
+            raise
+        except asyncio.TimeoutError:
+            self.failed += 1
+            self._update(job, status=FAILED, error=f"Timed out after {self.timeout:.0f} s.")
+        except Exception as e:
+            self.failed += 1
+            logger.warning("Job %s (%s) failed: %s", job.job_id, job.kind, e)
+            self._update(job, status=FAILED, error=str(e) or type(e).__name__)
+        else:
+            self.succeeded += 1
+            self._update(job, status=SUCCEEDED, result=result, progress=1.0)
+        finally:
+            self._callbacks.pop(job.job_id, None)
+            self._early_callbacks.pop(job.job_id, None)
+
+    def _update(self, job: Job, status: Optional[str] = None, **changes) -> None:
+        with self._lock:
+            if job.done:
+                return
+            if status is not None:
+                job.status = status
+            for name, value in changes.items():
+                setattr(job, name, value)
+            job.updated_at = time.time()
+            if job.done:
+                job.finished_at = job.updated_at
+            self._record(job, "status" if status else "progress")
+
+    def _record(self, job: Job, event_type: str) -> None:
+        """Appends an event and wakes the job's watchers. Called with the lock held."""
+        event = {"seq": job.next_seq, "type": event_type, "status": job.status, "at": job.updated_at}
+        if job.progress is not None:
+            event["progress"] = job.progress
+        if job.message:
+            event["message"] = job.message
+        if job.error:
+            event["error"] = job.error
+        job.next_seq += 1
+        job.events.append(event)
+        del job.events[:-self.max_events]
+        for waiter in self._watchers.pop(job.job_id, []):
+            waiter.get_loop().call_soon_threadsafe(_resolve, waiter, None)
+
+    def progress(self, job_id: str, progress: Optional[float] = None, message: Optional[str] = None) -> bool:
+        """Records a progress report; returns False if the job is unknown or finished."""
+        job = self.store.get(job_id)
+        if job is None or job.done:
+            return False
+        changes = {}
+        if progress is not None:
+            changes["progress"] = max(0.0, min(1.0, float(progress)))
+        if message is not None:
+            changes["message"] = str(message)
+        self._update(job, **changes)
+        return True
+
+    def complete(self, job_id: str, result: Any = None, error: Optional[str] = None) -> bool:
+        """Delivers a workflow's result (or error) reported through the callback endpoint."""
+        job = self.store.get(job_id)
+        if job is None or job.done:
+            return False
+        outcome = {"result": result, "error": error}
+        with self._lock:
+            waiter = self._callbacks.pop(job_id, None)
+            if waiter is None:
+                # Arrived before the work started waiting for it
+                self._early_callbacks[job_id] = outcome
+        if waiter is not None:
+            waiter.get_loop().call_soon_threadsafe(_resolve, waiter, outcome)
+        return True
+
+    async def wait_for_callback(self) -> Any:
+        """From inside a job's work: waits for `complete` to be called for the job."""
+        job = current_job.get()
+        if job is None:
+            raise RuntimeError("wait_for_callback() must be called from a job's work.")
+        with self._lock:
+            outcome = self._early_callbacks.pop(job.job_id, None)
+            if outcome is None:
+                waiter = self._callbacks[job.job_id] = asyncio.get_running_loop().create_future()
+        if outcome is None:
+            outcome = await waiter
+        if outcome["error"]:
+            raise WorkflowFailed(outcome["error"])
+        return outcome["result"]
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.store.get(job_id)
+
+    def _watch(self, job_id: str) -> asyncio.Future:
+        waiter = asyncio.get_running_loop().create_future()
+        with self._lock:
+            self._watchers.setdefault(job_id, []).append(waiter)
+        return waiter
+
+    async def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[Job]:
+        """Returns the job once it has finished or `timeout` has passed; None if unknown."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = self.store.get(job_id)
+            if job is None or job.done:
+                return job
+            waiter = self._watch(job_id)
+            job = self.store.get(job_id)
+            if job is None or job.done:
+                return job
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return job
+            try:
+                await asyncio.wait_for(waiter, remaining)
+            except asyncio.TimeoutError:
+                return self.store.get(job_id)
+
+    async def events(self, job_id: str, after: int = 0) -> AsyncIterator[dict]:
+        """Yields the job's events after sequence number `after` as they happen, until it finishes."""
+        while True:
+            waiter = self._watch(job_id)
+            job = self.store.get(job_id)
+            if job is None:
+                return
+            with self._lock:
+                pending = [e for e in job.events if e["seq"] > after]
+            for event in pending:
+                after = event["seq"]
+                yield event
+            if job.done:
+                return
+            if not pending:
+                await waiter
+
+    def cancel(self, job_id: str) -> bool:
+        future = self._tasks.get(job_id)
+        if future is None or future.done():
+            return False
+        # Cancelling the future cancels the task on the background loop
+        return future.cancel()
+
+    def metrics(self) -> dict:
+        return {
+            "submitted": self.submitted,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "running": self.running,
+            "peak_running": self.peak_running,
+            "concurrency": self.concurrency,
+            "store": self.store.stats(),
+        }
+
+
+def _resolve(waiter: asyncio.Future, value: Any) -> None:
+    if not waiter.done():
+        waiter.set_result(value)
+
+
+job_scheduler = JobScheduler(
+    store=InMemoryJobStore(
+        ttl=float(os.getenv("JOB_RESULT_TTL_SECONDS", 3600)),
+        max_jobs=int(os.getenv("JOB_STORE_MAX_JOBS", 10000)),
+    ),
+    concurrency=int(os.getenv("JOB_WORKER_CONCURRENCY", 4)),
+    timeout=float(os.getenv("JOB_TIMEOUT_SECONDS", 900)),
+    poll_interval=float(os.getenv("N8N_JOB_POLL_INTERVAL_SECONDS", 2)),
+    callback_url=os.getenv("N8N_JOB_CALLBACK_URL"),
+)
+
+
+def report_progress(progress: Optional[float] = None, message: Optional[str] = None) -> None:
+    """Reports progress for the job running in this task; does nothing outside a job."""
+    job = current_job.get()
+    if job is not None:
+        job_scheduler.progress(job.job_id, progress, message)
+
+
+def job_headers() -> dict:
+    """
+    Headers that let an n8n workflow run asynchronously for the current job: its ID, and
+    where to report progress and the result if a callback URL is configured.
+    """
+    job = current_job.get()
+    if job is None:
+        return {}
+    headers = {"X-Job-Id": job.job_id}
+    if job_scheduler.callback_url:
+        headers["X-Job-Callback-Url"] = f"{job_scheduler.callback_url}/jobs/{job.job_id}"
+    return headers
+
+
+async def await_workflow_result(name: str, response: httpx.Response) -> Any:
+    """
+    Finishes a webhook call that n8n answered with 202 Accepted. If the body gives a
+    `status_url` it is polled, with growing intervals and through the webhook's breaker and
+    retries, until the workflow reports a final status or the job timeout passes;
+    otherwise the result is expected through the callback endpoint, which needs a job and
+    N8N_JOB_CALLBACK_URL.
+    """
+    body = response.json() if response.content else {}
+    status_url = body.get("status_url") if isinstance(body, dict) else None
+    if status_url:
+        return await _poll(name, status_url)
+    if current_job.get() is None or not job_scheduler.callback_url:
+        raise WorkflowFailed("The workflow was accepted without a status_url and no job callback is configured.")
+    return await job_scheduler.wait_for_callback()
+
+
+async def _poll(name: str, status_url: str) -> Any:
+    # Capped on its own as well: outside a job nothing else bounds how long a workflow is polled
+    try:
+        return await asyncio.wait_for(_poll_until_final(name, status_url), job_scheduler.timeout)
+    except asyncio.TimeoutError:
+        raise WorkflowFailed(f"The {name} workflow did not finish within {job_scheduler.timeout:.0f} s.") from None
+
+
+async def _poll_until_final(name: str, status_url: str) -> Any:
+    interval = job_scheduler.poll_interval
+    while True:
+        await asyncio.sleep(interval)
+        response = await webhook_client.aget(name, status_url)
+        response.raise_for_status()
+        state = response.json()
+        report_progress(state.get("progress"), state.get("message"))
+        status = str(state.get("status", "")).lower()
+        if status in _DONE_STATUSES:
+            return state.get("result")
+        if status in _FAILED_STATUSES:
+            raise WorkflowFailed(state.get("error") or f"The {name} workflow failed.")
+        interval = min(interval * 1.5, job_scheduler.max_poll_interval)
+
+
+def callback_app(scheduler: Optional[JobScheduler] = None):
+    """
+    A Starlette app for n8n to report on jobs, served with
+    `uvicorn agents.tools.jobs:callback_app --factory` (or `serve_callbacks`). Routes:
+
+    - POST /jobs/{job_id}/progress  {"progress": 0.5, "message": "..."}
+    - POST /jobs/{job_id}/complete  {"result": ...} or {"error": "..."}
+    - GET  /jobs/{job_id}           the job's state
+    - GET  /jobs/{job_id}/events    its events as Server-Sent Events
+    """
+    # Imported here so the tools do not load Starlette unless callbacks are served
+    import json
+
+    from starlette.applications import Starlette
+    from starlette.requests import Request
+    from starlette.responses import JSONResponse, StreamingResponse
+    from starlette.routing import Route
+
+    scheduler = scheduler or job_scheduler
+
+    async def body(request: Request) -> dict:
+        data = await request.json() if await request.body() else {}
+        return data if isinstance(data, dict) else {"result": data}
+
+    async def progress(request: Request):
+        data = await body(request)
+        if not scheduler.progress(request.path_params["job_id"], data.get("progress"), data.get("message")):
+            return JSONResponse({"error": "Unknown or finished job."}, status_code=404)
+        return JSONResponse({"ok": True})
+
+    async def complete(request: Request):
+        data = await body(request)
+        if not scheduler.complete(request.path_params["job_id"], data.get("result"), data.get("error")):
+            return JSONResponse({"error": "Unknown or finished job."}, status_code=404)
+        return JSONResponse({"ok": True})
+
+    async def status(request: Request):
+        job = scheduler.get(request.path_params["job_id"])
+        if job is None:
+            return JSONResponse({"error": "Unknown job."}, status_code=404)
+        return JSONResponse(job.to_dict(include_events=True))
+
+    async def events(request: Request):
+        job_id = request.path_params["job_id"]
+        if scheduler.get(job_id) is None:
+            return JSONResponse({"error": "Unknown job."}, status_code=404)
+        after = int(request.headers.get("last-event-id") or 0)
+
+        async def stream():
+            async for event in scheduler.events(job_id, after):
+                yield f"id: {event['seq']}\ndata: {json.dumps(event)}\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    return Starlette(routes=[
+        Route("/jobs/{job_id}/progress", progress, methods=["POST"]),
+        Route("/jobs/{job_id}/complete", complete, methods=["POST"]),
+        Route("/jobs/{job_id}", status, methods=["GET"]),
+        Route("/jobs/{job_id}/events", events, methods=["GET"]),
+    ])
+
+
+_callback_server = None
+
+
+def serve_callbacks(host: str = "127.0.0.1", port: int = 8765):
+    """Starts the callback app on a uvicorn server in a daemon thread, once per process."""
+    global _callback_server
+    if _callback_server is None:
+        import uvicorn
+
+        _callback_server = uvicorn.Server(uvicorn.Config(callback_app(), host=host, port=port, log_level="warning"))
+        threading.Thread(target=_callback_server.run, name="aimpact-job-callbacks", daemon=True).start()
+    return _callback_server
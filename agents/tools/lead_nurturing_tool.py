@@ -1,11 +1,10 @@
-import os
-import httpx # Keep httpx for async
 from pydantic import BaseModel, Field
-from typing import Literal
-from google.adk.tools import FunctionTool
-from dotenv import load_dotenv
+from typing import Literal, Optional
 
-load_dotenv() # Load environment variables from .env file
+from .cache import never_cache
+from .lead_pipeline import lead_pipeline
+from .registry import lazy_tools
+from .webhook_client import webhook_client
 
 class LeadNurturingInputs(BaseModel):
     full_name: str = Field(..., description="Full name of the lead.")
@@ -17,9 +16,17 @@ class LeadNurturingInputs(BaseModel):
     lead_source: str = Field(..., description="Source from which the lead was acquired (e.g., LinkedIn, Website, Referral).")
 
 class LeadNurturingOutputs(BaseModel):
-    status: Literal["success", "failure"] = Field(..., description="Status of the lead nurturing request.")
+    status: Literal["queued", "success", "failure"] = Field(..., description="Status of the lead nurturing request.")
     message: str = Field(..., description="A message describing the outcome of the request.")
+    tracking_id: Optional[str] = Field(None, description="ID to pass to get_lead_delivery_status to follow the delivery.")
 
+class LeadDeliveryStatus(BaseModel):
+    tracking_id: str = Field(..., description="The tracking ID that was looked up.")
+    status: Literal["queued", "sending", "delivered", "failed", "unknown"] = Field(..., description="Delivery state of the lead.")
+    attempts: int = Field(0, description="Delivery attempts made so far.")
+    last_error: Optional[str] = Field(None, description="Error from the last failed attempt, if any.")
+
+@never_cache  # Every call starts an email sequence, a repeat must reach n8n
 async def send_lead_for_nurturing(
     full_name: str,
     email: str,
@@ -30,12 +37,13 @@ async def send_lead_for_nurturing(
     lead_source: str
 ) -> LeadNurturingOutputs:
     """
-    Sends lead information to an n8n webhook to initiate an AI-powered email nurturing sequence.
-    """
-    webhook_url = os.getenv("N8N_LEADNURTURE_WEBHOOK_URL")
-    # api_key = os.getenv("N8N_LEADNURTURE_WEBHOOK_API_KEY") # <--- REMOVE OR COMMENT OUT THIS LINE if no API key is used
+    Queues lead information for the n8n webhook that starts an AI-powered email nurturing sequence.
 
-    if not webhook_url:
+    The lead is stored locally and delivered in the background, batched with other leads
+    and retried if n8n is unavailable, so this returns at once with a tracking ID. Use
+    get_lead_delivery_status with that ID to check whether the lead has been delivered.
+    """
+    if not webhook_client.url("lead_nurturing_batch") and not webhook_client.url("lead_nurturing"):
         return LeadNurturingOutputs(status="failure", message="N8N_LEADNURTURE_WEBHOOK_URL environment variable is not set.")
 
     payload = {
@@ -48,24 +56,31 @@ async def send_lead_for_nurturing(
         "Lead Source": lead_source,
     }
 
-    # You don't need to explicitly set Content-Type: application/json here if using json=payload
-    # httpx will handle it automatically.
-    # headers = {
-    #     "Content-Type": "application/json"
-    # }
-    
     try:
-        async with httpx.AsyncClient() as client:
-            # CHANGE 'data=payload' to 'json=payload'
-            response = await client.post(webhook_url, json=payload, timeout=30.0)
-            response.raise_for_status()  # Raise an exception for 4xx or 5xx status codes
-
-        return LeadNurturingOutputs(status="success", message=f"Lead information sent successfully. Response: {response.text}")
-    except httpx.RequestError as exc:
-        return LeadNurturingOutputs(status="failure", message=f"An error occurred while requesting {exc.request.url!r}: {exc}")
-    except httpx.HTTPStatusError as exc:
-        return LeadNurturingOutputs(status="failure", message=f"Error response {exc.response.status_code} while requesting {exc.request.url!r}: {exc.response.text}")
+        tracking_id = await lead_pipeline.submit(payload)
     except Exception as e:
-        return LeadNurturingOutputs(status="failure", message=f"An unexpected error occurred: {e}")
+        return LeadNurturingOutputs(status="failure", message=f"The lead could not be queued: {e}")
+    return LeadNurturingOutputs(
+        status="queued",
+        message=f"Lead for {full_name} queued for nurturing. Tracking ID: {tracking_id}",
+        tracking_id=tracking_id,
+    )
+
+async def get_lead_delivery_status(tracking_id: str) -> LeadDeliveryStatus:
+    """
+    Reports whether a lead queued with send_lead_for_nurturing has reached the nurturing workflow.
+
+    Args:
+        tracking_id (str): The tracking ID returned by send_lead_for_nurturing.
+    """
+    state = await lead_pipeline.status(tracking_id.strip())
+    if state is None:
+        return LeadDeliveryStatus(tracking_id=tracking_id, status="unknown")
+    return LeadDeliveryStatus(tracking_id=tracking_id, status=state["status"], attempts=state["attempts"], last_error=state["last_error"])
 
-lead_nurturing_tool = FunctionTool(func=send_lead_for_nurturing)
\ No newline at end of file
+# lead_nurturing_tool and lead_delivery_status_tool: built on first access
+__getattr__ = lazy_tools(
+    __name__,
+    lead_nurturing_tool=send_lead_for_nurturing,
+    lead_delivery_status_tool=get_lead_delivery_status,
+)
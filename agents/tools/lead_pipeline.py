@@ -0,0 +1,363 @@
+import asyncio
+import concurrent.futures
+import contextlib
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from typing import List, Optional
+
+import httpx
+
+from .offload import background_loop, run_blocking, run_in_background
+from .resilience import CircuitOpenError
+from .webhook_client import webhook_client
+
+logger = logging.getLogger("aimpact.tools.lead_pipeline")
+
+# Delivery states of a spooled lead
+QUEUED, SENDING, DELIVERED, FAILED = "queued", "sending", "delivered", "failed"
+
+
+class LeadSpool:
+    """
+    Durable local queue of lead submissions in a SQLite file.
+
+    A lead is written here before the tool returns, so it survives a process restart.
+    Leads that were being sent when the process died are put back in the queue on
+    start; delivery is therefore at least once.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS leads ("
+            " id TEXT PRIMARY KEY, payload TEXT NOT NULL, status TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0, last_error TEXT,"
+            " created_at REAL NOT NULL, updated_at REAL NOT NULL, next_attempt_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS leads_due ON leads (status, next_attempt_at)")
+
+    def add(self, payloads: List[dict]) -> List[str]:
+        now = time.time()
+        rows = [(uuid.uuid4().hex, json.dumps(p), QUEUED, now, now, now) for p in payloads]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO leads (id, payload, status, created_at, updated_at, next_attempt_at) VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        return [row[0] for row in rows]
+
+    def requeue_interrupted(self) -> int:
+        with self._lock:
+            return self._conn.execute("UPDATE leads SET status = ? WHERE status = ?", (QUEUED, SENDING)).rowcount
+
+    def claim(self, limit: int) -> List[tuple]:
+        """Marks up to `limit` due leads as sending and returns their (id, payload, attempts)."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    "SELECT id, payload, attempts FROM leads WHERE status = ? AND next_attempt_at <= ?"
+                    " ORDER BY created_at LIMIT ?",
+                    (QUEUED, now, limit),
+                ).fetchall()
+                self._conn.executemany(
+                    "UPDATE leads SET status = ?, updated_at = ? WHERE id = ?", [(SENDING, now, r[0]) for r in rows]
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [(r[0], json.loads(r[1]), r[2]) for r in rows]
+
+    def mark_delivered(self, ids: List[str]) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE leads SET status = ?, attempts = attempts + 1, last_error = NULL, updated_at = ? WHERE id = ?",
+                [(DELIVERED, now, i) for i in ids],
+            )
+
+    def mark_failed_attempt(self, ids: List[str], error: str, retry_at: Optional[float]) -> None:
+        """Records a failed attempt; the leads are retried at `retry_at`, or failed for good if None."""
+        now = time.time()
+        status = FAILED if retry_at is None else QUEUED
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE leads SET status = ?, attempts = attempts + 1, last_error = ?, updated_at = ?,"
+                " next_attempt_at = ? WHERE id = ?",
+                [(status, error[:500], now, retry_at or now, i) for i in ids],
+            )
+
+    def defer(self, ids: List[str], reason: str, retry_at: float) -> None:
+        """Puts claimed leads back in the queue until `retry_at` without counting an attempt."""
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE leads SET status = ?, last_error = ?, updated_at = ?, next_attempt_at = ? WHERE id = ?",
+                [(QUEUED, reason[:500], time.time(), retry_at, i) for i in ids],
+            )
+
+    def get(self, tracking_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, attempts, last_error, created_at, updated_at, next_attempt_at FROM leads WHERE id = ?",
+                (tracking_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("status", "attempts", "last_error", "created_at", "updated_at", "next_attempt_at"), row))
+
+    def next_due_at(self) -> Optional[float]:
+        with self._lock:
+            (due,) = self._conn.execute("SELECT MIN(next_attempt_at) FROM leads WHERE status = ?", (QUEUED,)).fetchone()
+        return due
+
+    def counts(self) -> dict:
+        with self._lock:
+            return dict(self._conn.execute("SELECT status, COUNT(*) FROM leads GROUP BY status").fetchall())
+
+
+class LeadPipeline:
+    """
+    Buffers lead submissions and posts them to n8n in batches.
+
+    `submit` spools the lead and returns its tracking ID at once. A worker task on the
+    process's background loop (see `offload.background_loop`), started when the spool
+    is first opened, posts queued leads as a JSON array once `batch_size` are waiting or
+    the oldest has waited `batch_window` seconds. Failed batches are retried up to
+    `max_attempts` times with full-jitter exponential backoff; client errors other than
+    408/429 are not retried. These are the only retries: the webhook client does not
+    retry the lead webhooks itself.
+
+    Batches go to N8N_LEADNURTURE_BATCH_WEBHOOK_URL, which must accept an array of leads.
+    Without it each lead is posted on its own to N8N_LEADNURTURE_WEBHOOK_URL, as before.
+    """
+
+    def __init__(
+        self,
+        spool_path: str = ".lead_spool.sqlite3",
+        batch_size: int = 50,
+        batch_window: float = 2.0,
+        max_attempts: int = 5,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0,
+    ):
+        self.spool_path = spool_path
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._spool: Optional[LeadSpool] = None
+        self._spool_lock = threading.Lock()
+        self._worker: Optional["concurrent.futures.Future"] = None
+        self._worker_task: Optional[asyncio.Task] = None
+        self._worker_lock = threading.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._pending = 0  # Leads submitted since the last batch was claimed
+        self._closed = False  # Set by aclose(); only a new submission restarts the worker
+        self._backlog = False
+        self.batches_sent = 0
+        self.batch_failures = 0
+
+    @property
+    def spool(self) -> LeadSpool:
+        if self._spool is None:
+            with self._spool_lock:
+                if self._spool is None:
+                    self._spool = LeadSpool(self.spool_path)
+                    recovered = self._spool.requeue_interrupted()
+                    if recovered:
+                        logger.info("Re-queued %d leads interrupted by a restart.", recovered)
+            # Leads left from a previous run are delivered without waiting for a new one
+            self._autostart()
+        return self._spool
+
+    @property
+    def batched(self) -> bool:
+        return bool(webhook_client.url("lead_nurturing_batch"))
+
+    @property
+    def _limit(self) -> int:
+        return max(1, self.batch_size) if self.batched else 1
+
+    def _autostart(self) -> None:
+        if not self._closed:
+            self.start()
+
+    def start(self) -> None:
+        """
+        Starts the delivery task on the background loop if it is not running. Also done
+        when the spool is first opened and on every submit, status lookup and metrics
+        call. The task does not belong to any agent turn, so it keeps delivering after
+        the turn that submitted a lead has ended.
+        """
+        self._closed = False
+        with self._worker_lock:
+            if self._worker is None or self._worker.done():
+                self._worker = run_in_background(self._run())
+
+    def _submitted(self, count: int) -> None:
+        # Runs on the background loop, which owns the worker's state
+        self._pending += count
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def submit(self, lead: dict) -> str:
+        """Spools a lead for delivery and returns its tracking ID."""
+        return (await self.submit_many([lead]))[0]
+
+    async def submit_many(self, leads: List[dict]) -> List[str]:
+        """Spools many leads (e.g. a list import) in one write and returns their tracking IDs."""
+        ids = await run_blocking(self.spool.add, leads)
+        self.start()
+        background_loop().call_soon_threadsafe(self._submitted, len(ids))
+        return ids
+
+    async def status(self, tracking_id: str) -> Optional[dict]:
+        """The delivery state of a lead, or None if the tracking ID is unknown."""
+        self._autostart()
+        return await run_blocking(self.spool.get, tracking_id)
+
+    def _backoff(self, attempts: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempts))
+
+    async def _run(self) -> None:
+        self._worker_task = asyncio.current_task()
+        self._wakeup = asyncio.Event()
+        failures = 0
+        while True:
+            try:
+                await self._step()
+                failures = 0
+            except Exception:
+                # E.g. a SQLite error; the leads stay in the spool, so keep going after a pause
+                failures += 1
+                delay = min(self.backoff_max, self.backoff_base * 2 ** failures)
+                logger.exception("Lead delivery failed unexpectedly; retrying in %.0f s.", delay)
+                await asyncio.sleep(delay)
+
+    async def _step(self) -> None:
+        """Waits until leads are due and sends one batch of them."""
+        # Cleared before reading the spool so a submission in between is not missed
+        self._wakeup.clear()
+        due = await run_blocking(self.spool.next_due_at)
+        now = time.time()
+        if due is None or due > now:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), None if due is None else due - now)
+            except asyncio.TimeoutError:
+                pass
+            return
+        # Hold the batch open until it is full or its oldest lead has waited batch_window
+        while self._pending < self._limit and not self._backlog:
+            remaining = due + self.batch_window - time.time()
+            if remaining <= 0:
+                break
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+        await self.flush_due()
+
+    async def flush_due(self) -> int:
+        """Sends one batch of due leads now; returns how many were in it."""
+        limit = self._limit
+        claimed = await run_blocking(self.spool.claim, limit)
+        self._pending = max(0, self._pending - len(claimed))
+        # A full batch means more may be waiting, e.g. after a restart; send those without delay
+        self._backlog = len(claimed) == limit
+        if not claimed:
+            return 0
+        ids = [c[0] for c in claimed]
+        payloads = [c[1] for c in claimed]
+        attempts = max(c[2] for c in claimed) + 1
+        try:
+            if self.batched:
+                response = await webhook_client.apost("lead_nurturing_batch", json=payloads)
+            else:
+                response = await webhook_client.apost("lead_nurturing", json=payloads[0])
+            response.raise_for_status()
+        except asyncio.CancelledError:
+            # E.g. aclose(), or a drain() whose turn ended: put the leads back rather than
+            # leave them sending until a restart. n8n may have got them, so they can
+            # arrive twice, as with any at-least-once delivery.
+            self.spool.defer(ids, "Delivery was interrupted.", time.time())
+            raise
+        except CircuitOpenError as e:
+            # Nothing was sent, so this does not use up one of the leads' attempts
+            logger.info("Lead webhook circuit is open; holding %d leads for %.0f s.", len(ids), e.retry_after)
+            await run_blocking(self.spool.defer, ids, str(e), time.time() + e.retry_after)
+            return len(ids)
+        except Exception as e:
+            self.batch_failures += 1
+            retryable = not isinstance(e, (httpx.HTTPStatusError, ValueError)) or (
+                isinstance(e, httpx.HTTPStatusError)
+                and (e.response.status_code >= 500 or e.response.status_code in (408, 429))
+            )
+            retry_at = time.time() + self._backoff(attempts) if retryable and attempts < self.max_attempts else None
+            error = f"HTTP {e.response.status_code}" if isinstance(e, httpx.HTTPStatusError) else str(e) or type(e).__name__
+            logger.warning("Lead batch of %d failed (attempt %d, %s): %s", len(ids), attempts,
+                           "will retry" if retry_at else "giving up", error)
+            await run_blocking(self.spool.mark_failed_attempt, ids, error, retry_at)
+            return len(ids)
+        self.batches_sent += 1
+        await run_blocking(self.spool.mark_delivered, ids)
+        return len(ids)
+
+    async def drain(self, timeout: Optional[float] = None) -> None:
+        """Delivers everything that is due, including retries, or until `timeout` passes."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while deadline is None or time.monotonic() < deadline:
+            if await self.flush_due():
+                continue
+            due = await run_blocking(self.spool.next_due_at)
+            if due is None:
+                return
+            await asyncio.sleep(max(0.0, min(due - time.time(), 0.5)))
+
+    async def _stop(self) -> None:
+        task = self._worker_task
+        if task is not None and not task.done():
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+    async def aclose(self) -> None:
+        """Stops the delivery task; leads not yet delivered stay in the spool for the next start."""
+        self._closed = True
+        with self._worker_lock:
+            worker, self._worker = self._worker, None
+        if worker is not None and not worker.done():
+            await asyncio.wrap_future(run_in_background(self._stop()))
+
+    def metrics(self) -> dict:
+        self._autostart()
+        return {
+            "batched": self.batched,
+            "batches_sent": self.batches_sent,
+            "batch_failures": self.batch_failures,
+            "leads": self.spool.counts(),
+        }
+
+
+lead_pipeline = LeadPipeline(
+    spool_path=os.getenv("LEAD_SPOOL_PATH", ".lead_spool.sqlite3"),
+    batch_size=int(os.getenv("LEAD_BATCH_SIZE", 50)),
+    batch_window=float(os.getenv("LEAD_BATCH_WINDOW_SECONDS", 2.0)),
+    max_attempts=int(os.getenv("LEAD_MAX_ATTEMPTS", 5)),
+)
+
+if os.path.exists(lead_pipeline.spool_path):
+    # Leads left by an earlier run are delivered without waiting for a lead tool call
+    lead_pipeline.start()
@@ -0,0 +1,58 @@
+import asyncio
+import concurrent.futures
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=int(os.getenv("TOOL_THREAD_POOL_SIZE", 8)),
+                    thread_name_prefix="aimpact-tool",
+                )
+    return _executor
+
+
+async def run_blocking(func: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Runs blocking work (file I/O, sync client calls) from an async tool without stalling
+    the agent's event loop. The pool is bounded by TOOL_THREAD_POOL_SIZE, so a burst of
+    slow calls queues up instead of spawning a thread each.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), functools.partial(func, *args, **kwargs))
+
+
+def background_loop() -> asyncio.AbstractEventLoop:
+    """
+    An event loop on a daemon thread that lasts as long as the process. Agent Engine runs
+    each turn on its own loop (asyncio.run in a new thread), which is closed when the
+    turn ends and cancels whatever is still running on it; work that must outlive the
+    turn is run here instead.
+    """
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="aimpact-background", daemon=True).start()
+                _loop = loop
+    return _loop
+
+
+def run_in_background(coro: Awaitable[T]) -> "concurrent.futures.Future[T]":
+    """Schedules `coro` on the background loop from any thread; returns its future."""
+    return asyncio.run_coroutine_threadsafe(coro, background_loop())
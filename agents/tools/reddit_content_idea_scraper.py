@@ -1,22 +1,28 @@
+import asyncio
 import os
-import requests
-import json
 
-def get_reddit_content_ideas(keywords: str, subreddits: str):
-    """
-    Fetches content ideas from Reddit based on keywords and subreddits using an n8n webhook.
+import httpx
 
-    Args:
-        keywords (str): A comma-separated string of keywords.
-        subreddits (str): A comma-separated string of subreddits.
+from .cache import tool_cache
+from .webhook_client import webhook_client
 
-    Returns:
-        list: A list of content ideas, or an empty list if an error occurs.
+def _cache_inputs(keywords: str, subreddits: str) -> dict:
+    # The order of the comma-separated values and the r/ prefix do not change the result
+    return {
+        "keywords": sorted({k.strip().casefold() for k in keywords.split(",") if k.strip()}),
+        "subreddits": sorted({s.strip().replace("r/", "").casefold() for s in subreddits.split(",") if s.strip()}),
+    }
+
+@tool_cache.cached("reddit", ttl=3600, stale_ttl=3 * 3600, key_inputs=_cache_inputs)
+async def fetch_reddit_content_ideas(keywords: str, subreddits: str) -> list:
+    """
+    What get_reddit_content_ideas does, but raising on failure (httpx.HTTPError,
+    ValueError, or RuntimeError when the webhook is not configured) instead of returning
+    an empty list, so batch callers can tell a failed request from one with no ideas.
     """
     webhook_url = os.getenv("N8N_REDDIT_CONTENT_IDEA_WEBHOOK_URL")
     if not webhook_url:
-        print("Error: N8N_REDDIT_CONTENT_IDEA_WEBHOOK_URL not set in .env file.")
-        return []
+        raise RuntimeError("N8N_REDDIT_CONTENT_IDEA_WEBHOOK_URL not set in .env file.")
 
     # Clean subreddits by removing 'r/' prefix if present
     cleaned_subreddits = ",".join([s.strip().replace("r/", "") for s in subreddits.split(',')])
@@ -26,15 +32,27 @@ def get_reddit_content_ideas(keywords: str, subreddits: str):
         "Subreddit": cleaned_subreddits
     }
 
-    headers = {
-        "Content-Type": "application/json"
-    }
+    response = await webhook_client.apost("reddit", json=payload)
+    response.raise_for_status()  # Raise an exception for HTTP errors
+    return response.json()
 
+async def get_reddit_content_ideas(keywords: str, subreddits: str):
+    """
+    Fetches content ideas from Reddit based on keywords and subreddits using an n8n webhook.
+
+    Args:
+        keywords (str): A comma-separated string of keywords.
+        subreddits (str): A comma-separated string of subreddits.
+
+    Returns:
+        list: A list of content ideas, or an empty list if an error occurs.
+    """
     try:
-        response = requests.post(webhook_url, headers=headers, data=json.dumps(payload))
-        response.raise_for_status()  # Raise an exception for HTTP errors
-        return response.json()
-    except requests.exceptions.RequestException as e:
+        return await fetch_reddit_content_ideas(keywords, subreddits)
+    except RuntimeError as e:
+        print(f"Error: {e}")
+        return []
+    except (httpx.HTTPError, ValueError) as e:
         print(f"Error fetching Reddit content ideas: {e}")
         return []
 
@@ -48,7 +66,7 @@ if __name__ == "__main__":
     test_keywords = "farming"
     test_subreddits = "r/agriculture" # Changed to include r/ for testing the cleaning logic
 
-    ideas = get_reddit_content_ideas(test_keywords, test_subreddits)
+    ideas = asyncio.run(get_reddit_content_ideas(test_keywords, test_subreddits))
 
     if ideas:
         print("Successfully fetched content ideas:")
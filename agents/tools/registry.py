@@ -0,0 +1,76 @@
+import functools
+import importlib
+from typing import Any, Callable, Dict, List, Optional
+
+# Public name -> submodule of agents.tools that defines it. Nothing is imported until
+# a name is first looked up, so importing the package costs almost nothing.
+TOOL_MODULES: Dict[str, str] = {
+    "generate_seo_keywords": "seo_keyword_generator",
+    "seo_keyword_generator_tool": "seo_keyword_generator",
+    "google_trends_scraper": "google_trends_scraper",
+    "google_trends_scraper_tool": "google_trends_scraper",
+    "send_lead_for_nurturing": "lead_nurturing_tool",
+    "lead_nurturing_tool": "lead_nurturing_tool",
+    "get_lead_delivery_status": "lead_nurturing_tool",
+    "lead_delivery_status_tool": "lead_nurturing_tool",
+    "generate_twitter_threads": "youtube_to_twitter_thread_generator",
+    "get_reddit_content_ideas": "reddit_content_idea_scraper",
+    "generate_twitter_threads_batch": "fan_out",
+    "get_reddit_content_ideas_batch": "fan_out",
+    "start_seo_keywords_job": "job_tools",
+    "start_google_trends_job": "job_tools",
+    "get_job_status": "job_tools",
+    "wait_for_job": "job_tools",
+}
+
+# The tools the super agent is given, in this order
+AGENT_TOOLS: List[str] = [
+    "seo_keyword_generator_tool",
+    "lead_nurturing_tool",
+    "lead_delivery_status_tool",
+    "generate_twitter_threads",
+    "get_reddit_content_ideas",
+    "generate_twitter_threads_batch",
+    "get_reddit_content_ideas_batch",
+    "start_seo_keywords_job",
+    "start_google_trends_job",
+    "get_job_status",
+    "wait_for_job",
+]
+
+
+def resolve(name: str) -> Any:
+    """Imports the submodule that defines `name` and returns it."""
+    module_name = TOOL_MODULES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module 'agents.tools' has no attribute {name!r}")
+    module = importlib.import_module(f"{__package__}.{module_name}")
+    return getattr(module, name)
+
+
+def load_tools(names: Optional[List[str]] = None) -> List[Any]:
+    """The tool objects for `names` (default: AGENT_TOOLS), importing only what they need."""
+    return [resolve(name) for name in (AGENT_TOOLS if names is None else names)]
+
+
+@functools.lru_cache(maxsize=None)
+def function_tool(func: Callable) -> Any:
+    """Wraps `func` in an ADK FunctionTool, importing google.adk on first use."""
+    from google.adk.tools import FunctionTool
+
+    return FunctionTool(func=func)
+
+
+def lazy_tools(module_name: str, **tools: Callable) -> Callable[[str], Any]:
+    """
+    A module-level `__getattr__` that builds each named FunctionTool wrapper on first
+    access, so defining a tool does not import google.adk.
+    """
+
+    def __getattr__(name: str) -> Any:
+        func = tools.get(name)
+        if func is None:
+            raise AttributeError(f"module {module_name!r} has no attribute {name!r}")
+        return function_tool(func)
+
+    return __getattr__
@@ -0,0 +1,342 @@
+import asyncio
+import collections
+import logging
+import os
+import random
+import threading
+import time
+from typing import Awaitable, Callable, Deque, Dict, Optional
+
+import httpx
+
+logger = logging.getLogger("aimpact.tools.resilience")
+
+# Statuses worth another attempt: the workflow was busy or a proxy in front of it failed
+RETRY_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504})
+# Statuses that mean the request was not processed, so retrying cannot repeat a side effect
+UNPROCESSED_STATUSES = frozenset({425, 429, 503})
+# Transport errors raised before the request reached n8n
+UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+# Closes of discarded hedge responses still running; tasks are only weakly held by the loop
+_closing: set = set()
+
+
+def _close_response(task: asyncio.Future) -> None:
+    """Done callback that closes the response of a request nobody will read."""
+    if task.cancelled() or task.exception() is not None:
+        return
+    closing = asyncio.ensure_future(task.result().aclose())
+    _closing.add(closing)
+    closing.add_done_callback(_closing.discard)
+
+
+class CircuitOpenError(httpx.RequestError):
+    """Raised instead of calling a webhook whose circuit breaker is open."""
+
+    def __init__(self, name: str, retry_after: float, request: httpx.Request):
+        super().__init__(f"The {name} webhook is failing; not calling it for another {retry_after:.0f} s.", request=request)
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Stops calls to a webhook after `failure_threshold` consecutive failures.
+
+    Once open, calls are refused for `reset_timeout` seconds. After that one probe call
+    is let through (half-open): success closes the breaker, failure opens it again.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self.times_opened = 0
+        self.rejected = 0
+
+    def before_call(self) -> Optional[float]:
+        """Returns None if the call may go ahead, or the seconds until the next probe."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return None
+            remaining = self.opened_at + self.reset_timeout - self._clock()
+            if self.state == self.OPEN and remaining <= 0:
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return None
+            self.rejected += 1
+            return max(remaining, 0.0) or self.reset_timeout
+
+    def on_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def on_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+                self.state = self.OPEN
+                self.opened_at = self._clock()
+                self.times_opened += 1
+            self._probing = False
+
+    def on_abandoned(self) -> None:
+        """A call was cancelled before its outcome was known; frees the probe slot."""
+        with self._lock:
+            self._probing = False
+
+    def metrics(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+        }
+
+
+class _WebhookResilience:
+    __slots__ = ("breaker", "latencies", "attempts", "retries", "exhausted", "hedges", "hedge_wins")
+
+    def __init__(self, breaker: CircuitBreaker):
+        self.breaker = breaker
+        self.latencies: Deque[float] = collections.deque(maxlen=200)
+        self.attempts = 0
+        self.retries = 0
+        self.exhausted = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+
+class Resilience:
+    """
+    Retries, circuit breaking and hedging for webhook calls, kept per webhook.
+
+    Retries use full-jitter exponential backoff, or the server's Retry-After, for at most
+    `max_attempts` attempts. A webhook that is not idempotent is only retried when n8n
+    cannot have processed the request: connection failures and 425/429/503 responses.
+
+    With `hedge_after` set, an idempotent webhook marked for hedging gets a second,
+    parallel request if the first has not answered in time, and the first answer wins.
+    `hedge_after=0` uses the webhook's recent 95th percentile latency once 20 samples
+    are known.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        hedge_after: Optional[float] = None,
+    ):
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.hedge_after = hedge_after
+        self._lock = threading.Lock()
+        self._webhooks: Dict[str, _WebhookResilience] = {}
+
+    @classmethod
+    def from_env(cls) -> "Resilience":
+        hedge_after = os.getenv("N8N_HEDGE_AFTER_SECONDS")
+        return cls(
+            max_attempts=int(os.getenv("N8N_RETRY_MAX_ATTEMPTS", 3)),
+            backoff_base=float(os.getenv("N8N_RETRY_BACKOFF_SECONDS", 0.5)),
+            backoff_max=float(os.getenv("N8N_RETRY_BACKOFF_MAX_SECONDS", 8)),
+            failure_threshold=int(os.getenv("N8N_BREAKER_FAILURE_THRESHOLD", 5)),
+            reset_timeout=float(os.getenv("N8N_BREAKER_RESET_SECONDS", 30)),
+            hedge_after=float(hedge_after) if hedge_after else None,
+        )
+
+    def _state(self, name: str) -> _WebhookResilience:
+        state = self._webhooks.get(name)
+        if state is None:
+            with self._lock:
+                state = self._webhooks.get(name)
+                if state is None:
+                    state = self._webhooks[name] = _WebhookResilience(
+                        CircuitBreaker(self.failure_threshold, self.reset_timeout)
+                    )
+        return state
+
+    def breaker(self, name: str) -> CircuitBreaker:
+        return self._state(name).breaker
+
+    def check(self, name: str, url: str) -> None:
+        """Raises CircuitOpenError if the webhook's breaker refuses the call."""
+        retry_after = self.breaker(name).before_call()
+        if retry_after is not None:
+            raise CircuitOpenError(name, retry_after, httpx.Request("POST", url))
+
+    def _backoff(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        if response is not None:
+            retry_after = response.headers.get("retry-after", "")
+            if retry_after.isdigit():
+                return min(float(retry_after), self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+
+    def record(self, name: str, response: Optional[httpx.Response] = None, error: Optional[Exception] = None) -> bool:
+        """Records a finished attempt with the webhook's breaker; returns True if it failed."""
+        failed = error is not None or response.status_code >= 500 or response.status_code in RETRY_STATUSES
+        breaker = self.breaker(name)
+        if failed:
+            breaker.on_failure()
+        else:
+            breaker.on_success()
+        return failed
+
+    def _outcome(self, name: str, attempt: int, idempotent: bool, response=None, error=None, retry: bool = True) -> Optional[float]:
+        """Records an attempt with the breaker; returns the delay before a retry, or None to stop."""
+        if not self.record(name, response, error) or not retry:
+            return None
+        if error is not None:
+            retryable = isinstance(error, UNSENT_ERRORS if not idempotent else httpx.TransportError)
+        else:
+            retryable = response.status_code in (RETRY_STATUSES if idempotent else UNPROCESSED_STATUSES)
+        if not retryable:
+            return None
+        state = self._state(name)
+        if attempt >= self.max_attempts:
+            state.exhausted += 1
+            return None
+        state.retries += 1
+        return self._backoff(attempt, response)
+
+    async def acall(
+        self,
+        name: str,
+        url: str,
+        send: Callable[[], Awaitable[httpx.Response]],
+        idempotent: bool = True,
+        hedge: bool = False,
+        retry: bool = True,
+    ) -> httpx.Response:
+        """
+        Runs `send` under the webhook's breaker and retry policy; returns the last response.
+        With `retry=False` only the breaker applies, for callers that retry on their own.
+        """
+        state = self._state(name)
+        attempt = 0
+        while True:
+            attempt += 1
+            self.check(name, url)
+            state.attempts += 1
+            started = time.perf_counter()
+            try:
+                if hedge and idempotent:
+                    response = await self._hedged(state, send)
+                else:
+                    response = await send()
+            except httpx.TransportError as e:
+                delay = self._outcome(name, attempt, idempotent, error=e, retry=retry)
+                if delay is None:
+                    raise
+            except BaseException:
+                state.breaker.on_abandoned()
+                raise
+            else:
+                if not response.is_error:
+                    state.latencies.append(time.perf_counter() - started)
+                delay = self._outcome(name, attempt, idempotent, response=response, retry=retry)
+                if delay is None:
+                    return response
+                await response.aclose()
+            logger.info("Retrying the %s webhook in %.2f s (attempt %d of %d).", name, delay, attempt + 1, self.max_attempts)
+            await asyncio.sleep(delay)
+
+    def call(
+        self, name: str, url: str, send: Callable[[], httpx.Response], idempotent: bool = True, retry: bool = True
+    ) -> httpx.Response:
+        """Blocking form of `acall`, without hedging."""
+        state = self._state(name)
+        attempt = 0
+        while True:
+            attempt += 1
+            self.check(name, url)
+            state.attempts += 1
+            try:
+                response = send()
+            except httpx.TransportError as e:
+                delay = self._outcome(name, attempt, idempotent, error=e, retry=retry)
+                if delay is None:
+                    raise
+            except BaseException:
+                state.breaker.on_abandoned()
+                raise
+            else:
+                delay = self._outcome(name, attempt, idempotent, response=response, retry=retry)
+                if delay is None:
+                    return response
+                response.close()
+            time.sleep(delay)
+
+    def _hedge_delay(self, state: _WebhookResilience) -> Optional[float]:
+        if self.hedge_after is None:
+            return None
+        if self.hedge_after > 0:
+            return self.hedge_after
+        if len(state.latencies) < 20:
+            return None
+        ordered = sorted(state.latencies)
+        return ordered[int(len(ordered) * 0.95) - 1]
+
+    async def _hedged(self, state: _WebhookResilience, send: Callable[[], Awaitable[httpx.Response]]) -> httpx.Response:
+        delay = self._hedge_delay(state)
+        if delay is None:
+            return await send()
+        first = asyncio.ensure_future(send())
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        if done:
+            return first.result()
+        state.hedges += 1
+        hedge = asyncio.ensure_future(send())
+        pending = {first, hedge}
+        returned = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    returned = task
+                    if task.exception() is None and task.result().status_code < 500:
+                        state.hedge_wins += task is hedge
+                        return task.result()
+            # Both failed: report the one that finished last
+            return returned.result()
+        finally:
+            # The loser may still be running, or may have finished with a response nobody reads
+            for task in (first, hedge):
+                if task is not returned:
+                    task.cancel()
+                    task.add_done_callback(_close_response)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            webhooks = dict(self._webhooks)
+        return {
+            name: dict(
+                state.breaker.metrics(),
+                attempts=state.attempts,
+                retries=state.retries,
+                retries_exhausted=state.exhausted,
+                hedges=state.hedges,
+                hedge_wins=state.hedge_wins,
+            )
+            for name, state in webhooks.items()
+        }
+
+
+resilience = Resilience.from_env()
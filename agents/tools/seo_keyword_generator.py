@@ -1,15 +1,14 @@
+import asyncio
 import os
-import sys
-print(f"PYTHONPATH: {os.environ.get('PYTHONPATH')}")
-print(f"sys.path: {sys.path}")
-import requests
+import httpx
 import json
 from pydantic import BaseModel, Field
 from typing import Optional  # <-- Add this!
-from google.adk.tools import FunctionTool 
-from dotenv import load_dotenv
 
-load_dotenv() # Load environment variables from .env file
+from .cache import tool_cache
+from .jobs import WorkflowFailed, await_workflow_result, job_headers
+from .registry import lazy_tools
+from .webhook_client import webhook_client
 
 class SeoKeywordGeneratorInputs(BaseModel):
     product_name: str = Field(description="Identifies the product (e.g., FleetIQ).")
@@ -24,7 +23,23 @@ class SeoKeywordGeneratorOutputs(BaseModel):
     keywords: list[str] = Field(description="A list of generated SEO keywords.")
     explanation: str = Field(description="A brief explanation of the keyword strategy or categories.")
 
-def generate_seo_keywords(**kwargs) -> SeoKeywordGeneratorOutputs:
+def _cache_inputs(**kwargs) -> Optional[SeoKeywordGeneratorInputs]:
+    # Same unwrapping as the tool; inputs that do not validate are not cached
+    input_data = kwargs['inputs'] if isinstance(kwargs.get('inputs'), dict) else kwargs
+    try:
+        return SeoKeywordGeneratorInputs(**input_data)
+    except Exception:
+        return None
+
+@tool_cache.cached(
+    "seo",
+    ttl=6 * 3600,
+    stale_ttl=18 * 3600,
+    key_inputs=_cache_inputs,
+    output_model=SeoKeywordGeneratorOutputs,
+    cacheable=lambda outputs: bool(outputs.keywords),
+)
+async def generate_seo_keywords(**kwargs) -> SeoKeywordGeneratorOutputs:
     """Generates SEO keywords based on product information and target audience insights via an n8n webhook."""
     # The LLM is passing arguments nested under an 'inputs' key.
     # Extract the actual input dictionary.
@@ -60,17 +75,21 @@ def generate_seo_keywords(**kwargs) -> SeoKeywordGeneratorOutputs:
     # Removed API key from headers as authorization is no longer required
 
     try:
-        response = requests.post(n8n_webhook_url, json=payload, headers=headers, timeout=60)
+        response = await webhook_client.apost("seo", json=payload, headers=dict(headers, **job_headers()))
         response.raise_for_status()  # Raise an exception for HTTP errors (4xx or 5xx)
-        
-        content_type = response.headers.get("Content-Type", "")
-        if "application/json" not in content_type:
-            return SeoKeywordGeneratorOutputs(
-                keywords=[], 
-                explanation=f"Error: n8n webhook did not return JSON. Response: {response.text[:200]}"
-            )
-        
-        response_data = response.json()
+
+        if response.status_code == 202:
+            # The workflow runs asynchronously; its result arrives by polling or callback
+            response_data = await await_workflow_result("seo", response)
+        else:
+            content_type = response.headers.get("Content-Type", "")
+            if "application/json" not in content_type:
+                return SeoKeywordGeneratorOutputs(
+                    keywords=[], 
+                    explanation=f"Error: n8n webhook did not return JSON. Response: {response.text[:200]}"
+                )
+
+            response_data = response.json()
 
         # MODIFICATION START: Handle the list of keyword objects
         if isinstance(response_data, list):
@@ -105,18 +124,23 @@ def generate_seo_keywords(**kwargs) -> SeoKeywordGeneratorOutputs:
             explanation=response_data.get("explanation", "Keywords generated by n8n workflow. (Explanation may not be provided)")
         )
 
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         return SeoKeywordGeneratorOutputs(keywords=[], explanation=f"Request to n8n webhook failed: {e}")
+    except WorkflowFailed as e:
+        return SeoKeywordGeneratorOutputs(keywords=[], explanation=f"The n8n workflow failed: {e}")
     except json.JSONDecodeError as e:
         return SeoKeywordGeneratorOutputs(keywords=[], explanation=f"Failed to decode JSON response from n8n webhook: {e}. Response text: {response.text[:200]}")
     except Exception as e:
         return SeoKeywordGeneratorOutputs(keywords=[], explanation=f"An unexpected error occurred: {e}")
 
-# --- CORRECTED INITIALIZATION ---
-seo_keyword_generator_tool = FunctionTool(func=generate_seo_keywords)
+# seo_keyword_generator_tool: built on first access
+__getattr__ = lazy_tools(__name__, seo_keyword_generator_tool=generate_seo_keywords)
 
 # --- Local Testing for the tool --- (Optional)
 if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv() # Load environment variables from .env file
     sample_inputs = SeoKeywordGeneratorInputs(
         product_name="AI-Powered Email Marketing Platform",
         target_audience_pain_points=["Low email open rates", "Difficulty personalizing emails at scale", "Wasting time on manual email campaigns"],
@@ -128,7 +152,7 @@ if __name__ == "__main__":
     
     print(f"Attempting to call n8n webhook at: {os.getenv('N8N_SEO_WEBHOOK_URL')}")
     try:
-        output = generate_seo_keywords(sample_inputs)
+        output = asyncio.run(generate_seo_keywords(inputs=sample_inputs.model_dump()))
         print("\n--- Tool Output ---")
         print(f"Keywords: {output.keywords}")
         print(f"Explanation: {output.explanation}")
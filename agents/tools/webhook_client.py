@@ -0,0 +1,293 @@
+import asyncio
+import atexit
+import contextlib
+import os
+import threading
+import time
+import weakref
+from dataclasses import dataclass
+from typing import AsyncIterator, Awaitable, Callable, Optional
+
+import httpx
+
+from .offload import background_loop, run_in_background
+from .resilience import Resilience, resilience as default_resilience
+
+
+@dataclass(frozen=True)
+class Webhook:
+    """
+    An n8n webhook: the environment variable holding its URL, its default timeout in
+    seconds, whether repeating a call is harmless (so any failure may be retried),
+    whether slow calls may be hedged with a second request, and whether the client
+    retries failed calls at all (not when the caller has its own retries).
+    """
+    url_env: str
+    timeout: float
+    idempotent: bool = True
+    hedge: bool = False
+    retry: bool = True
+
+
+# n8n workflows differ a lot in how long they run; each timeout can be overridden with
+# N8N_<NAME>_TIMEOUT_SECONDS (e.g. N8N_SEO_TIMEOUT_SECONDS=90).
+WEBHOOKS = {
+    "seo": Webhook("N8N_SEO_WEBHOOK_URL", 60.0),
+    "reddit": Webhook("N8N_REDDIT_CONTENT_IDEA_WEBHOOK_URL", 120.0, hedge=True),
+    "twitter": Webhook("N8N_YOUTUBE_TO_TWITTER_WEBHOOK_URL", 120.0),
+    # Each call starts an email sequence. lead_pipeline retries these from its spool.
+    "lead_nurturing": Webhook("N8N_LEADNURTURE_WEBHOOK_URL", 30.0, idempotent=False, retry=False),
+    # Takes a JSON array of leads, see lead_pipeline
+    "lead_nurturing_batch": Webhook("N8N_LEADNURTURE_BATCH_WEBHOOK_URL", 60.0, idempotent=False, retry=False),
+    "google_trends": Webhook("N8N_GTRENDS_WEBHOOK_URL", 160.0),
+}
+
+
+async def _close_with_loop(client: httpx.AsyncClient) -> None:
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await client.aclose()
+
+
+class _WebhookStats:
+    __slots__ = ("requests", "errors", "seconds_total", "seconds_max")
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.seconds_total = 0.0
+        self.seconds_max = 0.0
+
+
+class WebhookClient:
+    """
+    Pooled HTTP clients shared by every n8n webhook tool.
+
+    Tools used to open a new connection (TCP, and TLS for https) on every call. This keeps
+    one keep-alive pool for blocking callers and one for async callers, so consecutive
+    tool calls to the same n8n host reuse warm connections. Agent Engine runs each turn
+    on a new event loop, and an httpx.AsyncClient must not be shared between loops, so
+    async requests are sent from the process's background loop (see
+    `offload.background_loop`) with that loop's client, whichever turn makes them.
+    `astream` reads its body on the caller's loop and so uses a client of that loop,
+    which is closed when `asyncio.run` shuts the loop down. The clients are created
+    lazily and closed at interpreter exit.
+
+    Every call goes through the webhook's circuit breaker and retry policy (see
+    resilience.py). `stats()` reports per-webhook request counts and latency, breaker and
+    retry counters, and how many connections were actually opened, counted through
+    httpcore's trace hook.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 50,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 60.0,
+        connect_timeout: float = 10.0,
+        resilience: Optional[Resilience] = None,
+    ):
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.connect_timeout = connect_timeout
+        self.resilience = resilience or default_resilience
+        self._lock = threading.Lock()
+        self._client: Optional[httpx.Client] = None
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+        self._closers: set = set()
+        self._stats = {}
+        self.connections_opened = 0
+
+    def url(self, name: str) -> Optional[str]:
+        return os.getenv(WEBHOOKS[name].url_env)
+
+    def timeout(self, name: str) -> httpx.Timeout:
+        override = os.getenv(f"N8N_{name.upper()}_TIMEOUT_SECONDS")
+        total = float(override) if override else WEBHOOKS[name].timeout
+        return httpx.Timeout(total, connect=min(self.connect_timeout, total))
+
+    @property
+    def client(self) -> httpx.Client:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = httpx.Client(limits=self._limits)
+        return self._client
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        """The AsyncClient of the running event loop."""
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = self._async_clients[loop] = httpx.AsyncClient(limits=self._limits)
+            if loop is not background_loop():
+                # asyncio.run cancels the tasks left when its coroutine returns, which closes the client
+                closer = loop.create_task(_close_with_loop(client))
+                self._closers.add(closer)
+                closer.add_done_callback(self._closers.discard)
+        return client
+
+    def _count_connection(self, event_name: str) -> None:
+        if event_name == "connection.connect_tcp.complete":
+            with self._lock:
+                self.connections_opened += 1
+
+    def _trace(self, event_name: str, info: dict) -> None:
+        self._count_connection(event_name)
+
+    async def _atrace(self, event_name: str, info: dict) -> None:
+        self._count_connection(event_name)
+
+    def _record(self, name: str, seconds: float, failed: bool) -> None:
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = _WebhookStats()
+            stats.requests += 1
+            stats.errors += failed
+            stats.seconds_total += seconds
+            stats.seconds_max = max(stats.seconds_max, seconds)
+
+    def post(self, name: str, **kwargs) -> httpx.Response:
+        """POSTs to the named webhook from blocking code. Raises ValueError if its URL is not set."""
+        url = self.url(name)
+        if not url:
+            raise ValueError(f"{WEBHOOKS[name].url_env} environment variable not set.")
+
+        def send() -> httpx.Response:
+            started = time.perf_counter()
+            failed = True
+            try:
+                response = self.client.post(url, timeout=self.timeout(name), extensions={"trace": self._trace}, **kwargs)
+                failed = response.is_error
+                return response
+            finally:
+                self._record(name, time.perf_counter() - started, failed)
+
+        webhook = WEBHOOKS[name]
+        return self.resilience.call(name, url, send, idempotent=webhook.idempotent, retry=webhook.retry)
+
+    async def apost(self, name: str, **kwargs) -> httpx.Response:
+        """POSTs to the named webhook from a coroutine. Raises ValueError if its URL is not set."""
+        url = self.url(name)
+        if not url:
+            raise ValueError(f"{WEBHOOKS[name].url_env} environment variable not set.")
+
+        webhook = WEBHOOKS[name]
+        send = self._async_sender("POST", name, url, kwargs)
+        return await self.resilience.acall(
+            name, url, send, idempotent=webhook.idempotent, hedge=webhook.hedge, retry=webhook.retry
+        )
+
+    async def aget(self, name: str, url: str, **kwargs) -> httpx.Response:
+        """
+        GETs a URL of the named webhook's workflow (such as the status URL of a run n8n
+        accepted with 202) under the webhook's breaker and retry policy. A GET is always
+        retried as idempotent.
+        """
+        return await self.resilience.acall(name, url, self._async_sender("GET", name, url, kwargs))
+
+    def _async_sender(self, method: str, name: str, url: str, kwargs: dict) -> Callable[[], Awaitable[httpx.Response]]:
+        async def request() -> httpx.Response:
+            started = time.perf_counter()
+            failed = True
+            try:
+                response = await self.async_client.request(
+                    method, url, timeout=self.timeout(name), extensions={"trace": self._atrace}, **kwargs
+                )
+                failed = response.is_error
+                return response
+            finally:
+                self._record(name, time.perf_counter() - started, failed)
+
+        async def send() -> httpx.Response:
+            # The body is read before the response comes back, so it is usable on any loop
+            if asyncio.get_running_loop() is background_loop():
+                return await request()
+            return await asyncio.wrap_future(run_in_background(request()))
+
+        return send
+
+    @contextlib.asynccontextmanager
+    async def astream(self, name: str, **kwargs) -> AsyncIterator[httpx.Response]:
+        """
+        POSTs to the named webhook and yields the response before its body is read, for
+        bodies too large to hold in memory. The timeout applies to each read, not the whole
+        download. The circuit breaker applies, but a half-read body cannot be retried.
+        Raises ValueError if the URL is not set.
+        """
+        url = self.url(name)
+        if not url:
+            raise ValueError(f"{WEBHOOKS[name].url_env} environment variable not set.")
+        self.resilience.check(name, url)
+        started = time.perf_counter()
+        response = error = None
+        try:
+            async with self.async_client.stream(
+                "POST", url, timeout=self.timeout(name), extensions={"trace": self._atrace}, **kwargs
+            ) as response:
+                yield response
+        except httpx.TransportError as e:
+            error = e  # Including a download that broke off part way
+            raise
+        finally:
+            self._record(name, time.perf_counter() - started, error is not None or response is None or response.is_error)
+            if error is None and response is None:
+                self.resilience.breaker(name).on_abandoned()
+            else:
+                # Judged like an `apost` attempt, so a 4xx does not count against the breaker
+                self.resilience.record(name, response, error)
+
+    def close(self) -> None:
+        """Closes the blocking client. Async clients are closed with `aclose()` on their loop."""
+        with self._lock:
+            client, self._client = self._client, None
+        if client is not None:
+            client.close()
+
+    async def aclose(self) -> None:
+        """Closes the running loop's async client and the blocking client."""
+        client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+        self.close()
+
+    def _close_at_exit(self) -> None:
+        self.close()
+        loop = background_loop()
+        client = self._async_clients.pop(loop, None)
+        if client is not None and loop.is_running():
+            with contextlib.suppress(Exception):
+                run_in_background(client.aclose()).result(timeout=5)
+
+    def stats(self) -> dict:
+        with self._lock:
+            requests = sum(s.requests for s in self._stats.values())
+            return {
+                "connections_opened": self.connections_opened,
+                "requests": requests,
+                "requests_per_connection": round(requests / self.connections_opened, 2) if self.connections_opened else 0.0,
+                "webhooks": {
+                    name: {
+                        "requests": s.requests,
+                        "errors": s.errors,
+                        "latency_ms_avg": round(s.seconds_total / s.requests * 1000, 1) if s.requests else 0.0,
+                        "latency_ms_max": round(s.seconds_max * 1000, 1),
+                    }
+                    for name, s in self._stats.items()
+                },
+                "resilience": self.resilience.metrics(),
+            }
+
+
+webhook_client = WebhookClient(
+    max_connections=int(os.getenv("N8N_MAX_CONNECTIONS", 50)),
+    max_keepalive_connections=int(os.getenv("N8N_MAX_KEEPALIVE_CONNECTIONS", 20)),
+    keepalive_expiry=float(os.getenv("N8N_KEEPALIVE_EXPIRY_SECONDS", 60)),
+)
+atexit.register(webhook_client._close_at_exit)
@@ -1,13 +1,10 @@
-import requests
+import asyncio
+import httpx
 import os
-from dotenv import load_dotenv
 
-# Load environment variables from .env file
-load_dotenv()
+from .webhook_client import webhook_client
 
-N8N_YOUTUBE_TO_TWITTER_WEBHOOK_URL = os.getenv("N8N_YOUTUBE_TO_TWITTER_WEBHOOK_URL")
-
-def generate_twitter_threads(
+async def generate_twitter_threads(
     keyword: str,
     target_audience: str,
     content_type: str
@@ -23,7 +20,8 @@ def generate_twitter_threads(
     Returns:
         dict: A dictionary containing the generated Twitter threads or an error message.
     """
-    if not N8N_YOUTUBE_TO_TWITTER_WEBHOOK_URL:
+    webhook_url = webhook_client.url("twitter")
+    if not webhook_url:
         return {"error": "N8N_YOUTUBE_TO_TWITTER_WEBHOOK_URL environment variable not set."}
 
     payload = {
@@ -33,30 +31,33 @@ def generate_twitter_threads(
     }
 
     try:
-        print(f"Attempting to send request to: {N8N_YOUTUBE_TO_TWITTER_WEBHOOK_URL}")
+        print(f"Attempting to send request to: {webhook_url}")
         print(f"Payload: {payload}")
 
-        response = requests.post(N8N_YOUTUBE_TO_TWITTER_WEBHOOK_URL, json=payload)
-        response.raise_for_status()  # Raise an HTTPError for bad responses (4xx or 5xx)
+        response = await webhook_client.apost("twitter", json=payload)
+        response.raise_for_status()  # Raise an HTTPStatusError for bad responses (4xx or 5xx)
 
         return response.json()
 
-    except requests.exceptions.HTTPError as http_err:
+    except httpx.HTTPStatusError as http_err:
         print(f"HTTP error occurred: {http_err}")
-        print(f"Response content: {response.text}")
-        return {"error": f"HTTP error: {http_err}", "details": response.text}
-    except requests.exceptions.ConnectionError as conn_err:
+        print(f"Response content: {http_err.response.text}")
+        return {"error": f"HTTP error: {http_err}", "details": http_err.response.text}
+    except httpx.NetworkError as conn_err:
         print(f"Connection error occurred: {conn_err}")
         return {"error": f"Connection error: {conn_err}"}
-    except requests.exceptions.Timeout as timeout_err:
+    except httpx.TimeoutException as timeout_err:
         print(f"Timeout error occurred: {timeout_err}")
         return {"error": f"Timeout error: {timeout_err}"}
-    except requests.exceptions.RequestException as req_err:
+    except (httpx.HTTPError, ValueError) as req_err:
         print(f"An unexpected error occurred: {req_err}")
         return {"error": f"An unexpected error occurred: {req_err}"}
 
 
 if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv() # Load environment variables from .env file
     # Example usage:
     # Ensure N8N_YOUTUBE_TO_TWITTER_WEBHOOK_URL is set in your .env file
     # For testing, you might temporarily set it like this if not using .env:
@@ -68,7 +69,7 @@ if __name__ == "__main__":
     test_target_audience = "Healthcare Professionals"
     test_content_type = "Educational"
 
-    result = generate_twitter_threads(test_keyword, test_target_audience, test_content_type)
+    result = asyncio.run(generate_twitter_threads(test_keyword, test_target_audience, test_content_type))
 
     if "error" in result:
         print(f"Error: {result['error']}")
@@ -0,0 +1,230 @@
+import asyncio
+import collections
+import math
+import time
+from typing import Callable, Deque, Dict, Optional
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed; carries the HTTP status and the Retry-After hint."""
+
+    def __init__(self, status_code: int, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, holding at most `burst`."""
+
+    __slots__ = ("rate", "burst", "tokens", "updated_at", "_clock")
+
+    def __init__(self, rate: float, burst: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self._clock = clock
+        self.updated_at = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def try_take(self) -> float:
+        """Takes a token and returns 0, or returns the seconds until one is available."""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    @property
+    def full(self) -> bool:
+        self._refill()
+        return self.tokens >= self.burst
+
+
+class Permit:
+    """An admitted request's slot; released once its upstream turn is over."""
+
+    __slots__ = ("_controller", "user_id", "admitted_at", "released")
+
+    def __init__(self, controller: "AdmissionController", user_id: str, admitted_at: float):
+        self._controller = controller
+        self.user_id = user_id
+        self.admitted_at = admitted_at
+        self.released = False
+
+    def release(self) -> None:
+        if not self.released:
+            self.released = True
+            self._controller._release(self)
+
+
+class AdmissionController:
+    """
+    Decides whether a new agent turn may start.
+
+    Checks, in order: the caller's concurrency cap (429), the caller's token bucket (429
+    when empty), then the global concurrency cap. Requests over the global cap
+    wait in a bounded FIFO queue for up to `max_wait` seconds. A request is shed at once
+    with a 503 when the queue is full, or when the expected wait (queue position times
+    the average slot hold time, spread over `max_concurrent` slots) is already longer than
+    `max_wait`, rather than letting it time out in the queue. Every rejection carries a
+    Retry-After estimate.
+
+    A value of 0 for `max_concurrent`, `max_per_user` or `rate` disables that check.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = 200,
+        max_per_user: int = 0,
+        max_queue: int = 500,
+        max_wait: float = 10.0,
+        rate: float = 0.0,
+        burst: float = 10.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_per_user = max_per_user
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self._clock = clock
+        self.active = 0
+        self._per_user: Dict[str, int] = {}  # Admitted or queued requests per user
+        self._queue: Deque[asyncio.Future] = collections.deque()
+        self._buckets: Dict[str, TokenBucket] = {}
+        # Exponentially weighted average of how long a slot is held, seeds the wait estimate
+        self.avg_hold_seconds: Optional[float] = None
+
+        self.admitted = 0
+        self.queued_total = 0
+        self.queue_depth_max = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.rejected = collections.Counter()
+
+    def _bucket(self, user_id: str) -> TokenBucket:
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            if len(self._buckets) >= 10000:
+                # A full bucket is the same as a fresh one, so dropping it loses nothing
+                for key in [k for k, b in self._buckets.items() if b.full]:
+                    del self._buckets[key]
+            bucket = self._buckets[user_id] = TokenBucket(self.rate, self.burst, self._clock)
+        return bucket
+
+    def _reject(self, status_code: int, reason: str, retry_after: float) -> AdmissionRejected:
+        self.rejected[reason] += 1
+        return AdmissionRejected(status_code, reason, retry_after)
+
+    def _expected_wait(self, position: int) -> float:
+        if self.avg_hold_seconds is None or not self.max_concurrent:
+            return 0.0
+        return position * self.avg_hold_seconds / self.max_concurrent
+
+    async def acquire(self, user_id: str) -> Permit:
+        """Returns a Permit once the request may start, or raises AdmissionRejected."""
+        # Queued requests count towards the caller's cap too, so one user cannot fill the
+        # queue. Checked before the token bucket, so a request turned away here does not
+        # use up one of the caller's rate tokens.
+        if self.max_per_user and self._per_user.get(user_id, 0) >= self.max_per_user:
+            raise self._reject(429, "user_concurrency", self.avg_hold_seconds or 1.0)
+
+        if self.rate:
+            retry_after = self._bucket(user_id).try_take()
+            if retry_after:
+                raise self._reject(429, "rate_limited", retry_after)
+
+        self._per_user[user_id] = self._per_user.get(user_id, 0) + 1
+        try:
+            if self.max_concurrent and (self.active >= self.max_concurrent or self._queue):
+                position = len(self._queue) + 1
+                expected_wait = self._expected_wait(position)
+                if position > self.max_queue:
+                    raise self._reject(503, "queue_full", expected_wait or self.max_wait)
+                if expected_wait > self.max_wait:
+                    raise self._reject(503, "expected_wait", expected_wait)
+                await self._wait_for_slot()
+            else:
+                self.active += 1
+        except BaseException:
+            self._forget(user_id)
+            raise
+
+        self.admitted += 1
+        return Permit(self, user_id, self._clock())
+
+    def _forget(self, user_id: str) -> None:
+        remaining = self._per_user.get(user_id, 0) - 1
+        if remaining > 0:
+            self._per_user[user_id] = remaining
+        else:
+            self._per_user.pop(user_id, None)
+
+    async def _wait_for_slot(self) -> None:
+        waiter = asyncio.get_running_loop().create_future()
+        self._queue.append(waiter)
+        self.queued_total += 1
+        self.queue_depth_max = max(self.queue_depth_max, len(self._queue))
+        started = self._clock()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.max_wait)
+        except asyncio.TimeoutError:
+            if waiter.done():
+                # Granted at the same moment the deadline passed, give the slot back
+                self._hand_over()
+            raise self._reject(503, "queue_timeout", self._expected_wait(len(self._queue)) or self.max_wait)
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._hand_over()
+            raise
+        finally:
+            if not waiter.done():
+                waiter.cancel()
+                self._queue.remove(waiter)
+            waited = self._clock() - started
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def _hand_over(self) -> None:
+        """Passes a held slot to the next live waiter, or frees it."""
+        while self._queue:
+            waiter = self._queue.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def _release(self, permit: Permit) -> None:
+        held = self._clock() - permit.admitted_at
+        self.avg_hold_seconds = held if self.avg_hold_seconds is None else 0.9 * self.avg_hold_seconds + 0.1 * held
+        self._forget(permit.user_id)
+        if self.max_concurrent:
+            self._hand_over()
+        else:
+            self.active -= 1
+
+    def metrics(self) -> dict:
+        return {
+            "active": self.active,
+            "users": len(self._per_user),
+            "max_concurrent": self.max_concurrent,
+            "queue_depth": len(self._queue),
+            "queue_depth_max": self.queue_depth_max,
+            "admitted": self.admitted,
+            "queued_total": self.queued_total,
+            "wait_ms_avg": round(self.wait_seconds_total / self.queued_total * 1000, 3) if self.queued_total else 0.0,
+            "wait_ms_max": round(self.wait_seconds_max * 1000, 3),
+            "avg_hold_seconds": round(self.avg_hold_seconds, 3) if self.avg_hold_seconds is not None else None,
+            "rejected": dict(self.rejected),
+        }
@@ -1,45 +1,250 @@
-from flask import Flask, request, jsonify, Response
-from flask_cors import CORS
-import google.auth
-import google.auth.transport.requests
-import requests
+import asyncio
+import contextlib
+import json
+import logging
 import os
+import time
+import uuid
+
+import httpx
+import uvicorn
 from dotenv import load_dotenv
-import json
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from admission import AdmissionController, AdmissionRejected
+from auth import TokenManager
+from capture import CaptureFactory
+from ndjson import NDJSONParser, aiter_ndjson
+from replay import InMemoryReplayStore
+from sse import EventStreamResponse, coalesce, coalescing_totals, sse_frame
+from turn_stats import TurnStats
+from turns import TurnRegistry, parse_last_event_id, single_flight_key
+from upstream import UpstreamClient, UpstreamIdleTimeout, iter_with_idle_timeout
 
 load_dotenv()  # Load environment variables from .env file
 
-app = Flask(__name__)
-CORS(app)  # Enable CORS for all origins for simplicity during development
+logger = logging.getLogger("aimpact.backend")
 
 AGENT_ENGINE_QUERY_URL = os.environ.get("AGENT_ENGINE_QUERY_URL")
 
-@app.route('/query-agent', methods=['POST'])
-def query_agent():
+
+def _env_float(name: str, default=None):
+    value = os.environ.get(name)
+    return float(value) if value else default
+
+
+# Process-wide: credentials are loaded once and the token is refreshed in the background
+token_manager = TokenManager(
+    refresh_margin=_env_float("TOKEN_REFRESH_MARGIN_SECONDS", 300.0),
+)
+
+# Process-wide keep-alive pool for Agent Engine calls
+upstream = UpstreamClient(
+    max_connections=int(os.environ.get("UPSTREAM_MAX_CONNECTIONS", 200)),
+    max_keepalive_connections=int(os.environ.get("UPSTREAM_MAX_KEEPALIVE", 50)),
+    max_per_host=int(os.environ.get("UPSTREAM_MAX_PER_HOST", 200)),
+    keepalive_expiry=_env_float("UPSTREAM_KEEPALIVE_EXPIRY_SECONDS", 30.0),
+    connect_timeout=_env_float("UPSTREAM_CONNECT_TIMEOUT_SECONDS", 10.0),
+    read_timeout=_env_float("UPSTREAM_READ_TIMEOUT_SECONDS"),
+)
+
+# What to keep of each raw Agent Engine response for logging: off, headtail, sampled or spool
+response_capture = CaptureFactory(
+    mode=os.environ.get("RESPONSE_CAPTURE_MODE", "headtail"),
+    max_bytes=int(os.environ.get("RESPONSE_CAPTURE_MAX_BYTES", 1024 * 1024)),
+    head_bytes=int(os.environ.get("RESPONSE_CAPTURE_HEAD_BYTES", 4096)),
+    tail_bytes=int(os.environ.get("RESPONSE_CAPTURE_TAIL_BYTES", 4096)),
+    sample_rate=_env_float("RESPONSE_CAPTURE_SAMPLE_RATE", 0.01),
+    spool_path=os.environ.get("RESPONSE_CAPTURE_SPOOL_PATH", "agent_responses.log"),
+    spool_max_bytes=int(os.environ.get("RESPONSE_CAPTURE_SPOOL_MAX_BYTES", 50 * 1024 * 1024)),
+    spool_backups=int(os.environ.get("RESPONSE_CAPTURE_SPOOL_BACKUPS", 5)),
+)
+
+# Upper bound on a single NDJSON line from the Agent Engine, caps per-stream parser memory
+MAX_UPSTREAM_LINE_BYTES = int(os.environ.get("MAX_UPSTREAM_LINE_BYTES", 8 * 1024 * 1024))
+
+# Output coalescing: the longest a text / tool_code fragment may be held back, and the frame size that forces a flush
+SSE_COALESCE_MAX_LATENCY = _env_float("SSE_COALESCE_MAX_LATENCY_MS", 50.0) / 1000
+SSE_COALESCE_MAX_BYTES = int(os.environ.get("SSE_COALESCE_MAX_BYTES", 16 * 1024))
+
+# Optional: give up on an Agent Engine stream that sends nothing for this long
+UPSTREAM_IDLE_TIMEOUT = _env_float("UPSTREAM_IDLE_TIMEOUT_SECONDS")
+
+turn_stats = TurnStats()
+disconnect_totals = {"client_disconnects": 0}
+
+# Every turn's frames are kept in a bounded replay buffer so a client that reconnects with
+# `Last-Event-ID` resumes the same turn. A turn nobody is watching is cancelled after RESUME_GRACE_SECONDS.
+turns = TurnRegistry(
+    InMemoryReplayStore(
+        max_events_per_turn=int(os.environ.get("REPLAY_MAX_EVENTS_PER_TURN", 2048)),
+        max_bytes_per_turn=int(os.environ.get("REPLAY_MAX_BYTES_PER_TURN", 4 * 1024 * 1024)),
+        max_bytes=int(os.environ.get("REPLAY_MAX_BYTES", 256 * 1024 * 1024)),
+        ttl=_env_float("REPLAY_TTL_SECONDS", 300.0),
+    ),
+    resume_grace=_env_float("RESUME_GRACE_SECONDS", 10.0),
+)
+
+# Caps on concurrent upstream turns (global and per caller, 0 = unlimited) with a bounded,
+# deadline-aware wait queue, plus an optional per-user rate limit
+admission = AdmissionController(
+    max_concurrent=int(os.environ.get("ADMISSION_MAX_CONCURRENT", 200)),
+    max_per_user=int(os.environ.get("ADMISSION_MAX_PER_USER", 0)),
+    max_queue=int(os.environ.get("ADMISSION_MAX_QUEUE", 500)),
+    max_wait=_env_float("ADMISSION_MAX_WAIT_SECONDS", 10.0),
+    rate=_env_float("RATE_LIMIT_PER_USER_PER_MINUTE", 0.0) / 60,
+    burst=_env_float("RATE_LIMIT_BURST", 10.0),
+)
+
+# Who the caller is, never taken from the request body. An authenticating proxy in front
+# of the gateway (IAP, an API gateway, ...) names the user in the header USER_ID_HEADER,
+# and that user is forwarded to Agent Engine and limited. Without it every caller is the
+# Agent Engine user "test_user" and per-user limits apply to each client address.
+USER_ID_HEADER = os.environ.get("USER_ID_HEADER", "").strip()
+
+# Opt-in: concurrent requests with the same normalized body share a single Agent Engine turn
+SINGLE_FLIGHT = os.environ.get("SINGLE_FLIGHT", "").lower() in ("1", "true", "yes")
+
+
+async def agent_events(headers: dict, agent_request_body: dict):
+    """Streams one agent turn from the Agent Engine and yields it as gateway event dicts."""
+    capture = response_capture.new(uuid.uuid4().hex[:12])
+    parser = NDJSONParser(max_line_bytes=MAX_UPSTREAM_LINE_BYTES)
+    started = time.monotonic()
+    try:
+        # Each open stream only holds a coroutine, not a worker thread, so a single
+        # event loop can multiplex thousands of concurrent agent turns.
+        async with upstream.stream("POST", AGENT_ENGINE_QUERY_URL, headers=headers, json=agent_request_body) as response:
+            response.raise_for_status()
+
+            # Agent Engine sends one JSON object per line. The body is pulled one chunk at
+            # a time, only as fast as the client consumes the frames we yield, and lines
+            # split across chunks are reassembled by the parser.
+            chunks = response.aiter_bytes()
+            if UPSTREAM_IDLE_TIMEOUT:
+                chunks = iter_with_idle_timeout(chunks, UPSTREAM_IDLE_TIMEOUT)
+            async for event in aiter_ndjson(chunks, parser):
+                line = event.line
+                if event.error is not None:
+                    logger.error("JSON Decode Error in line: %s - Raw line: %s", event.error, line)
+                    continue
+                try:
+                    json_data = event.data
+
+                    capture.append(line) # Keep (part of) the raw response for logging
+
+                    # Handle different types of events from the Agent Engine
+                    # Tool invocation (e.g., when 'actions' and 'tool_code' are present).
+                    # Fragments are passed on as they come, the output stage merges them.
+                    if 'actions' in json_data and 'tool_code' in json_data['actions']:
+                        yield {'type': 'tool_code', 'content': json_data['actions']['tool_code']}
+                    # Tool result (e.g., when 'tool_result' is present)
+                    elif 'tool_result' in json_data:
+                        tool_result = json_data['tool_result'].get('content', '')
+                        yield {'type': 'tool_result', 'content': tool_result}
+                    # Content/text parts
+                    elif 'content' in json_data and 'parts' in json_data['content']:
+                        for part in json_data['content']['parts']:
+                            if 'text' in part:
+                                yield {'type': 'text', 'content': part['text']}
+                            # Handle other modalities if necessary (e.g., 'image_data')
+                    # Handle cases where the model might indicate it's thinking or processing
+                    elif 'metadata' in json_data and 'reasoning_mode' in json_data['metadata']:
+                        yield {'type': 'thinking', 'content': 'Agent is thinking...'}
+                    # For end of stream or other relevant metadata
+                    elif 'usage_metadata' in json_data:
+                        pass # The 'end' event is sent once the stream closes
+
+                except Exception as e:
+                    logger.error("Error processing line: %s", e)
+                    yield {'type': 'error', 'content': str(e)}
+
+            if parser.oversized_lines:
+                logger.warning("Dropped %d Agent Engine lines over %d bytes", parser.oversized_lines, MAX_UPSTREAM_LINE_BYTES)
+        turn_stats.record_completed(parser.bytes_in, time.monotonic() - started)
+
+    except asyncio.CancelledError:
+        # Nobody is watching the turn any more (or the server is shutting down). Unwinding out
+        # of `upstream.stream` has already closed the Agent Engine request, so no more of this
+        # turn is read or paid for.
+        turn_stats.record_cancelled(parser.bytes_in, time.monotonic() - started, "client_disconnect")
+        raise
+    except UpstreamIdleTimeout as e:
+        turn_stats.record_cancelled(parser.bytes_in, time.monotonic() - started, "idle_timeout")
+        logger.error("Agent Engine stream stalled: %s", e)
+        yield {'type': 'error', 'content': f'The Agent Engine stopped responding: {e}'}
+    except httpx.HTTPError as e:
+        logger.error("Request error to Agent Engine: %s", e)
+        yield {'type': 'error', 'content': f'Network error communicating with Agent Engine: {e}'}
+    except Exception as e:
+        logger.error("Unhandled error during streaming: %s", e)
+        yield {'type': 'error', 'content': f'An unexpected error occurred: {e}'}
+    finally:
+        capture.close()
+
+
+async def turn_frames(headers: dict, agent_request_body: dict):
+    """Produces the SSE frames of one agent turn, in batches."""
+    # Small text / tool_code events are merged into fewer frames, each held back at most SSE_COALESCE_MAX_LATENCY
+    async for frames in coalesce(agent_events(headers, agent_request_body), SSE_COALESCE_MAX_LATENCY, SSE_COALESCE_MAX_BYTES):
+        yield frames
+    yield [sse_frame({'type': 'end'})] # Signal end of stream
+
+
+def _on_disconnect():
+    disconnect_totals["client_disconnects"] += 1
+
+
+def _caller(request):
+    """Returns (user_id for Agent Engine, key for the per-user limits), or None if unauthenticated."""
+    if USER_ID_HEADER:
+        user_id = request.headers.get(USER_ID_HEADER, "").strip()
+        return (user_id, user_id) if user_id else None
+    return "test_user", f"address:{request.client.host if request.client else 'unknown'}"
+
+
+def _stream_turn(turn, after_seq: int = 0) -> EventStreamResponse:
+    return EventStreamResponse(turn.subscribe(after_seq), on_disconnect=_on_disconnect, headers={"X-Turn-Id": turn.turn_id})
+
+
+async def query_agent(request):
     if not AGENT_ENGINE_QUERY_URL:
-        app.logger.error("AGENT_ENGINE_QUERY_URL environment variable not set.")
-        return jsonify({"error": "AGENT_ENGINE_QUERY_URL environment variable not set."}), 500
+        logger.error("AGENT_ENGINE_QUERY_URL environment variable not set.")
+        return JSONResponse({"error": "AGENT_ENGINE_QUERY_URL environment variable not set."}, status_code=500)
+
+    # A reconnecting client picks up its turn where it left off, without a new upstream call
+    resume_from = parse_last_event_id(request.headers.get("last-event-id"))
+    if resume_from is not None:
+        turn = turns.resume(resume_from[0])
+        if turn is not None:
+            return _stream_turn(turn, resume_from[1])
+        logger.info("Turn %s is no longer available to resume, starting a new one.", resume_from[0])
 
     try:
-        credentials, project = google.auth.default()
-        auth_req = google.auth.transport.requests.Request()
-        credentials.refresh(auth_req)
-        access_token = credentials.token
+        access_token = await token_manager.get_token()
 
         headers = {
             "Authorization": f"Bearer {access_token}",
             "Content-Type": "application/json"
         }
 
-        frontend_data = request.json
+        frontend_data = await request.json()
         user_query = frontend_data.get("query")
         if not user_query:
-            return jsonify({"error": "Missing 'query' in request."}), 400
+            return JSONResponse({"error": "Missing 'query' in request."}, status_code=400)
+        caller = _caller(request)
+        if caller is None:
+            return JSONResponse({"error": f"Missing {USER_ID_HEADER} header."}, status_code=401)
+        user_id, limit_key = caller
 
         agent_request_body = {
             "class_method": "stream_query",
             "input": {
-                "user_id": "test_user",
+                "user_id": user_id,
                 "message": {
                     "parts": [{"text": user_query}],
                     "role": "user"
@@ -47,84 +252,69 @@ def query_agent():
             }
         }
 
-        app.logger.info("Sending streaming request to Agent Engine URL: %s", AGENT_ENGINE_QUERY_URL)
-        app.logger.info("Sending to Agent Engine Body:\n%s", json.dumps(agent_request_body, indent=2))
+        logger.info("Sending streaming request to Agent Engine URL: %s", AGENT_ENGINE_QUERY_URL)
+        logger.info("Sending to Agent Engine Body:\n%s", json.dumps(agent_request_body, indent=2))
 
-        def generate():
+        flight_key = single_flight_key(agent_request_body) if SINGLE_FLIGHT else None
+        turn = turns.join(flight_key) if flight_key else None
+        if turn is None:
             try:
-                # Make the request to the Agent Engine with stream=True
-                with requests.post(AGENT_ENGINE_QUERY_URL, headers=headers, json=agent_request_body, stream=True) as response:
-                    response.raise_for_status()
-
-                    # This is for accumulating the full response content for logging, if needed
-                    full_response_content = ""
-                    tool_code_buffer = "" # Buffer for collecting tool code
-
-                    for chunk in response.iter_content(chunk_size=None): # Use None for line by line or small chunks
-                        if chunk:
-                            try:
-                                # Agent Engine sends multiple JSON objects separated by newlines
-                                # We need to split and process each JSON object
-                                for line in chunk.decode('utf-8').splitlines():
-                                    if line.strip(): # Ensure line is not empty
-                                        json_data = json.loads(line)
-                                        # app.logger.debug("Received chunk: %s", json.dumps(json_data)) # Log each chunk received
-
-                                        full_response_content += line + "\n" # Accumulate for full response logging
-
-                                        # Handle different types of events from the Agent Engine
-                                        # Tool invocation (e.g., when 'actions' and 'tool_code' are present)
-                                        if 'actions' in json_data and 'tool_code' in json_data['actions']:
-                                            tool_code_buffer += json_data['actions']['tool_code']
-                                            # If tool_code is a complete snippet, yield it
-                                            if '\n' in tool_code_buffer: # Heuristic: if a newline, consider it a complete chunk
-                                                yield f"data: {json.dumps({'type': 'tool_code', 'content': tool_code_buffer.strip()})}\n\n"
-                                                tool_code_buffer = "" # Reset buffer
-                                        # Tool result (e.g., when 'tool_result' is present)
-                                        elif 'tool_result' in json_data:
-                                            tool_result = json_data['tool_result'].get('content', '')
-                                            yield f"data: {json.dumps({'type': 'tool_result', 'content': tool_result})}\n\n"
-                                        # Content/text parts
-                                        elif 'content' in json_data and 'parts' in json_data['content']:
-                                            for part in json_data['content']['parts']:
-                                                if 'text' in part:
-                                                    yield f"data: {json.dumps({'type': 'text', 'content': part['text']})}\n\n"
-                                                # Handle other modalities if necessary (e.g., 'image_data')
-                                        # Handle cases where the model might indicate it's thinking or processing
-                                        elif 'metadata' in json_data and 'reasoning_mode' in json_data['metadata']:
-                                            # You can send a special event for 'thinking' state
-                                            yield f"data: {json.dumps({'type': 'thinking', 'content': 'Agent is thinking...'})}\n\n"
-                                        # For end of stream or other relevant metadata
-                                        elif 'usage_metadata' in json_data:
-                                            # This might be the final chunk or metadata. You can send an 'end' event.
-                                            pass # Or yield f"data: {json.dumps({'type': 'end'})}\n\n"
-
-                            except json.JSONDecodeError as e:
-                                app.logger.error(f"JSON Decode Error in chunk: {e} - Raw chunk: {chunk.decode('utf-8')}")
-                                # It's possible a chunk doesn't contain a full JSON line.
-                                # For robustness, you might need a more sophisticated JSON stream parser.
-                                # For this example, we'll try to process line by line.
-                            except Exception as e:
-                                app.logger.error(f"Error processing chunk: {e}")
-                                yield f"data: {json.dumps({'type': 'error', 'content': str(e)})}\n\n"
-
-                app.logger.info("Full Raw Response from Agent Engine (after stream close):\n%s", full_response_content)
-
-            except requests.exceptions.RequestException as e:
-                app.logger.error(f"Request error to Agent Engine: {e}")
-                yield f"data: {json.dumps({'type': 'error', 'content': f'Network error communicating with Agent Engine: {e}'})}\n\n"
-            except Exception as e:
-                app.logger.error(f"Unhandled error during streaming: {e}")
-                yield f"data: {json.dumps({'type': 'error', 'content': f'An unexpected error occurred: {e}'})}\n\n"
-            finally:
-                yield f"data: {json.dumps({'type': 'end'})}\n\n" # Signal end of stream
-
-        return Response(generate(), mimetype='text/event-stream')
+                permit = await admission.acquire(limit_key)
+            except AdmissionRejected as e:
+                logger.warning("Rejected /query-agent for %s: %s", limit_key, e.reason)
+                return JSONResponse(
+                    {"error": "The agent is busy, please retry later.", "reason": e.reason},
+                    status_code=e.status_code,
+                    headers={"Retry-After": e.retry_after_header},
+                )
+            # An identical request may have started a turn while this one was queued
+            turn = turns.join(flight_key, retry=True) if flight_key else None
+            if turn is not None:
+                permit.release()
+            else:
+                turn = turns.start(turn_frames(headers, agent_request_body), key=flight_key)
+                # The slot is held for as long as the upstream turn runs, not the connection
+                turn.add_done_callback(lambda _: permit.release())
+        return _stream_turn(turn)
 
     except Exception as e:
-        app.logger.error(f"Error preparing Agent Engine request: {e}")
-        return jsonify({"error": str(e)}), 500
+        logger.error("Error preparing Agent Engine request: %s", e)
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+async def metrics(request):
+    return JSONResponse({
+        "token": token_manager.metrics(),
+        "upstream": upstream.stats(),
+        "sse": dict(coalescing_totals, **disconnect_totals),
+        "turns": dict(turn_stats.metrics(), **turns.metrics()),
+        "admission": admission.metrics(),
+    })
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    token_manager.start()
+    await upstream.start()
+    response_capture.start()
+    turns.start_sweeper()
+    yield
+    await turns.stop()
+    response_capture.stop()
+    await upstream.aclose()
+    await token_manager.stop()
+
+
+app = Starlette(
+    routes=[
+        Route('/query-agent', query_agent, methods=['POST']),
+        Route('/metrics', metrics, methods=['GET']),
+    ],
+    lifespan=lifespan,
+    # Enable CORS for all origins for simplicity during development
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'], expose_headers=['X-Turn-Id'])],
+)
 
 if __name__ == '__main__':
-    app.logger.setLevel('DEBUG')
-    app.run(host='0.0.0.0', port=8080)
\ No newline at end of file
+    logging.basicConfig(level=logging.DEBUG)
+    uvicorn.run(app, host='0.0.0.0', port=int(os.environ.get('PORT', 8080)))
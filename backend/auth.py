@@ -0,0 +1,146 @@
+import asyncio
+import logging
+import time
+from datetime import timezone
+from typing import Callable, Optional
+
+import google.auth
+import google.auth.transport.requests
+
+logger = logging.getLogger("aimpact.backend.auth")
+
+
+class TokenManager:
+    """
+    Process-wide cache for the Agent Engine access token.
+
+    Credentials are discovered once, the access token is reused until it gets close to
+    expiry, and a background task refreshes it ahead of time so requests normally never
+    wait on the token endpoint. When a request does need a refresh, concurrent callers
+    share a single in-flight refresh instead of each hitting the token endpoint.
+
+    `credentials` and `request_factory` can be injected to run without Google Cloud,
+    any object with `token`, `expiry` and `refresh(request)` will do.
+    """
+
+    def __init__(
+        self,
+        credentials=None,
+        request_factory: Optional[Callable] = None,
+        refresh_margin: float = 300.0,
+        retry_interval: float = 10.0,
+        default_lifetime: float = 3600.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        self._credentials = credentials
+        self._request_factory = request_factory
+        self._auth_request = None
+        self.refresh_margin = refresh_margin
+        self.retry_interval = retry_interval
+        self.default_lifetime = default_lifetime
+        self._clock = clock
+
+        self._token: Optional[str] = None
+        self._expires_at: Optional[float] = None
+        self._fetched_at: Optional[float] = None
+        self._refresh_at = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+        self._refresher: Optional[asyncio.Task] = None
+
+        self.refresh_count = 0
+        self.refresh_failures = 0
+        self.last_refresh_latency: Optional[float] = None
+        self.total_refresh_latency = 0.0
+
+    def _seconds_left(self) -> float:
+        if self._token is None or self._expires_at is None:
+            return 0.0
+        return self._expires_at - self._clock()
+
+    def is_fresh(self) -> bool:
+        """True when the cached token has not yet reached its scheduled refresh time."""
+        return self._token is not None and self._clock() < self._refresh_at
+
+    async def get_token(self) -> str:
+        """Returns a usable access token, refreshing it only when it is missing or about to expire."""
+        if self.is_fresh():
+            return self._token
+        await self.refresh()
+        return self._token
+
+    async def refresh(self, force: bool = False) -> None:
+        """Refreshes the token. Callers arriving while a refresh is running wait for that one."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if not force and self.is_fresh():
+                return
+            started = time.perf_counter()
+            try:
+                await asyncio.to_thread(self._refresh_blocking)
+            except Exception:
+                self.refresh_failures += 1
+                raise
+            latency = time.perf_counter() - started
+            self.refresh_count += 1
+            self.last_refresh_latency = latency
+            self.total_refresh_latency += latency
+
+    def _refresh_blocking(self) -> None:
+        # Runs in a worker thread: credential discovery and the token request both block.
+        if self._credentials is None:
+            self._credentials, _ = google.auth.default()
+        if self._auth_request is None:
+            factory = self._request_factory or google.auth.transport.requests.Request
+            self._auth_request = factory()
+        self._credentials.refresh(self._auth_request)
+
+        now = self._clock()
+        expiry = getattr(self._credentials, "expiry", None)
+        self._token = self._credentials.token
+        self._fetched_at = now
+        # google-auth reports expiry as a naive UTC datetime
+        self._expires_at = expiry.replace(tzinfo=timezone.utc).timestamp() if expiry else now + self.default_lifetime
+        # Refresh `refresh_margin` ahead of expiry, but not before half of the lifetime has passed
+        # so short-lived tokens are not refreshed on every request
+        lifetime = max(0.0, self._expires_at - now)
+        self._refresh_at = now + max(lifetime - self.refresh_margin, lifetime / 2)
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            delay = max(0.0, self._refresh_at - self._clock()) if self._token else 0.0
+            await asyncio.sleep(delay)
+            try:
+                await self.refresh(force=True)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Background token refresh failed: %s", e)
+                await asyncio.sleep(self.retry_interval)
+
+    def start(self) -> None:
+        """Starts the background refresher on the running event loop."""
+        if self._refresher is None or self._refresher.done():
+            self._refresher = asyncio.get_running_loop().create_task(self._refresh_loop())
+
+    async def stop(self) -> None:
+        """Stops the background refresher."""
+        if self._refresher is not None:
+            self._refresher.cancel()
+            try:
+                await self._refresher
+            except asyncio.CancelledError:
+                pass
+            self._refresher = None
+
+    def metrics(self) -> dict:
+        now = self._clock()
+        return {
+            "token_cached": self._token is not None,
+            "token_age_seconds": round(now - self._fetched_at, 3) if self._fetched_at is not None else None,
+            "token_expires_in_seconds": round(self._seconds_left(), 3) if self._token is not None else None,
+            "refresh_count": self.refresh_count,
+            "refresh_failures": self.refresh_failures,
+            "last_refresh_latency_ms": round(self.last_refresh_latency * 1000, 3) if self.last_refresh_latency is not None else None,
+            "avg_refresh_latency_ms": round(self.total_refresh_latency / self.refresh_count * 1000, 3) if self.refresh_count else None,
+        }
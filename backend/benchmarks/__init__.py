@@ -0,0 +1,2 @@
+# Local benchmarks for the backend gateway. Run them from the backend directory,
+# e.g. `python -m benchmarks.gateway_load`.
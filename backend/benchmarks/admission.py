@@ -0,0 +1,129 @@
+"""
+Synthetic overload test for gateway admission control.
+
+Requests arrive as a Poisson process at `--rate` per second for `--duration` seconds,
+spread over `--users` user IDs, against a fake Agent Engine whose turns take about a
+second. The same arrival schedule is replayed with admission control off and on, and
+for each run the benchmark reports status codes, how fast rejections came back,
+time-to-first-frame and turn duration of admitted requests, and the peak number of
+concurrent upstream turns. A final run has one user burst past the rate limit.
+
+    python -m benchmarks.admission --rate 60 --duration 5 --max-concurrent 20 --max-queue 40
+"""
+import argparse
+import asyncio
+import collections
+import os
+import random
+import time
+
+import httpx
+
+from benchmarks.fake_agent_engine import FakeCredentials, build_app
+from benchmarks.gateway_load import percentile
+from benchmarks.servers import serve_in_thread
+
+
+async def one_request(client: httpx.AsyncClient, url: str, user_id: str, delay: float) -> dict:
+    await asyncio.sleep(delay)
+    started = time.perf_counter()
+    result = {"status": None, "ttff": None, "retry_after": None}
+    try:
+        # The user is named the way an authenticating proxy would, in USER_ID_HEADER
+        headers = {"X-Authenticated-User": user_id}
+        async with client.stream("POST", url, json={"query": f"overload {random.random()}"}, headers=headers) as response:
+            result["status"] = response.status_code
+            result["retry_after"] = response.headers.get("retry-after")
+            async for line in response.aiter_lines():
+                if line.startswith("data: ") and result["ttff"] is None:
+                    result["ttff"] = time.perf_counter() - started
+    except httpx.HTTPError as e:
+        result["status"] = type(e).__name__
+    result["seconds"] = time.perf_counter() - started
+    return result
+
+
+async def run_schedule(url: str, schedule: list) -> list:
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(60.0, read=None)) as client:
+        return await asyncio.gather(*(one_request(client, url, user_id, at) for at, user_id in schedule))
+
+
+def report(name: str, results: list, engine_stats: dict, admission: dict) -> None:
+    statuses = collections.Counter(r["status"] for r in results)
+    admitted = [r for r in results if r["status"] == 200]
+    rejected = [r for r in results if r["status"] in (429, 503)]
+    print(name)
+    print(f"  statuses: {dict(statuses)}")
+    print(f"  admitted ttff p50/p99 ms: {percentile([r['ttff'] for r in admitted if r['ttff']], 50) * 1000:.0f}"
+          f"/{percentile([r['ttff'] for r in admitted if r['ttff']], 99) * 1000:.0f}")
+    print(f"  admitted turn p50/p99 ms: {percentile([r['seconds'] for r in admitted], 50) * 1000:.0f}"
+          f"/{percentile([r['seconds'] for r in admitted], 99) * 1000:.0f}")
+    if rejected:
+        print(f"  rejection latency p50/p99 ms: {percentile([r['seconds'] for r in rejected], 50) * 1000:.1f}"
+              f"/{percentile([r['seconds'] for r in rejected], 99) * 1000:.1f}, "
+              f"retry-after values: {sorted(set(r['retry_after'] for r in rejected))}")
+    print(f"  peak upstream turns: {engine_stats['peak_in_flight']}")
+    print(f"  gateway admission: {admission}")
+
+
+async def run(args, gateway, gateway_url: str, engine_stats: dict) -> None:
+    from admission import AdmissionController
+
+    url = f"{gateway_url}/query-agent"
+    rng = random.Random(0)
+    schedule, at = [], 0.0
+    while at < args.duration:
+        schedule.append((at, f"user-{rng.randrange(args.users)}"))
+        at += rng.expovariate(args.rate)
+
+    runs = [
+        ("admission off", AdmissionController(max_concurrent=0)),
+        ("admission on", AdmissionController(
+            max_concurrent=args.max_concurrent, max_per_user=args.max_per_user,
+            max_queue=args.max_queue, max_wait=args.max_wait,
+        )),
+    ]
+    for name, controller in runs:
+        gateway.admission = controller
+        engine_stats["peak_in_flight"] = 0
+        results = await run_schedule(url, schedule)
+        report(f"{name} ({len(schedule)} requests)", results, engine_stats, controller.metrics())
+
+    gateway.admission = AdmissionController(max_concurrent=0, rate=1.0, burst=5)
+    engine_stats["peak_in_flight"] = 0
+    results = await run_schedule(url, [(0.0, "bursty-user")] * 20)
+    report("rate limit 60/min, burst 5 (20 requests at once)", results, engine_stats, gateway.admission.metrics())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=float, default=60.0, help="Mean request arrivals per second.")
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--max-concurrent", type=int, default=20)
+    parser.add_argument("--max-per-user", type=int, default=10)
+    parser.add_argument("--max-queue", type=int, default=40)
+    parser.add_argument("--max-wait", type=float, default=2.0)
+    parser.add_argument("--interval", type=float, default=0.04, help="Seconds between fake engine chunks.")
+    args = parser.parse_args()
+
+    engine_app = build_app(text_parts=20, interval=args.interval)
+    engine_server, engine_url = serve_in_thread(engine_app, backlog=4096)
+    os.environ["AGENT_ENGINE_QUERY_URL"] = f"{engine_url}/stream"
+    os.environ["USER_ID_HEADER"] = "X-Authenticated-User"
+
+    import app as gateway
+    from auth import TokenManager
+
+    gateway.token_manager = TokenManager(credentials=FakeCredentials(), request_factory=lambda: None)
+    gateway_server, gateway_url = serve_in_thread(gateway.app, backlog=4096)
+    try:
+        asyncio.run(run(args, gateway, gateway_url, engine_app.state.stats))
+    finally:
+        for server in (gateway_server, engine_server):
+            server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Checks that the gateway stops upstream work when clients leave or the upstream stalls.
+
+Phase 1 runs one full turn against a slow fake Agent Engine (to seed the averages the
+savings estimate is based on), then opens `--clients` streams that each read a couple
+of frames and hang up. It reports how quickly every upstream turn was cancelled and
+the estimated bytes/seconds saved.
+
+Phase 2 points the gateway at an engine that pauses longer than the idle timeout and
+checks the client receives an `error` event and the upstream stream is dropped.
+
+Phase 3 drops a stream mid-turn and reconnects with `Last-Event-ID`, checking the
+client gets the rest of the same turn, with no frame lost or repeated and without a
+second upstream call.
+
+    python -m benchmarks.disconnects --clients 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import httpx
+
+from benchmarks.fake_agent_engine import FakeCredentials, build_app
+from benchmarks.servers import serve_in_thread
+
+
+async def read_frames(client: httpx.AsyncClient, url: str, limit: int = None, headers: dict = None, ids: list = None) -> list:
+    frames = []
+    async with client.stream("POST", url, json={"query": "slow turn"}, headers=headers) as response:
+        async for line in response.aiter_lines():
+            if line.startswith("id: ") and ids is not None:
+                ids.append(line[4:])
+            if line.startswith("data: "):
+                frames.append(json.loads(line[6:]))
+                if limit and len(frames) >= limit:
+                    break
+    return frames
+
+
+async def wait_until(predicate, timeout: float) -> float:
+    started = time.perf_counter()
+    while not predicate():
+        if time.perf_counter() - started > timeout:
+            break
+        await asyncio.sleep(0.005)
+    return time.perf_counter() - started
+
+
+async def run(args, gateway, gateway_url: str, engine_stats: dict, engine_url: str, stall_url: str, stall_stats: dict) -> None:
+    url = f"{gateway_url}/query-agent"
+    limits = httpx.Limits(max_connections=None)
+    async with httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(30.0, read=None)) as client:
+        full_turn = await read_frames(client, url)
+
+        # Measure cancellation itself, not the resume grace period
+        gateway.turns.resume_grace = 0
+        await asyncio.gather(*(read_frames(client, url, limit=2) for _ in range(args.clients)))
+        cancelled = lambda: gateway.turn_stats.cancelled.get("client_disconnect", 0) >= args.clients
+        detect_seconds = await wait_until(cancelled, 10)
+        await wait_until(lambda: engine_stats["aborted"] >= args.clients, 10)
+
+        turns = gateway.turn_stats.metrics()
+        print("client disconnects")
+        print(f"  upstream turns cancelled: {turns['cancelled'].get('client_disconnect', 0)}/{args.clients} in {detect_seconds * 1000:.0f} ms")
+        print(f"  fake engine streams aborted: {engine_stats['aborted']}, completed: {engine_stats['completed']}")
+        print(f"  estimated saving: {turns['bytes_saved_estimate']} bytes, {turns['seconds_saved_estimate']} s of streaming")
+
+        gateway.UPSTREAM_IDLE_TIMEOUT = args.idle_timeout
+        gateway.AGENT_ENGINE_QUERY_URL = stall_url
+        started = time.perf_counter()
+        frames = await read_frames(client, url)
+        elapsed = time.perf_counter() - started
+        await wait_until(lambda: stall_stats["aborted"] >= 1, 5)
+        errors = [f["content"] for f in frames if f["type"] == "error"]
+        print("idle timeout")
+        print(f"  stream ended after {elapsed:.2f} s with error: {errors[0] if errors else None!r}")
+        print(f"  stalled engine streams aborted: {stall_stats['aborted']}")
+
+        gateway.UPSTREAM_IDLE_TIMEOUT = None
+        gateway.AGENT_ENGINE_QUERY_URL = engine_url
+        gateway.turns.resume_grace = 5.0
+        started_before = engine_stats["started"]
+        ids = []
+        head = await read_frames(client, url, limit=3, ids=ids)
+        await asyncio.sleep(args.interval * 2)
+        rest = await read_frames(client, url, headers={"Last-Event-ID": ids[-1]}, ids=ids)
+        seqs = [int(i.rpartition(":")[2]) for i in ids]
+        print("resume")
+        print(f"  frames before/after reconnect: {len(head)}/{len(rest)}, same as a full turn: {head + rest == full_turn}")
+        print(f"  event ids contiguous: {seqs == list(range(1, len(seqs) + 1))}")
+        print(f"  upstream calls: {engine_stats['started'] - started_before}")
+        print(f"  gateway: {gateway.turns.metrics()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--interval", type=float, default=0.2, help="Seconds between chunks of the slow engine.")
+    parser.add_argument("--idle-timeout", type=float, default=0.5)
+    args = parser.parse_args()
+
+    engine_app = build_app(text_parts=20, interval=args.interval)
+    engine_server, engine_url = serve_in_thread(engine_app)
+    stall_app = build_app(text_parts=5, interval=args.idle_timeout * 4)
+    stall_server, stall_url = serve_in_thread(stall_app)
+    os.environ["AGENT_ENGINE_QUERY_URL"] = f"{engine_url}/stream"
+
+    import app as gateway
+    from auth import TokenManager
+
+    gateway.token_manager = TokenManager(credentials=FakeCredentials(), request_factory=lambda: None)
+    gateway_server, gateway_url = serve_in_thread(gateway.app)
+    try:
+        asyncio.run(run(args, gateway, gateway_url, engine_app.state.stats, f"{engine_url}/stream", f"{stall_url}/stream", stall_app.state.stats))
+    finally:
+        for server in (gateway_server, engine_server, stall_server):
+            server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
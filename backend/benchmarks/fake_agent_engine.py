@@ -0,0 +1,93 @@
+"""
+A local stand-in for the Agent Engine `streamQuery` endpoint.
+
+It answers every POST with a newline-delimited JSON stream shaped like a real agent
+turn: a thinking marker, tool code fragments, a tool result, text parts and a final
+usage_metadata object. Run it standalone with:
+
+    uvicorn benchmarks.fake_agent_engine:app --port 9001
+"""
+import asyncio
+import datetime
+import json
+import os
+import time
+
+from starlette.applications import Starlette
+from starlette.responses import StreamingResponse
+from starlette.routing import Route
+
+
+class FakeCredentials:
+    """Stands in for google-auth credentials; every refresh mints a new token after `latency` seconds."""
+
+    def __init__(self, lifetime: float = 3600.0, latency: float = 0.05):
+        self.lifetime = lifetime
+        self.latency = latency
+        self.token = None
+        self.expiry = None
+        self.refreshes = 0
+
+    def refresh(self, request) -> None:
+        time.sleep(self.latency)
+        self.refreshes += 1
+        self.token = f"fake-token-{self.refreshes}"
+        self.expiry = datetime.datetime.utcnow() + datetime.timedelta(seconds=self.lifetime)
+
+
+def turn_events(query: str, text_parts: int = 20) -> list:
+    """Builds the sequence of JSON objects streamed back for one agent turn."""
+    events = [
+        {"metadata": {"reasoning_mode": "thinking"}},
+        {"actions": {"tool_code": "get_reddit_content_ideas("}},
+        {"actions": {"tool_code": f"keywords={query!r}, subreddits='marketing')\n"}},
+        {"tool_result": {"content": json.dumps([{"title": f"Idea about {query}", "score": 42}])}},
+    ]
+    for i in range(text_parts):
+        events.append({"content": {"parts": [{"text": f"Part {i} of the answer about {query} – naïve café ✓. "}], "role": "model"}})
+    events.append({"usage_metadata": {"prompt_token_count": 812, "candidates_token_count": 240}})
+    return events
+
+
+def build_app(text_parts: int = 20, interval: float = 0.01, chunk_events: int = 1) -> Starlette:
+    """
+    Returns the fake engine app.
+
+    `interval` is the pause between chunks and `chunk_events` how many JSON lines are
+    written per chunk, which controls how the stream is framed on the wire.
+    """
+
+    stats = {"started": 0, "completed": 0, "aborted": 0, "in_flight": 0, "peak_in_flight": 0}
+
+    async def stream_query(request):
+        body = await request.json()
+        query = body["input"]["message"]["parts"][0]["text"]
+        events = turn_events(query, text_parts)
+
+        async def body_iter():
+            stats["started"] += 1
+            stats["in_flight"] += 1
+            stats["peak_in_flight"] = max(stats["peak_in_flight"], stats["in_flight"])
+            finished = False
+            try:
+                for start in range(0, len(events), chunk_events):
+                    batch = events[start:start + chunk_events]
+                    yield "".join(json.dumps(event) + "\n" for event in batch).encode("utf-8")
+                    if interval:
+                        await asyncio.sleep(interval)
+                finished = True
+            finally:
+                stats["in_flight"] -= 1
+                stats["completed" if finished else "aborted"] += 1
+
+        return StreamingResponse(body_iter(), media_type="application/json")
+
+    app = Starlette(routes=[Route("/stream", stream_query, methods=["POST"])])
+    app.state.stats = stats
+    return app
+
+
+app = build_app(
+    text_parts=int(os.environ.get("FAKE_ENGINE_TEXT_PARTS", 20)),
+    interval=float(os.environ.get("FAKE_ENGINE_INTERVAL", 0.01)),
+)
@@ -0,0 +1,113 @@
+"""
+Load benchmark for the /query-agent gateway against the local fake Agent Engine.
+
+Starts the fake engine and the gateway on their own event loops, then opens
+`--clients` concurrent SSE streams and reports time-to-first-frame, turn duration
+and how many turns were in flight at once. Run from the backend directory:
+
+    python -m benchmarks.gateway_load --clients 1000 --interval 0.05
+
+Each client costs roughly four file descriptors, raise `ulimit -n` for large runs.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import httpx
+
+from benchmarks.fake_agent_engine import FakeCredentials, build_app
+from benchmarks.servers import serve_in_thread
+
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile of an unsorted list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+async def one_client(client: httpx.AsyncClient, url: str, query: str, state: dict) -> tuple:
+    start = time.perf_counter()
+    first_frame = None
+    frames = 0
+    state["in_flight"] += 1
+    state["peak"] = max(state["peak"], state["in_flight"])
+    try:
+        async with client.stream("POST", url, json={"query": query}) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line.startswith("data: "):
+                    frames += 1
+                    if first_frame is None:
+                        first_frame = time.perf_counter() - start
+    finally:
+        state["in_flight"] -= 1
+    return first_frame, time.perf_counter() - start, frames
+
+
+async def run_load(url: str, clients: int) -> dict:
+    state = {"in_flight": 0, "peak": 0}
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(30.0, read=None)) as client:
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *(one_client(client, url, f"query {i}", state) for i in range(clients)),
+            return_exceptions=True,
+        )
+        elapsed = time.perf_counter() - started
+
+    ok = [r for r in results if not isinstance(r, BaseException)]
+    errors = [r for r in results if isinstance(r, BaseException)]
+    ttff = [r[0] for r in ok if r[0] is not None]
+    durations = [r[1] for r in ok]
+    return {
+        "clients": clients,
+        "completed": len(ok),
+        "errors": len(errors),
+        "first_error": repr(errors[0]) if errors else None,
+        "peak_in_flight": state["peak"],
+        "wall_seconds": round(elapsed, 3),
+        "frames_total": sum(r[2] for r in ok),
+        "ttff_p50_ms": round(percentile(ttff, 50) * 1000, 1),
+        "ttff_p99_ms": round(percentile(ttff, 99) * 1000, 1),
+        "turn_p50_ms": round(percentile(durations, 50) * 1000, 1),
+        "turn_p99_ms": round(percentile(durations, 99) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=200, help="Concurrent /query-agent streams.")
+    parser.add_argument("--text-parts", type=int, default=20, help="Text events per fake agent turn.")
+    parser.add_argument("--interval", type=float, default=0.02, help="Seconds between fake engine chunks.")
+    args = parser.parse_args()
+
+    engine_server, engine_url = serve_in_thread(build_app(text_parts=args.text_parts, interval=args.interval), backlog=4096)
+    os.environ["AGENT_ENGINE_QUERY_URL"] = f"{engine_url}/stream"
+
+    import app as gateway  # Imported after the env var is set, the gateway reads it at import time
+    from auth import TokenManager
+
+    credentials = FakeCredentials()
+    gateway.token_manager = TokenManager(credentials=credentials, request_factory=lambda: None)
+    gateway_server, gateway_url = serve_in_thread(gateway.app, backlog=4096)
+
+    try:
+        report = asyncio.run(run_load(f"{gateway_url}/query-agent", args.clients))
+    finally:
+        gateway_server.should_exit = True
+        engine_server.should_exit = True
+
+    report["token_refreshes"] = credentials.refreshes
+    pool = gateway.upstream.stats()
+    report["upstream_conns"] = pool["connections"]
+    report["upstream_wait_ms"] = pool["wait_ms_max"]
+    for key, value in report.items():
+        print(f"{key:>16}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Correctness sweep and throughput benchmark for the incremental NDJSON parser.
+
+The sweep re-parses a stream split at every byte offset (plus byte-at-a-time and
+random multi-way splits) and checks the events match a single-chunk parse. The
+benchmark reports parser throughput in MB/s for several chunk sizes.
+
+    python -m benchmarks.ndjson_parser
+    python -m benchmarks.ndjson_parser --stream captured.ndjson   # e.g. saved with curl
+"""
+import argparse
+import json
+import random
+import time
+
+from benchmarks.fake_agent_engine import turn_events
+from ndjson import NDJSONParser
+
+
+def sample_stream() -> bytes:
+    """An agent turn with multi-byte characters, CRLF endings, blank lines and a bad line."""
+    events = turn_events("café ☕ 市场营销 🚀", text_parts=8)
+    lines = [json.dumps(event, ensure_ascii=False) for event in events]
+    lines.insert(3, "")
+    lines.insert(5, "{not json")
+    return ("\r\n".join(lines[:4]) + "\n" + "\n".join(lines[4:])).encode("utf-8")
+
+
+def parse(chunks) -> list:
+    parser = NDJSONParser()
+    events = []
+    for chunk in chunks:
+        events.extend(parser.feed(chunk))
+    events.extend(parser.close())
+    return [(e.line, e.data, type(e.error).__name__ if e.error else None) for e in events]
+
+
+def verify(data: bytes, random_trials: int = 2000) -> int:
+    """Returns the number of split layouts checked, raises AssertionError on a mismatch."""
+    expected = parse([data])
+    checked = 0
+    for offset in range(len(data) + 1):
+        assert parse([data[:offset], data[offset:]]) == expected, f"Mismatch when split at byte {offset}"
+        checked += 1
+    assert parse([data[i:i + 1] for i in range(len(data))]) == expected, "Mismatch when fed byte by byte"
+    checked += 1
+    rng = random.Random(0)
+    for _ in range(random_trials):
+        cuts = sorted(rng.sample(range(1, len(data)), rng.randint(2, 12)))
+        bounds = [0] + cuts + [len(data)]
+        assert parse([data[a:b] for a, b in zip(bounds, bounds[1:])]) == expected, f"Mismatch for splits {cuts}"
+        checked += 1
+    return checked
+
+
+def throughput(data: bytes, chunk_size: int, target_bytes: int) -> float:
+    payload = data * max(1, target_bytes // len(data))
+    chunks = [payload[i:i + chunk_size] for i in range(0, len(payload), chunk_size)]
+    parser = NDJSONParser()
+    started = time.perf_counter()
+    for chunk in chunks:
+        parser.feed(chunk)
+    parser.close()
+    elapsed = time.perf_counter() - started
+    return len(payload) / elapsed / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stream", action="append", help="NDJSON file(s) to use instead of the built-in sample.")
+    parser.add_argument("--megabytes", type=int, default=64, help="Bytes parsed per throughput run.")
+    args = parser.parse_args()
+
+    streams = []
+    for path in args.stream or []:
+        with open(path, "rb") as f:
+            streams.append((path, f.read()))
+    if not streams:
+        streams.append(("sample", sample_stream()))
+
+    for name, data in streams:
+        print(f"{name}: {len(data)} bytes, {len(parse([data]))} events")
+        print(f"  split layouts verified: {verify(data)}")
+        for chunk_size in (64, 1024, 16 * 1024, 64 * 1024):
+            mbps = throughput(data, chunk_size, args.megabytes * 1_000_000)
+            print(f"  chunk {chunk_size:>6} B: {mbps:8.1f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
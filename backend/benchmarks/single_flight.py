@@ -0,0 +1,84 @@
+"""
+Checks single-flight sharing of identical in-flight agent queries.
+
+`--clients` requests for the same query (with varying whitespace) and `--distinct`
+requests for other queries are sent at once to a gateway with SINGLE_FLIGHT on. One of
+the identical clients reads slowly. The benchmark reports how many Agent Engine turns
+were started, the gateway's hit rate, whether every subscriber of the shared turn got
+the same frames, and how long the fast subscribers took compared to the slow one.
+
+    python -m benchmarks.single_flight --clients 50 --distinct 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import httpx
+
+from benchmarks.fake_agent_engine import FakeCredentials, build_app
+from benchmarks.gateway_load import percentile
+from benchmarks.servers import serve_in_thread
+
+
+async def read_turn(client: httpx.AsyncClient, url: str, query: str, read_delay: float = 0.0) -> tuple:
+    started = time.perf_counter()
+    frames = []
+    async with client.stream("POST", url, json={"query": query}) as response:
+        async for line in response.aiter_lines():
+            if line.startswith("data: "):
+                frames.append(json.loads(line[6:]))
+                if read_delay:
+                    await asyncio.sleep(read_delay)
+    return frames, time.perf_counter() - started
+
+
+async def run(args, gateway, gateway_url: str, engine_stats: dict) -> None:
+    url = f"{gateway_url}/query-agent"
+    limits = httpx.Limits(max_connections=None)
+    async with httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(30.0, read=None)) as client:
+        shared = [read_turn(client, url, "  what is " + " " * (i % 3) + "trending?", args.slow_read_delay if i == 0 else 0.0) for i in range(args.clients)]
+        distinct = [read_turn(client, url, f"distinct query {i}") for i in range(args.distinct)]
+        results = await asyncio.gather(*shared, *distinct)
+
+    shared_results = results[:args.clients]
+    slow_frames, slow_seconds = shared_results[0]
+    fast_seconds = [seconds for _, seconds in shared_results[1:]]
+    identical = all(frames == slow_frames for frames, _ in shared_results)
+    flight = gateway.turns.metrics()["single_flight"]
+    print(f"        requests: {args.clients + args.distinct}")
+    print(f"  upstream turns: {engine_stats['started']} (expected {1 + args.distinct})")
+    print(f"        hit rate: {flight['hit_rate']} ({flight['hits']}/{flight['requests']})")
+    print(f"identical frames: {identical} ({len(slow_frames)} frames per turn)")
+    print(f" fast p99 turn s: {percentile(fast_seconds, 99):.3f}")
+    print(f"   slow client s: {slow_seconds:.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--distinct", type=int, default=5)
+    parser.add_argument("--interval", type=float, default=0.05, help="Seconds between chunks of the fake engine.")
+    parser.add_argument("--slow-read-delay", type=float, default=0.2, help="Pause after every frame for the slow client.")
+    args = parser.parse_args()
+
+    engine_app = build_app(text_parts=20, interval=args.interval)
+    engine_server, engine_url = serve_in_thread(engine_app)
+    os.environ["AGENT_ENGINE_QUERY_URL"] = f"{engine_url}/stream"
+    os.environ["SINGLE_FLIGHT"] = "1"
+
+    import app as gateway
+    from auth import TokenManager
+
+    gateway.token_manager = TokenManager(credentials=FakeCredentials(), request_factory=lambda: None)
+    gateway_server, gateway_url = serve_in_thread(gateway.app)
+    try:
+        asyncio.run(run(args, gateway, gateway_url, engine_app.state.stats))
+    finally:
+        for server in (gateway_server, engine_server):
+            server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
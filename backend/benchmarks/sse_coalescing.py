@@ -0,0 +1,102 @@
+"""
+Compares per-event SSE framing with the coalescing output stage.
+
+A synthetic agent turn (many small text parts, tool_code fragments and the odd
+tool_result, with random gaps) is framed both ways. For each run the benchmark
+reports frames written, frames/sec, p99 delay between frames and the latency the
+output stage added to each event.
+
+    python -m benchmarks.sse_coalescing --events 5000 --mean-gap-ms 1
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from benchmarks.gateway_load import percentile
+from sse import coalesce, sse_frame
+
+
+def build_events(count: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    events = []
+    for i in range(count):
+        roll = rng.random()
+        if roll < 0.80:
+            events.append({"type": "text", "content": "w" * rng.randint(1, 24)})
+        elif roll < 0.97:
+            events.append({"type": "tool_code", "content": "c" * rng.randint(1, 16)})
+        else:
+            events.append({"type": "tool_result", "content": "r" * rng.randint(20, 200)})
+    return events
+
+
+async def source(events: list, gaps: list, arrivals: list):
+    total = 0
+    for event, gap in zip(events, gaps):
+        if gap:
+            await asyncio.sleep(gap)
+        total += len(event["content"])
+        arrivals.append((total, time.perf_counter()))
+        yield event
+
+
+async def per_event(events):
+    async for event in events:
+        yield [sse_frame(event)]
+
+
+async def measure(stream, arrivals: list) -> dict:
+    frame_times = []
+    added = []
+    delivered = 0
+    pointer = 0
+    started = time.perf_counter()
+    async for batch in stream:
+        now = time.perf_counter()
+        for frame in batch:
+            delivered += len(json.loads(frame[6:])["content"])
+            frame_times.append(now)
+        while pointer < len(arrivals) and arrivals[pointer][0] <= delivered:
+            added.append(now - arrivals[pointer][1])
+            pointer += 1
+    elapsed = time.perf_counter() - started
+    gaps = [b - a for a, b in zip(frame_times, frame_times[1:])]
+    return {
+        "frames": len(frame_times),
+        "frames_per_sec": round(len(frame_times) / elapsed),
+        "p99_inter_frame_ms": round(percentile(gaps, 99) * 1000, 2),
+        "p99_added_latency_ms": round(percentile(added, 99) * 1000, 2),
+        "max_added_latency_ms": round(max(added) * 1000, 2) if added else 0.0,
+        "seconds": round(elapsed, 3),
+    }
+
+
+async def run(args) -> None:
+    events = build_events(args.events)
+    rng = random.Random(1)
+    mean_gap = args.mean_gap_ms / 1000
+    gaps = [rng.expovariate(1 / mean_gap) if mean_gap else 0.0 for _ in events]
+
+    runs = [("per-event", lambda stream: per_event(stream))]
+    for latency_ms in args.latencies_ms:
+        runs.append((f"coalesce {latency_ms}ms", lambda stream, l=latency_ms: coalesce(stream, l / 1000, args.max_bytes)))
+
+    for name, stage in runs:
+        arrivals = []
+        report = await measure(stage(source(events, gaps, arrivals)), arrivals)
+        print(f"{name:>16}: " + ", ".join(f"{k}={v}" for k, v in report.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=5000)
+    parser.add_argument("--mean-gap-ms", type=float, default=1.0, help="Mean pause between upstream events.")
+    parser.add_argument("--latencies-ms", type=float, nargs="+", default=[10, 50])
+    parser.add_argument("--max-bytes", type=int, default=16 * 1024)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+import collections
+import logging
+import logging.handlers
+import queue
+import random
+from typing import Optional
+
+logger = logging.getLogger("aimpact.backend.capture")
+
+CAPTURE_MODES = ("off", "headtail", "sampled", "spool")
+
+
+class ResponseCapture:
+    """
+    Per-stream capture of the raw Agent Engine lines, for logging once the stream ends.
+
+    This base class is the "off" mode: it only counts what went through. Subclasses keep
+    a bounded subset of the lines. `append` is called from the streaming hot path, so every
+    mode does O(1) amortized work per line and never waits on I/O. Sizes are measured in
+    characters of the decoded line.
+    """
+
+    mode = "off"
+
+    def __init__(self, stream_id: str, max_bytes: int):
+        self.stream_id = stream_id
+        self.max_bytes = max_bytes
+        self.lines_seen = 0
+        self.bytes_seen = 0
+        self.bytes_captured = 0
+
+    def append(self, line: str) -> None:
+        self.lines_seen += 1
+        self.bytes_seen += len(line) + 1
+        self._capture(line)
+
+    def _capture(self, line: str) -> None:
+        pass
+
+    def summary(self) -> str:
+        return (
+            f"stream={self.stream_id} mode={self.mode} lines={self.lines_seen} "
+            f"bytes={self.bytes_seen} captured={self.bytes_captured}"
+        )
+
+    def close(self) -> None:
+        logger.debug("Agent Engine response %s", self.summary())
+
+
+class HeadTailCapture(ResponseCapture):
+    """Keeps the first `head_bytes` and the last `tail_bytes` of the stream."""
+
+    mode = "headtail"
+
+    def __init__(self, stream_id: str, max_bytes: int, head_bytes: int, tail_bytes: int):
+        super().__init__(stream_id, max_bytes)
+        self.head_bytes = min(head_bytes, max_bytes)
+        self.tail_bytes = min(tail_bytes, max_bytes - self.head_bytes)
+        self._head = []
+        self._head_size = 0
+        self._tail = collections.deque()
+        self._tail_size = 0
+        self._skipped_lines = 0
+
+    def _capture(self, line: str) -> None:
+        size = len(line) + 1
+        if self._head_size + size <= self.head_bytes and not self._tail:
+            self._head.append(line)
+            self._head_size += size
+            self.bytes_captured = self._head_size
+            return
+        self._tail.append(line)
+        self._tail_size += size
+        while self._tail_size > self.tail_bytes and self._tail:
+            self._tail_size -= len(self._tail.popleft()) + 1
+            self._skipped_lines += 1
+        self.bytes_captured = self._head_size + self._tail_size
+
+    def close(self) -> None:
+        parts = self._head[:]
+        if self._skipped_lines:
+            parts.append(f"... [{self._skipped_lines} lines omitted] ...")
+        parts.extend(self._tail)
+        logger.info("Agent Engine response (%s):\n%s", self.summary(), "\n".join(parts))
+
+
+class SampledCapture(ResponseCapture):
+    """Keeps each line with probability `sample_rate`, up to `max_bytes` per stream."""
+
+    mode = "sampled"
+
+    def __init__(self, stream_id: str, max_bytes: int, sample_rate: float, rng: Optional[random.Random] = None):
+        super().__init__(stream_id, max_bytes)
+        self.sample_rate = sample_rate
+        self._random = (rng or random).random
+        self._lines = []
+
+    def _capture(self, line: str) -> None:
+        if self._random() >= self.sample_rate:
+            return
+        size = len(line) + 1
+        if self.bytes_captured + size > self.max_bytes:
+            return
+        self._lines.append(line)
+        self.bytes_captured += size
+
+    def close(self) -> None:
+        logger.info("Agent Engine response sample (%s):\n%s", self.summary(), "\n".join(self._lines))
+
+
+class SpoolCapture(ResponseCapture):
+    """Hands lines to a background writer that appends them to a rotating file."""
+
+    mode = "spool"
+
+    def __init__(self, stream_id: str, max_bytes: int, spool_logger: logging.Logger):
+        super().__init__(stream_id, max_bytes)
+        self._spool = spool_logger
+
+    def _capture(self, line: str) -> None:
+        size = len(line) + 1
+        if self.bytes_captured + size > self.max_bytes:
+            return
+        self.bytes_captured += size
+        # QueueHandler only enqueues, the file write happens on the listener thread
+        self._spool.info("%s %s", self.stream_id, line)
+
+    def close(self) -> None:
+        logger.info("Agent Engine response spooled (%s)", self.summary())
+
+
+class CaptureFactory:
+    """Creates a ResponseCapture per stream according to the configured mode."""
+
+    def __init__(
+        self,
+        mode: str = "headtail",
+        max_bytes: int = 1024 * 1024,
+        head_bytes: int = 4096,
+        tail_bytes: int = 4096,
+        sample_rate: float = 0.01,
+        spool_path: str = "agent_responses.log",
+        spool_max_bytes: int = 50 * 1024 * 1024,
+        spool_backups: int = 5,
+    ):
+        if mode not in CAPTURE_MODES:
+            raise ValueError(f"Unknown response capture mode {mode!r}, expected one of {CAPTURE_MODES}.")
+        self.mode = mode
+        self.max_bytes = max_bytes
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+        self.sample_rate = sample_rate
+        self._listener = None
+        self._spool_logger = None
+        if mode == "spool":
+            file_handler = logging.handlers.RotatingFileHandler(
+                spool_path, maxBytes=spool_max_bytes, backupCount=spool_backups, encoding="utf-8", delay=True
+            )
+            file_handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            spool_queue = queue.SimpleQueue()
+            self._listener = logging.handlers.QueueListener(spool_queue, file_handler)
+            self._spool_logger = logging.getLogger("aimpact.backend.capture.spool")
+            self._spool_logger.setLevel(logging.INFO)
+            self._spool_logger.propagate = False
+            self._spool_logger.handlers = [logging.handlers.QueueHandler(spool_queue)]
+
+    def new(self, stream_id: str) -> ResponseCapture:
+        if self.mode == "headtail":
+            return HeadTailCapture(stream_id, self.max_bytes, self.head_bytes, self.tail_bytes)
+        if self.mode == "sampled":
+            return SampledCapture(stream_id, self.max_bytes, self.sample_rate)
+        if self.mode == "spool":
+            return SpoolCapture(stream_id, self.max_bytes, self._spool_logger)
+        return ResponseCapture(stream_id, self.max_bytes)
+
+    def start(self) -> None:
+        if self._listener is not None and self._listener._thread is None:
+            self._listener.start()
+
+    def stop(self) -> None:
+        """Flushes queued spool lines and stops the writer thread."""
+        if self._listener is not None and self._listener._thread is not None:
+            self._listener.stop()
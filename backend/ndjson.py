@@ -0,0 +1,102 @@
+import json
+from typing import Any, AsyncIterator, List, NamedTuple, Optional
+
+
+class NDJSONEvent(NamedTuple):
+    """One line of a newline-delimited JSON stream."""
+    line: str
+    data: Any = None
+    error: Optional[Exception] = None
+
+
+class NDJSONParser:
+    """
+    Incremental parser for newline-delimited JSON streams.
+
+    Chunks are appended to a carry-over byte buffer and framed on b"\\n". The search for
+    the next newline resumes where the previous one stopped, so every byte is scanned
+    once no matter how the stream is split into chunks. Framing happens on bytes rather
+    than text: 0x0A never occurs inside a multi-byte UTF-8 sequence, so a complete line
+    always holds complete characters and decodes on its own, and a character split
+    across chunks simply waits in the buffer with the rest of its line.
+
+    Lines longer than `max_line_bytes` are dropped (and counted) instead of growing the
+    buffer without bound.
+    """
+
+    def __init__(self, max_line_bytes: int = 8 * 1024 * 1024):
+        self.max_line_bytes = max_line_bytes
+        self._buffer = bytearray()
+        self._scan_from = 0
+        self._discarding = False
+
+        self.bytes_in = 0
+        self.lines = 0
+        self.errors = 0
+        self.oversized_lines = 0
+
+    def feed(self, chunk: bytes) -> List[NDJSONEvent]:
+        """Adds a chunk and returns the events for every line it completed."""
+        self.bytes_in += len(chunk)
+        buffer = self._buffer
+        buffer += chunk
+        events = []
+        start = 0
+        while True:
+            newline = buffer.find(b"\n", self._scan_from)
+            if newline == -1:
+                break
+            if self._discarding:
+                self._discarding = False
+            else:
+                self._emit(buffer[start:newline], events)
+            start = self._scan_from = newline + 1
+
+        if start:
+            del buffer[:start]
+        self._scan_from = len(buffer)
+        if len(buffer) > self.max_line_bytes:
+            if not self._discarding:
+                self.oversized_lines += 1
+            self._discarding = True
+            buffer.clear()
+            self._scan_from = 0
+        return events
+
+    def close(self) -> List[NDJSONEvent]:
+        """Flushes a final line that was not newline-terminated."""
+        events = []
+        if self._buffer and not self._discarding:
+            self._emit(self._buffer, events)
+        self._buffer.clear()
+        self._scan_from = 0
+        self._discarding = False
+        return events
+
+    def _emit(self, raw: bytearray, events: list) -> None:
+        if raw.endswith(b"\r"):
+            raw = raw[:-1]
+        if not raw.strip():
+            return
+        self.lines += 1
+        try:
+            line = raw.decode("utf-8")
+        except UnicodeDecodeError as e:
+            self.errors += 1
+            events.append(NDJSONEvent(raw.decode("utf-8", errors="replace"), error=e))
+            return
+        try:
+            events.append(NDJSONEvent(line, json.loads(line)))
+        except json.JSONDecodeError as e:
+            self.errors += 1
+            events.append(NDJSONEvent(line, error=e))
+
+
+async def aiter_ndjson(chunks: AsyncIterator[bytes], parser: Optional[NDJSONParser] = None) -> AsyncIterator[NDJSONEvent]:
+    """Parses an async byte stream (e.g. httpx `aiter_bytes()`) into NDJSON events."""
+    parser = parser or NDJSONParser()
+    async for chunk in chunks:
+        for event in parser.feed(chunk):
+            yield event
+    for event in parser.close():
+        yield event
@@ -0,0 +1,191 @@
+import collections
+import itertools
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, List, Optional, Tuple
+
+# (seq, frame) pairs; seq numbers start at 1 and are contiguous within a turn
+ReplayItems = List[Tuple[int, str]]
+
+
+class BaseReplayStore(ABC):
+    """Abstract base class for the per-turn buffers of SSE frames used to resume streams."""
+
+    @abstractmethod
+    def append(self, turn_id: str, frame: str) -> int:
+        """Appends a frame to a turn's buffer and returns its sequence number."""
+        pass
+
+    @abstractmethod
+    def read_after(self, turn_id: str, seq: int) -> Optional[Tuple[ReplayItems, bool]]:
+        """
+        Returns the buffered frames after `seq` and whether some were already evicted
+        (a gap), or None if the turn is unknown.
+        """
+        pass
+
+    @abstractmethod
+    def finish(self, turn_id: str) -> None:
+        """Marks a turn as complete, which starts its TTL."""
+        pass
+
+    @abstractmethod
+    def has(self, turn_id: str) -> bool:
+        """True if frames of the turn are still buffered."""
+        pass
+
+    @abstractmethod
+    def is_finished(self, turn_id: str) -> bool:
+        """True if the turn was marked complete."""
+        pass
+
+    @abstractmethod
+    def evict_expired(self) -> int:
+        """Drops finished turns past their TTL and returns how many were dropped."""
+        pass
+
+
+class _TurnBuffer:
+    __slots__ = ("frames", "bytes", "next_seq", "finished_at")
+
+    def __init__(self):
+        self.frames = collections.deque()
+        self.bytes = 0
+        self.next_seq = 1
+        self.finished_at: Optional[float] = None
+
+
+class InMemoryReplayStore(BaseReplayStore):
+    """
+    Bounded in-process replay buffers.
+
+    Each turn keeps a ring of at most `max_events_per_turn` frames / `max_bytes_per_turn`
+    bytes; older frames fall off the front. Finished turns expire `ttl` seconds after
+    completion. When the store as a whole exceeds `max_bytes`, finished turns are dropped
+    oldest first, and if that is not enough, the rings of the least recently written live
+    turns are trimmed from the front (each keeps at least its newest frame). Once every
+    live ring is down to one frame nothing more can go, and the excess is reported as
+    `bytes_over_limit` instead of being searched for on every append.
+    """
+
+    def __init__(
+        self,
+        max_events_per_turn: int = 2048,
+        max_bytes_per_turn: int = 4 * 1024 * 1024,
+        max_bytes: int = 256 * 1024 * 1024,
+        ttl: float = 300.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_events_per_turn = max_events_per_turn
+        self.max_bytes_per_turn = max_bytes_per_turn
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._clock = clock
+        # Live turns in least recently written order; finished turns in the order they finished
+        self._live: "collections.OrderedDict[str, _TurnBuffer]" = collections.OrderedDict()
+        self._finished: "collections.OrderedDict[str, _TurnBuffer]" = collections.OrderedDict()
+        # The live turns with more than one frame, also least recently written first
+        self._trimmable: "collections.OrderedDict[str, _TurnBuffer]" = collections.OrderedDict()
+        self.total_bytes = 0
+
+        self.evicted_frames = 0
+        self.evicted_frames_memory = 0
+        self.evicted_turns_ttl = 0
+        self.evicted_turns_memory = 0
+
+    def _get(self, turn_id: str) -> Optional[_TurnBuffer]:
+        buffer = self._live.get(turn_id)
+        return buffer if buffer is not None else self._finished.get(turn_id)
+
+    def append(self, turn_id: str, frame: str) -> int:
+        buffer = self._live.get(turn_id)
+        if buffer is not None:
+            self._live.move_to_end(turn_id)
+        else:
+            buffer = self._finished.get(turn_id)
+            if buffer is None:
+                buffer = self._live[turn_id] = _TurnBuffer()
+        seq = buffer.next_seq
+        buffer.next_seq += 1
+        buffer.frames.append((seq, frame))
+        buffer.bytes += len(frame)
+        self.total_bytes += len(frame)
+        # The newest frame is always kept, so a reader that fell behind still has somewhere to resume from
+        while len(buffer.frames) > 1 and (len(buffer.frames) > self.max_events_per_turn or buffer.bytes > self.max_bytes_per_turn):
+            self._pop_frame(buffer)
+            self.evicted_frames += 1
+        if buffer.finished_at is None and len(buffer.frames) > 1:
+            self._trimmable[turn_id] = buffer
+            self._trimmable.move_to_end(turn_id)
+        if self.total_bytes > self.max_bytes:
+            self._evict_for_memory()
+        return seq
+
+    def read_after(self, turn_id: str, seq: int) -> Optional[Tuple[ReplayItems, bool]]:
+        buffer = self._get(turn_id)
+        if buffer is None:
+            return None
+        if not buffer.frames:
+            return [], seq + 1 < buffer.next_seq
+        first_seq = buffer.frames[0][0]
+        start = max(0, seq + 1 - first_seq)
+        return list(itertools.islice(buffer.frames, start, None)), seq + 1 < first_seq
+
+    def finish(self, turn_id: str) -> None:
+        buffer = self._live.pop(turn_id, None)
+        if buffer is not None:
+            self._trimmable.pop(turn_id, None)
+            buffer.finished_at = self._clock()
+            self._finished[turn_id] = buffer
+
+    def has(self, turn_id: str) -> bool:
+        return turn_id in self._live or turn_id in self._finished
+
+    def is_finished(self, turn_id: str) -> bool:
+        return turn_id in self._finished
+
+    def _pop_frame(self, buffer: _TurnBuffer) -> None:
+        _, dropped = buffer.frames.popleft()
+        buffer.bytes -= len(dropped)
+        self.total_bytes -= len(dropped)
+
+    def _drop_oldest_finished(self) -> None:
+        _, buffer = self._finished.popitem(last=False)
+        self.total_bytes -= buffer.bytes
+
+    def evict_expired(self) -> int:
+        # Every finished turn has the same TTL, so the expired ones are at the front
+        cutoff = self._clock() - self.ttl
+        expired = 0
+        while self._finished and next(iter(self._finished.values())).finished_at <= cutoff:
+            self._drop_oldest_finished()
+            expired += 1
+        self.evicted_turns_ttl += expired
+        return expired
+
+    def _evict_for_memory(self) -> None:
+        while self.total_bytes > self.max_bytes and self._finished:
+            self._drop_oldest_finished()
+            self.evicted_turns_memory += 1
+        if self.total_bytes <= self.max_bytes:
+            return
+        while self._trimmable and self.total_bytes > self.max_bytes:
+            turn_id, buffer = next(iter(self._trimmable.items()))
+            while len(buffer.frames) > 1 and self.total_bytes > self.max_bytes:
+                self._pop_frame(buffer)
+                self.evicted_frames_memory += 1
+            if len(buffer.frames) <= 1:
+                del self._trimmable[turn_id]
+
+    def stats(self) -> dict:
+        return {
+            "turns": len(self._live) + len(self._finished),
+            "live_turns": len(self._live),
+            "bytes": self.total_bytes,
+            "evicted_frames": self.evicted_frames,
+            "evicted_frames_memory": self.evicted_frames_memory,
+            "evicted_turns_ttl": self.evicted_turns_ttl,
+            "evicted_turns_memory": self.evicted_turns_memory,
+            # What is left over REPLAY_MAX_BYTES once every live ring is down to its newest frame
+            "bytes_over_limit": max(0, self.total_bytes - self.max_bytes),
+        }
@@ -0,0 +1,200 @@
+import asyncio
+import collections
+import contextlib
+import json
+import time
+from typing import AsyncIterator, Callable, List, Optional
+
+from starlette.responses import StreamingResponse
+
+# Event types whose consecutive contents can be concatenated into a single frame
+MERGEABLE_TYPES = frozenset({"text", "tool_code"})
+
+# Process-wide counters, reported on GET /metrics
+coalescing_totals = collections.Counter()
+
+
+def sse_frame(payload: dict) -> str:
+    """Formats a payload as a single SSE `data:` frame."""
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+class SSECoalescer:
+    """
+    Merges consecutive `text` / `tool_code` events into one frame.
+
+    Pending content is flushed when its type changes, when it reaches `max_bytes`, when
+    a non-mergeable event arrives (those are never delayed), or once `deadline` passes;
+    the caller is responsible for flushing on the deadline. `max_latency` is therefore
+    the most a fragment can be held back.
+    """
+
+    def __init__(self, max_latency: float = 0.05, max_bytes: int = 16 * 1024, clock: Callable[[], float] = time.monotonic):
+        self.max_latency = max_latency
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._pending_type: Optional[str] = None
+        self._pending: List[str] = []
+        self._pending_bytes = 0
+        self.deadline: Optional[float] = None
+
+        self.events_in = 0
+        self.frames_out = 0
+        self.flushes = collections.Counter()
+
+    def add(self, event: dict) -> List[str]:
+        """Adds an event and returns the frames that are due now."""
+        self.events_in += 1
+        event_type = event.get("type")
+        if event_type not in MERGEABLE_TYPES:
+            self.frames_out += 1
+            return self.flush("event") + [sse_frame(event)]
+
+        out = []
+        if self._pending_type is not None and self._pending_type != event_type:
+            out = self.flush("type")
+        if self._pending_type is None:
+            self._pending_type = event_type
+            self.deadline = self._clock() + self.max_latency
+        content = event.get("content", "")
+        self._pending.append(content)
+        self._pending_bytes += len(content)
+        if self._pending_bytes >= self.max_bytes:
+            out += self.flush("size")
+        return out
+
+    def flush(self, reason: str = "end") -> List[str]:
+        """Returns the pending content as a single frame (or nothing) and clears it."""
+        if self._pending_type is None:
+            return []
+        frame = sse_frame({"type": self._pending_type, "content": "".join(self._pending)})
+        self._pending_type = None
+        self._pending = []
+        self._pending_bytes = 0
+        self.deadline = None
+        self.frames_out += 1
+        self.flushes[reason] += 1
+        return [frame]
+
+
+class _PumpError:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+async def coalesce(
+    events: AsyncIterator[dict],
+    max_latency: float = 0.05,
+    max_bytes: int = 16 * 1024,
+    queue_size: int = 64,
+) -> AsyncIterator[List[str]]:
+    """
+    Turns an async iterator of event dicts into batches of SSE frames.
+
+    Events are read by a pump task into a small bounded queue, so the output side can
+    wake up on the coalescing deadline even while the source is stalled. Whatever is
+    already queued when the output side wakes up comes out as one batch.
+    """
+    coalescer = SSECoalescer(max_latency, max_bytes)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    done = object()
+
+    async def pump():
+        try:
+            async for event in events:
+                await queue.put(event)
+        except asyncio.CancelledError:
+            raise
+        except BaseException as e:
+            await queue.put(_PumpError(e))
+            return
+        await queue.put(done)
+
+    loop = asyncio.get_running_loop()
+    pump_task = loop.create_task(pump())
+    # Kept across deadline timeouts rather than cancelled: on 3.11 `wait_for` can drop
+    # an item that is handed over just as its timeout fires
+    get_task: Optional[asyncio.Task] = None
+    try:
+        while True:
+            if get_task is None:
+                get_task = loop.create_task(queue.get())
+            if coalescer.deadline is None:
+                await asyncio.wait({get_task})
+            else:
+                await asyncio.wait({get_task}, timeout=max(0.0, coalescer.deadline - time.monotonic()))
+                if not get_task.done():
+                    yield coalescer.flush("deadline")
+                    continue
+            item, get_task = get_task.result(), None
+
+            out = []
+            finished = False
+            while True:
+                if item is done:
+                    out.extend(coalescer.flush("end"))
+                    finished = True
+                    break
+                if isinstance(item, _PumpError):
+                    raise item.error
+                out.extend(coalescer.add(item))
+                try:
+                    item = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+            if out:
+                yield out
+            if finished:
+                return
+    finally:
+        for task in (get_task, pump_task):
+            if task is not None:
+                task.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await task
+        coalescing_totals["events_in"] += coalescer.events_in
+        coalescing_totals["frames_out"] += coalescer.frames_out
+        for reason, count in coalescer.flushes.items():
+            coalescing_totals[f"flush_{reason}"] += count
+
+
+class EventStreamResponse(StreamingResponse):
+    """
+    StreamingResponse that notices the client going away while the stream is idle.
+
+    Depending on the ASGI spec version the server advertises, StreamingResponse may
+    only find out about a disconnect when its next write fails, which for a quiet agent
+    turn can be minutes later. This response always listens for `http.disconnect` next
+    to the stream and cancels the body iterator as soon as it arrives, which in turn
+    closes the upstream request.
+    """
+
+    media_type = "text/event-stream"
+
+    def __init__(self, content, on_disconnect: Optional[Callable[[], None]] = None, **kwargs):
+        super().__init__(content, **kwargs)
+        self.on_disconnect = on_disconnect
+
+    async def __call__(self, scope, receive, send) -> None:
+        async def wait_for_disconnect():
+            while True:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    return
+
+        loop = asyncio.get_running_loop()
+        stream_task = loop.create_task(self.stream_response(send))
+        watch_task = loop.create_task(wait_for_disconnect())
+        try:
+            await asyncio.wait({stream_task, watch_task}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            disconnected = watch_task.done() and not stream_task.done()
+            for task in (stream_task, watch_task):
+                task.cancel()
+            for task in (stream_task, watch_task):
+                with contextlib.suppress(asyncio.CancelledError, OSError):
+                    await task
+        if disconnected and self.on_disconnect is not None:
+            self.on_disconnect()
+        if self.background is not None:
+            await self.background()
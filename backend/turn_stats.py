@@ -0,0 +1,51 @@
+import logging
+import time
+
+logger = logging.getLogger("aimpact.backend.turns")
+
+
+class TurnStats:
+    """
+    Counters for upstream agent turns, including the ones cut short.
+
+    When a turn is cancelled (client gone, upstream stalled) the bytes and seconds that
+    were *not* spent are estimated from the average size and duration of completed turns.
+    """
+
+    def __init__(self):
+        self.completed = 0
+        self.bytes_completed = 0
+        self.seconds_completed = 0.0
+        self.cancelled = {}
+        self.bytes_saved_estimate = 0
+        self.seconds_saved_estimate = 0.0
+        self.last_cancelled_at = None
+
+    def record_completed(self, bytes_read: int, seconds: float) -> None:
+        self.completed += 1
+        self.bytes_completed += bytes_read
+        self.seconds_completed += seconds
+
+    def record_cancelled(self, bytes_read: int, seconds: float, reason: str) -> None:
+        self.cancelled[reason] = self.cancelled.get(reason, 0) + 1
+        self.last_cancelled_at = time.monotonic()
+        saved_bytes, saved_seconds = 0, 0.0
+        if self.completed:
+            saved_bytes = max(0, self.bytes_completed // self.completed - bytes_read)
+            saved_seconds = max(0.0, self.seconds_completed / self.completed - seconds)
+        self.bytes_saved_estimate += saved_bytes
+        self.seconds_saved_estimate += saved_seconds
+        logger.info(
+            "Cancelled Agent Engine turn (%s) after %d bytes / %.2fs, estimated saving %d bytes / %.2fs",
+            reason, bytes_read, seconds, saved_bytes, saved_seconds,
+        )
+
+    def metrics(self) -> dict:
+        return {
+            "completed": self.completed,
+            "cancelled": dict(self.cancelled),
+            "avg_turn_bytes": self.bytes_completed // self.completed if self.completed else None,
+            "avg_turn_seconds": round(self.seconds_completed / self.completed, 3) if self.completed else None,
+            "bytes_saved_estimate": self.bytes_saved_estimate,
+            "seconds_saved_estimate": round(self.seconds_saved_estimate, 3),
+        }
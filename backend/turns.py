@@ -0,0 +1,265 @@
+import asyncio
+import contextlib
+import hashlib
+import json
+import logging
+import uuid
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from replay import BaseReplayStore
+from sse import sse_frame
+
+logger = logging.getLogger("aimpact.backend.turns")
+
+
+def parse_last_event_id(value: Optional[str]) -> Optional[Tuple[str, int]]:
+    """Splits a `Last-Event-ID` of the form "<turn_id>:<seq>"; returns None if malformed."""
+    if not value:
+        return None
+    turn_id, _, seq = value.strip().rpartition(":")
+    if not turn_id or not seq.isdigit():
+        return None
+    return turn_id, int(seq)
+
+
+def _normalize(value):
+    if isinstance(value, str):
+        return " ".join(value.split())
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_normalize(v) for v in value]
+    return value
+
+
+def single_flight_key(body: dict) -> str:
+    """
+    Key under which identical agent requests share one turn: the request body with key
+    order and runs of whitespace in its strings normalized away.
+    """
+    canonical = json.dumps(_normalize(body), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class Turn:
+    """
+    One upstream agent turn, decoupled from the connections watching it.
+
+    A producer task appends the turn's SSE frames to the replay store; every connection
+    is a subscriber that reads the store from its own cursor, so a client can drop and
+    resume from its `Last-Event-ID` without a new upstream call. When the last subscriber
+    leaves, the producer keeps running for `resume_grace` seconds before it is cancelled.
+    """
+
+    def __init__(self, turn_id: str, store: BaseReplayStore, resume_grace: float = 10.0, done: bool = False, key: Optional[str] = None):
+        self.turn_id = turn_id
+        self.key = key
+        self.store = store
+        self.resume_grace = resume_grace
+        self.done = done
+        self.cancelled = False
+        self.subscribers = 0
+        self._changed = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._idle_timer: Optional[asyncio.TimerHandle] = None
+        self._done_callbacks: List[Callable[["Turn"], None]] = []
+
+    def add_done_callback(self, callback: Callable[["Turn"], None]) -> None:
+        """Calls `callback(turn)` once the producer has finished, however it ended."""
+        self._done_callbacks.append(callback)
+
+    def start(self, frames: AsyncIterator[List[str]]) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._run(frames))
+
+    async def _run(self, frames: AsyncIterator[List[str]]) -> None:
+        completed = False
+        try:
+            async for batch in frames:
+                for frame in batch:
+                    self.store.append(self.turn_id, frame)
+                self._notify()
+            completed = True
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error("Agent turn %s failed: %s", self.turn_id, e)
+        finally:
+            if not completed:
+                # Whoever resumes this turn later still gets a terminated stream
+                self.store.append(self.turn_id, sse_frame({'type': 'error', 'content': 'The agent turn was interrupted.'}))
+                self.store.append(self.turn_id, sse_frame({'type': 'end'}))
+            self.done = True
+            self.store.finish(self.turn_id)
+            self._notify()
+            for callback in self._done_callbacks:
+                callback(self)
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def cancel(self) -> None:
+        if self._task is not None and not self._task.done():
+            self.cancelled = True
+            self._task.cancel()
+
+    async def wait(self) -> None:
+        if self._task is not None:
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+
+    def _attach(self) -> None:
+        self.subscribers += 1
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+            self._idle_timer = None
+
+    def _detach(self) -> None:
+        self.subscribers -= 1
+        if self.subscribers or self.done:
+            return
+        if self.resume_grace <= 0:
+            self.cancel()
+        else:
+            self._idle_timer = asyncio.get_running_loop().call_later(self.resume_grace, self._cancel_if_unwatched)
+
+    def _cancel_if_unwatched(self) -> None:
+        self._idle_timer = None
+        if not self.subscribers:
+            self.cancel()
+
+    async def subscribe(self, after_seq: int = 0) -> AsyncIterator[str]:
+        """Yields SSE chunks (frames with `id:` lines) after `after_seq`, then follows the turn live."""
+        self._attach()
+        try:
+            cursor = after_seq
+            while True:
+                changed = self._changed
+                result = self.store.read_after(self.turn_id, cursor)
+                if result is None and not self.done:
+                    await changed.wait()  # Nothing produced yet
+                    continue
+                if result is None:
+                    yield sse_frame({'type': 'error', 'content': 'This agent turn is no longer available.'}) + sse_frame({'type': 'end'})
+                    return
+                items, gap = result
+                chunk = []
+                if gap:
+                    chunk.append(f"id: {self.turn_id}:{cursor}\n" + sse_frame({'type': 'error', 'content': 'Some events of this turn are no longer available.'}))
+                for seq, frame in items:
+                    chunk.append(f"id: {self.turn_id}:{seq}\n{frame}")
+                    cursor = seq
+                if chunk:
+                    yield "".join(chunk)
+                elif self.done or self.store.is_finished(self.turn_id):
+                    return
+                else:
+                    await changed.wait()
+        finally:
+            self._detach()
+
+
+class TurnRegistry:
+    """
+    Tracks live turns by ID and periodically expires finished ones from the replay store.
+
+    Turns started with a single-flight key can be joined by later requests with the same
+    key while they are still running. Every subscriber reads the replay store from its
+    own cursor, so a slow client only falls behind (and, past the replay ring, gets a gap
+    error) instead of holding up the upstream stream or the other subscribers.
+    """
+
+    def __init__(self, store: BaseReplayStore, resume_grace: float = 10.0, sweep_interval: float = 30.0):
+        self.store = store
+        self.resume_grace = resume_grace
+        self.sweep_interval = sweep_interval
+        self._live: Dict[str, Turn] = {}
+        self._flights: Dict[str, Turn] = {}
+        self._sweeper: Optional[asyncio.Task] = None
+
+        self.started = 0
+        self.resumed = 0
+        self.resume_misses = 0
+        self.single_flight_requests = 0
+        self.single_flight_hits = 0
+
+    def start(self, frames: AsyncIterator[List[str]], key: Optional[str] = None) -> Turn:
+        """Starts producing a new turn in the background and returns it; `key` makes it joinable."""
+        turn = Turn(uuid.uuid4().hex, self.store, self.resume_grace, key=key)
+        self._live[turn.turn_id] = turn
+        if key is not None:
+            self._flights[key] = turn
+        self.started += 1
+        turn.add_done_callback(self._finished)
+        turn.start(frames)
+        return turn
+
+    def join(self, key: str, retry: bool = False) -> Optional[Turn]:
+        """
+        Returns the running turn started under `key`, if a new subscriber can still see all
+        of it. `retry` marks a second look for the same request, which is not counted again.
+        """
+        if not retry:
+            self.single_flight_requests += 1
+        turn = self._flights.get(key)
+        if turn is None or turn.done or turn.cancelled:
+            return None
+        result = self.store.read_after(turn.turn_id, 0)
+        if result is not None and result[1]:
+            return None  # Its first frames already fell out of the replay ring
+        self.single_flight_hits += 1
+        return turn
+
+    def _finished(self, turn: Turn) -> None:
+        self._live.pop(turn.turn_id, None)
+        if turn.key is not None and self._flights.get(turn.key) is turn:
+            del self._flights[turn.key]
+
+    def resume(self, turn_id: str) -> Optional[Turn]:
+        """Returns the turn to resume: the live one, or a finished one still in the replay store."""
+        turn = self._live.get(turn_id)
+        if turn is None and self.store.has(turn_id):
+            turn = Turn(turn_id, self.store, self.resume_grace, done=self.store.is_finished(turn_id))
+        if turn is None:
+            self.resume_misses += 1
+        else:
+            self.resumed += 1
+        return turn
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            self.store.evict_expired()
+
+    def start_sweeper(self) -> None:
+        if self._sweeper is None:
+            self._sweeper = asyncio.get_running_loop().create_task(self._sweep_loop())
+
+    async def stop(self) -> None:
+        """Stops the sweeper and cancels every live turn."""
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._sweeper
+            self._sweeper = None
+        turns = list(self._live.values())
+        for turn in turns:
+            turn.cancel()
+        for turn in turns:
+            await turn.wait()
+
+    def metrics(self) -> dict:
+        stats = {
+            "live": len(self._live),
+            "started": self.started,
+            "resumed": self.resumed,
+            "resume_misses": self.resume_misses,
+            "single_flight": {
+                "requests": self.single_flight_requests,
+                "hits": self.single_flight_hits,
+                "hit_rate": round(self.single_flight_hits / self.single_flight_requests, 4) if self.single_flight_requests else 0.0,
+            },
+        }
+        if hasattr(self.store, "stats"):
+            stats["replay"] = self.store.stats()
+        return stats
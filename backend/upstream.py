@@ -0,0 +1,179 @@
+import asyncio
+import contextlib
+import logging
+import time
+from typing import AsyncIterator, Dict, Optional
+
+import httpx
+
+logger = logging.getLogger("aimpact.backend.upstream")
+
+try:
+    import h2  # noqa: F401  # Optional: enables HTTP/2 in httpx
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class UpstreamIdleTimeout(Exception):
+    """Raised when an upstream stream sends nothing for longer than the idle timeout."""
+
+
+async def iter_with_idle_timeout(chunks: AsyncIterator[bytes], timeout: float) -> AsyncIterator[bytes]:
+    """Re-yields `chunks`, raising UpstreamIdleTimeout if the gap between two chunks exceeds `timeout`."""
+    iterator = chunks.__aiter__()
+    while True:
+        try:
+            chunk = await asyncio.wait_for(iterator.__anext__(), timeout)
+        except StopAsyncIteration:
+            return
+        except asyncio.TimeoutError:
+            raise UpstreamIdleTimeout(f"No data from upstream for {timeout:g}s.")
+        yield chunk
+
+
+class UpstreamClient:
+    """
+    Shared, size-bounded HTTP client for calls to the Agent Engine.
+
+    A single httpx.AsyncClient is kept for the life of the process so agent turns reuse
+    warm keep-alive connections (multiplexed over HTTP/2 when `h2` is installed) instead
+    of paying DNS, TCP and TLS setup on every request. Concurrency towards each host is
+    capped by `max_per_host`; requests over the cap wait for a slot, and that wait is
+    what `stats()` reports alongside pool occupancy.
+
+    Idle connections are closed once they pass `keepalive_expiry`. httpcore also drops a
+    pooled connection the server has already closed before handing it out, and a
+    background janitor sweeps expired connections even while no requests arrive.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 200,
+        max_keepalive_connections: int = 50,
+        max_per_host: int = 200,
+        keepalive_expiry: float = 30.0,
+        connect_timeout: float = 10.0,
+        read_timeout: Optional[float] = None,
+        acquire_timeout: Optional[float] = 30.0,
+        http2: Optional[bool] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.max_per_host = max_per_host
+        self.keepalive_expiry = keepalive_expiry
+        self.acquire_timeout = acquire_timeout
+        self.http2 = HTTP2_AVAILABLE if http2 is None else (http2 and HTTP2_AVAILABLE)
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        # Agent turns can go quiet for minutes while a tool runs, so the read timeout is
+        # unbounded unless configured; connection setup is always bounded.
+        self._timeout = httpx.Timeout(connect_timeout, read=read_timeout, write=connect_timeout, pool=acquire_timeout)
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._janitor: Optional[asyncio.Task] = None
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+        self._host_in_flight: Dict[str, int] = {}
+
+        self.waiting = 0
+        self.acquired_total = 0
+        self.acquire_timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.evicted_idle = 0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            transport = self._transport or httpx.AsyncHTTPTransport(limits=self._limits, http2=self.http2, retries=1)
+            self._client = httpx.AsyncClient(transport=transport, timeout=self._timeout)
+        return self._client
+
+    async def start(self) -> None:
+        """Creates the client and starts the idle-connection janitor on the running loop."""
+        self.client
+        if self._janitor is None and self.keepalive_expiry:
+            self._janitor = asyncio.get_running_loop().create_task(self._evict_idle_loop())
+
+    async def aclose(self) -> None:
+        if self._janitor is not None:
+            self._janitor.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._janitor
+            self._janitor = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _pool(self):
+        # httpx does not expose its connection pool publicly, used for stats and eviction only
+        return getattr(self.client._transport, "_pool", None)
+
+    async def _evict_idle_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.keepalive_expiry)
+            pool = self._pool()
+            if pool is None:
+                continue
+            for connection in list(pool.connections):
+                if connection.has_expired():
+                    try:
+                        await connection.aclose()
+                        self.evicted_idle += 1
+                    except Exception as e:
+                        logger.debug("Error closing idle upstream connection: %s", e)
+
+    def _slot(self, host: str) -> asyncio.Semaphore:
+        slot = self._host_slots.get(host)
+        if slot is None:
+            slot = self._host_slots[host] = asyncio.Semaphore(self.max_per_host)
+            self._host_in_flight[host] = 0
+        return slot
+
+    @contextlib.asynccontextmanager
+    async def stream(self, method: str, url: str, **kwargs):
+        """Like httpx.AsyncClient.stream, but waits for a per-host slot first."""
+        host = httpx.URL(url).netloc.decode("ascii")
+        slot = self._slot(host)
+
+        started = time.perf_counter()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(slot.acquire(), self.acquire_timeout)
+        except asyncio.TimeoutError:
+            self.acquire_timeouts += 1
+            raise httpx.PoolTimeout(f"Timed out waiting for a connection slot to {host}.")
+        finally:
+            self.waiting -= 1
+        waited = time.perf_counter() - started
+        self.acquired_total += 1
+        self.wait_seconds_total += waited
+        self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+        self._host_in_flight[host] += 1
+        try:
+            async with self.client.stream(method, url, **kwargs) as response:
+                yield response
+        finally:
+            self._host_in_flight[host] -= 1
+            slot.release()
+
+    def stats(self) -> dict:
+        pool = self._pool() if self._client is not None else None
+        connections = list(pool.connections) if pool is not None else []
+        return {
+            "http2": self.http2,
+            "max_per_host": self.max_per_host,
+            "in_flight": sum(self._host_in_flight.values()),
+            "in_flight_per_host": dict(self._host_in_flight),
+            "waiting": self.waiting,
+            "connections": len(connections),
+            "idle_connections": sum(1 for c in connections if c.is_idle()),
+            "acquired_total": self.acquired_total,
+            "acquire_timeouts": self.acquire_timeouts,
+            "wait_ms_avg": round(self.wait_seconds_total / self.acquired_total * 1000, 3) if self.acquired_total else 0.0,
+            "wait_ms_max": round(self.wait_seconds_max * 1000, 3),
+            "evicted_idle": self.evicted_idle,
+        }
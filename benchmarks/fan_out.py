@@ -0,0 +1,96 @@
+"""
+Wall-clock speedup of the fan-out batch tools over one webhook call at a time.
+
+Every stub webhook call takes `--latency` seconds. A campaign of `--keywords` keywords
+(with a few repeats) goes through generate_twitter_threads one keyword at a time, as
+separate tool calls would, and then through generate_twitter_threads_batch at several
+concurrency limits. The same is done for Reddit ideas, one request per keyword covering
+`--subreddits` subreddits. Results are checked to match the sequential ones. Finally a
+third of the Reddit requests are made to fail, to show the partial result and the
+failed keywords the batch tool reports.
+
+    python -m benchmarks.fan_out --keywords 20 --latency 0.5
+"""
+import argparse
+import asyncio
+import time
+
+from agents.tools import fan_out
+from agents.tools.cache import tool_cache
+from agents.tools.reddit_content_idea_scraper import get_reddit_content_ideas
+from agents.tools.webhook_client import webhook_client
+from agents.tools.youtube_to_twitter_thread_generator import generate_twitter_threads
+from benchmarks.stub_webhooks import build_app, point_tools_at, serve_in_thread
+
+
+async def timed(coro):
+    started = time.perf_counter()
+    result = await coro
+    return result, time.perf_counter() - started
+
+
+async def sequential_twitter(keywords: list) -> dict:
+    return fan_out.merge_twitter_threads({k: await generate_twitter_threads(k, "marketers", "Educational") for k in keywords})
+
+
+async def sequential_reddit(keywords: list, subreddits: list) -> list:
+    ideas = []
+    for keyword in keywords:
+        ideas.extend(await get_reddit_content_ideas(keyword, ", ".join(subreddits)))
+    return ideas
+
+
+async def run(args, faults: dict) -> None:
+    tool_cache.enabled = False  # Every run must reach the stub
+    keywords = [f"topic {i}" for i in range(args.keywords)]
+    campaign = ", ".join(keywords + keywords[:3])  # Repeats are dropped by the batch tools
+    subreddits = [f"r/sub{i}" for i in range(args.subreddits)]
+
+    expected, sequential_seconds = await timed(sequential_twitter(keywords))
+    print(f"twitter, {len(keywords)} keywords")
+    print(f"  sequential: {sequential_seconds:.2f} s")
+    for concurrency in args.concurrency:
+        fan_out.DEFAULT_CONCURRENCY = concurrency
+        merged, seconds = await timed(fan_out.generate_twitter_threads_batch(campaign, "marketers", "Educational"))
+        print(f"  fan-out x{concurrency:<3}: {seconds:.2f} s, speedup {sequential_seconds / seconds:.1f}x, matches: {merged == expected}")
+
+    reddit_keywords = keywords[: max(1, args.keywords // 4)]
+    expected, sequential_seconds = await timed(sequential_reddit(reddit_keywords, subreddits))
+    print(f"reddit, {len(reddit_keywords)} keywords x {len(subreddits)} subreddits")
+    print(f"  sequential: {sequential_seconds:.2f} s, {len(expected)} ideas")
+    for concurrency in args.concurrency:
+        fan_out.DEFAULT_CONCURRENCY = concurrency
+        merged, seconds = await timed(fan_out.get_reddit_content_ideas_batch(", ".join(reddit_keywords), ", ".join(subreddits)))
+        same = sorted(map(str, merged)) == sorted(map(str, expected))
+        print(f"  fan-out x{concurrency:<3}: {seconds:.2f} s, speedup {sequential_seconds / seconds:.1f}x, {len(merged)} ideas, matches: {same}")
+
+    faults["reddit"] = {"error_rate": 0.34}
+    # Let the injected errors through instead of retrying them or opening the breaker
+    webhook_client.resilience.max_attempts = 1
+    webhook_client.resilience.failure_threshold = len(reddit_keywords) + 1
+    merged = await fan_out.get_reddit_content_ideas_batch(", ".join(reddit_keywords), ", ".join(subreddits))
+    failure = merged[-1] if merged and "error" in merged[-1] else {}
+    print(f"  with failures: {len(merged) - bool(failure)} ideas, failed keywords: {failure.get('failed_keywords', [])}")
+    faults.clear()
+    await webhook_client.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keywords", type=int, default=20)
+    parser.add_argument("--subreddits", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds each stub webhook call takes.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[4, 8, 20])
+    args = parser.parse_args()
+
+    app = build_app(latency=args.latency)
+    server, base_url = serve_in_thread(app)
+    point_tools_at(base_url)
+    try:
+        asyncio.run(run(args, app.state.faults))
+    finally:
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+`GeminiClient` against a fake model backend, offline.
+
+The fake transport answers after `--latency` seconds, streaming the answer in
+`--chunks` pieces, and records how many requests were running at once.
+
+- blocking vs concurrent: `--prompts` prompts one `predict` at a time, against
+  `predict_many` with `--concurrency` requests at once (and the peak the fake saw);
+- streaming: time to the first chunk against time to the whole answer;
+- caching: a workload where `--repeat-rate` of the temperature-0 prompts were asked
+  before, with and without the response cache. Reports requests that reached the
+  model and wall time.
+
+    python -m benchmarks.gemini_client --prompts 64 --concurrency 8 --latency 0.2
+"""
+import argparse
+import asyncio
+import random
+import time
+from typing import Any, AsyncIterator, Dict
+
+from agents.orchestrator.gemini_client import GeminiClient, GeminiTransport
+
+
+class FakeGeminiTransport(GeminiTransport):
+    """Answers every prompt with a canned text after a fixed latency."""
+
+    def __init__(self, latency: float = 0.2, chunks: int = 8, error_rate: float = 0.0):
+        self.latency = latency
+        self.chunks = chunks
+        self.error_rate = error_rate
+        self.requests = 0
+        self.active = 0
+        self.peak_active = 0
+
+    def _answer(self, prompt: str) -> str:
+        if random.random() < self.error_rate:
+            raise RuntimeError("503 The model is overloaded.")
+        return f"Answer to: {prompt}. " + "lorem ipsum " * 20
+
+    def generate(self, model: str, prompt: str, config: Dict[str, Any]) -> str:
+        self.requests += 1
+        time.sleep(self.latency)
+        return self._answer(prompt)
+
+    async def agenerate(self, model: str, prompt: str, config: Dict[str, Any]) -> str:
+        self.requests += 1
+        self.active += 1
+        self.peak_active = max(self.peak_active, self.active)
+        try:
+            await asyncio.sleep(self.latency)
+            return self._answer(prompt)
+        finally:
+            self.active -= 1
+
+    async def astream(self, model: str, prompt: str, config: Dict[str, Any]) -> AsyncIterator[str]:
+        self.requests += 1
+        answer = self._answer(prompt)
+        size = -(-len(answer) // self.chunks)
+        for i in range(0, len(answer), size):
+            await asyncio.sleep(self.latency / self.chunks)
+            yield answer[i:i + size]
+
+
+def workload(count: int, repeat_rate: float) -> list:
+    """Prompts where each one repeats an earlier prompt with probability `repeat_rate`."""
+    prompts = []
+    for i in range(count):
+        if prompts and random.random() < repeat_rate:
+            prompts.append(random.choice(prompts))
+        else:
+            prompts.append(f"Summarize the Reddit thread #{i} for a B2B SaaS marketer")
+    return prompts
+
+
+async def run(args) -> None:
+    prompts = [f"Write a tweet about topic {i}" for i in range(args.prompts)]
+
+    fake = FakeGeminiTransport(args.latency, args.chunks)
+    client = GeminiClient(transport=fake, max_concurrency=args.concurrency)
+    blocking_prompts = prompts[: max(1, args.prompts // 8)]
+    started = time.perf_counter()
+    for prompt in blocking_prompts:
+        client.predict(prompt)
+    blocking = (time.perf_counter() - started) / len(blocking_prompts) * len(prompts)
+    started = time.perf_counter()
+    answers = await client.predict_many(prompts)
+    concurrent = time.perf_counter() - started
+    assert all(a.startswith(f"Answer to: {p}") for a, p in zip(answers, prompts))
+    print(f"blocking:   {args.prompts} prompts one at a time ~{blocking:.2f} s (extrapolated from {len(blocking_prompts)})")
+    print(f"concurrent: predict_many {concurrent:.2f} s, peak {fake.peak_active} in flight (limit {args.concurrency})")
+
+    started = time.perf_counter()
+    first = None
+    async for _ in client.astream("Draft a LinkedIn post about FleetIQ"):
+        if first is None:
+            first = time.perf_counter() - started
+    whole = time.perf_counter() - started
+    print(f"streaming:  first chunk after {first * 1000:.0f} ms, whole answer after {whole * 1000:.0f} ms")
+
+    mixed = workload(args.prompts * 4, args.repeat_rate)
+    for label, cache_ttl in (("no cache", None), ("cache", 300)):
+        fake = FakeGeminiTransport(args.latency, args.chunks)
+        client = GeminiClient(transport=fake, max_concurrency=args.concurrency, cache_ttl=cache_ttl)
+        started = time.perf_counter()
+        for start in range(0, len(mixed), args.prompts):
+            await client.predict_many(mixed[start:start + args.prompts], temperature=0)
+        seconds = time.perf_counter() - started
+        m = client.metrics()
+        print(f"{label:>9}:  {len(mixed)} temperature-0 prompts ({args.repeat_rate:.0%} repeats), "
+              f"{fake.requests} model requests, {seconds:.2f} s, cache hits {m['cache_hits']}, "
+              f"shared in flight {m['shared_in_flight']}")
+
+    fake = FakeGeminiTransport(args.latency, args.chunks, error_rate=0.25)
+    client = GeminiClient(transport=fake, max_concurrency=args.concurrency)
+    answers = await client.predict_many(prompts)
+    print(f"errors:     {sum(a.startswith('Error:') for a in answers)}/{len(answers)} answered with an error string "
+          f"(metrics: {client.metrics()['errors']})")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--prompts", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds the fake model takes per answer.")
+    parser.add_argument("--chunks", type=int, default=8)
+    parser.add_argument("--repeat-rate", type=float, default=0.5)
+    random.seed(7)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Import-time budget for the agents package; exits with status 1 if it is exceeded.
+
+Each target is imported in a fresh interpreter with `-X importtime`, `--repeat` times,
+and the fastest run counts. Its cost is the cumulative time of the modules it
+imports, not counting interpreter startup (modules that `python -c pass` also imports).
+A target fails if it is over its budget (scaled by `--scale` for slower machines), or if
+it loads an SDK that should only be imported on first use.
+
+    python -m benchmarks.import_time --repeat 5
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Target -> (budget in ms, modules it must not import)
+BUDGETS: Dict[str, Tuple[float, List[str]]] = {
+    "agents.tools": (25, ["httpx", "pydantic", "google.adk", "vertexai", "google.generativeai"]),
+    "agents.tools.webhook_client": (250, ["google.adk", "vertexai", "google.generativeai"]),
+    "agents.tools.seo_keyword_generator": (450, ["google.adk", "vertexai", "google.generativeai", "dotenv"]),
+    "agents.tools.job_tools": (450, ["google.adk", "vertexai", "google.generativeai"]),
+    "agents.orchestrator": (25, ["google.adk", "vertexai", "google.generativeai"]),
+    "agents.orchestrator.gemini_client": (250, ["google.adk", "vertexai", "google.generativeai"]),
+    "agents.orchestrator.router": (60, ["google.adk", "vertexai", "google.generativeai", "pydantic"]),
+    # google.adk itself is most of this; it must not add the Gemini SDK or AdkApp
+    "agents.orchestrator.aimpact_super_agent": (7500, ["google.generativeai", "vertexai.preview.reasoning_engines"]),
+}
+
+CHECK = "import sys, {target}; print(' '.join(m for m in {forbidden!r} if m in sys.modules))"
+
+
+def top_level_imports(stderr: str) -> Dict[str, int]:
+    """Cumulative microseconds of each module imported directly by the -c code."""
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        if cumulative.strip().isdigit() and not name[1:].startswith(" "):
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def run(code: str) -> Tuple[Dict[str, int], str]:
+    env = dict(os.environ, PYTHONWARNINGS="ignore")
+    done = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    if done.returncode:
+        errors = [line for line in done.stderr.splitlines() if re.match(r"[\w.]+(Error|Exception)\b", line)]
+        raise RuntimeError(errors[-1] if errors else done.stderr.strip()[-200:])
+    # The check prints its answer last; anything before it was printed by the imports
+    lines = done.stdout.splitlines()
+    return top_level_imports(done.stderr), lines[-1].strip() if lines else ""
+
+
+def measure(target: str, forbidden: List[str], startup: set, repeat: int) -> Tuple[float, str]:
+    best = float("inf")
+    loaded = ""
+    for _ in range(repeat):
+        times, loaded = run(CHECK.format(target=target, forbidden=forbidden))
+        best = min(best, sum(us for name, us in times.items() if name not in startup) / 1000)
+    return best, loaded
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplies every budget.")
+    parser.add_argument("targets", nargs="*", default=list(BUDGETS))
+    args = parser.parse_args()
+
+    startup = set(run("pass")[0])
+    failures = 0
+    print(f"{'target':<42} {'ms':>8} {'budget':>8}  result")
+    for target in args.targets:
+        budget, forbidden = BUDGETS[target]
+        budget *= args.scale
+        try:
+            ms, loaded = measure(target, forbidden, startup, args.repeat)
+        except RuntimeError as e:
+            failures += 1
+            print(f"{target:<42} {'-':>8} {budget:>8.0f}  import failed: {e}")
+            continue
+        problems = []
+        if ms > budget:
+            problems.append("over budget")
+        if loaded:
+            problems.append(f"imported {loaded}")
+        failures += bool(problems)
+        print(f"{target:<42} {ms:>8.1f} {budget:>8.0f}  {'; '.join(problems) or 'ok'}")
+    if failures:
+        print(f"{failures} target(s) regressed.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Prompt size per turn with the intent router on and off, over a fixture set of queries.
+
+Each conversation is run through the real ADK request pipeline (`InMemoryRunner`),
+with a fake model that records the request it is sent and answers with text. For each
+turn this reports the bytes of system instruction and tool declarations sent and the
+approximate instruction tokens. It also checks that the router kept every tool the turn
+needs, and reports how long routing takes.
+
+    python -m benchmarks.instruction_routing
+"""
+import argparse
+import asyncio
+import logging
+import time
+from typing import AsyncGenerator, List
+
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+from google.adk.runners import InMemoryRunner
+from google.genai import types
+
+from agents.orchestrator.aimpact_super_agent import AImpactSuperAgent
+from agents.orchestrator.instructions import estimate_tokens
+from agents.orchestrator.router import intent_router
+
+# Conversations; each turn is (user message, tools the answer needs)
+CONVERSATIONS: List[List[tuple]] = [
+    [("Generate SEO keywords for FleetIQ, a fleet maintenance platform for US logistics companies.",
+      {"generate_seo_keywords"}),
+     ("Great, now focus them on Canada.", {"generate_seo_keywords"})],
+    [("Give me content ideas from r/marketing and r/startups about cold email.", {"get_reddit_content_ideas"})],
+    [("What are people on reddit saying about AI SDRs?", {"get_reddit_content_ideas"})],
+    [("Write a Twitter thread about predictive maintenance for fleet managers, educational tone.",
+      {"generate_twitter_threads"})],
+    [("Turn this YouTube video into tweets: https://youtube.com/watch?v=abc123", {"generate_twitter_threads"})],
+    [("Nurture this lead: Jane Doe, jane@acme.io, Acme Logistics, VP Operations, acme.io, "
+      "pain points: downtime and manual scheduling, source: webinar.", {"send_lead_for_nurturing"}),
+     ("Was it delivered? Tracking id 3f2a9c1e.", {"get_lead_delivery_status"})],
+    [("Run a campaign: threads for the keywords fleet safety, EV fleets and telematics.",
+      {"generate_twitter_threads_batch"})],
+    [("Reddit ideas for each of these: churn, onboarding, pricing in r/SaaS and r/startups.",
+      {"get_reddit_content_ideas_batch"})],
+    [("Kick off the Google Trends scrape in the background and save it as trends.csv.", {"start_google_trends_job"}),
+     ("Is it done yet? job 9b1deb4d-3b7d-4bad-9bdd-2b0d7b3dcb6d", {"get_job_status"})],
+    [("Start an SEO keyword job for TalentSpark AI, I'll check on it later.", {"start_seo_keywords_job"})],
+    [("Show me search interest trends for 'fleet telematics' over the last year.", {"start_google_trends_job"})],
+    [("Hi! What can you do?", set())],
+    [("Help me plan Q3 marketing for our HR tech product.", set()),
+     ("Let's start with SEO keywords for it, then Reddit ideas in r/humanresources.",
+      {"generate_seo_keywords", "get_reddit_content_ideas"}),
+     ("Yes, do that.", {"generate_seo_keywords", "get_reddit_content_ideas"})],
+]
+
+
+class FakeLlm(BaseLlm):
+    """Records each request and answers with a short text."""
+
+    requests: list = []
+
+    async def generate_content_async(self, llm_request: LlmRequest, stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        self.requests.append(llm_request.model_copy(deep=True))
+        yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text="Sure.")]))
+
+
+def request_size(request: LlmRequest) -> tuple:
+    instruction = request.config.system_instruction or ""
+    declarations = [d for tool in request.config.tools or [] for d in (tool.function_declarations or [])]
+    tool_bytes = sum(len(d.model_dump_json(exclude_none=True).encode("utf-8")) for d in declarations)
+    return len(instruction.encode("utf-8")), tool_bytes, estimate_tokens(instruction), {d.name for d in declarations}
+
+
+async def run_conversations(route: bool) -> list:
+    fake = FakeLlm(model="fake", requests=[])
+    agent = AImpactSuperAgent(route_instructions=route)
+    agent.model = fake
+    runner = InMemoryRunner(agent=agent, app_name="routing-benchmark")
+    turns = []
+    for i, conversation in enumerate(CONVERSATIONS):
+        session = await runner.session_service.create_session(app_name="routing-benchmark", user_id=f"user-{i}")
+        for text, needed in conversation:
+            message = types.Content(role="user", parts=[types.Part(text=text)])
+            async for _ in runner.run_async(user_id=session.user_id, session_id=session.id, new_message=message):
+                pass
+            turns.append((text, needed, request_size(fake.requests[-1])))
+    return turns
+
+
+async def run(args) -> None:
+    logging.getLogger("google_adk").setLevel(logging.ERROR)  # Schema warnings for every declaration
+    full = await run_conversations(route=False)
+    routed = await run_conversations(route=True)
+    print(f"{'query':<60} {'instr B':>8} {'tools B':>8} {'tokens':>7} {'tools':>5}  missing")
+    for (text, needed, (instr, tools, tokens, declared)) in routed:
+        missing = ", ".join(sorted(needed - declared)) or "-"
+        print(f"{text[:58]:<60} {instr:>8} {tools:>8} {tokens:>7} {len(declared):>5}  {missing}")
+    full_bytes = sum(s[0] + s[1] for _, _, s in full)
+    routed_bytes = sum(s[0] + s[1] for _, _, s in routed)
+    full_tokens = sum(s[2] for _, _, s in full) / len(full)
+    routed_tokens = sum(s[2] for _, _, s in routed) / len(routed)
+    misses = sum(bool(needed - s[3]) for _, needed, s in routed)
+    print(f"\nall guidelines: {full_bytes / len(full):,.0f} B per turn, ~{full_tokens:,.0f} instruction tokens")
+    print(f"routed:         {routed_bytes / len(routed):,.0f} B per turn, ~{routed_tokens:,.0f} instruction tokens "
+          f"({1 - routed_bytes / full_bytes:.0%} fewer bytes over {len(routed)} turns)")
+    print(f"turns missing a needed tool: {misses}; routing reasons: {intent_router.metrics()['reasons']}")
+
+    texts = [text for conversation in CONVERSATIONS for text, _ in conversation]
+    started = time.perf_counter()
+    for _ in range(args.iterations):
+        for text in texts:
+            intent_router.route(text)
+    print(f"routing cost: {(time.perf_counter() - started) / (args.iterations * len(texts)) * 1e6:.1f} us per message")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200, help="Rounds of the routing cost measurement.")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Background jobs for long n8n workflows, against the stub's asynchronous SEO workflow.
+
+- turn time: how long the agent turn is held by a synchronous SEO call that takes
+  `--delay` seconds, against `start_seo_keywords_job`, which returns a job ID;
+- polling: `--jobs` jobs whose workflow hands back a status URL. Checks that at most
+  `--concurrency` run at once, that all succeed, and how many status polls they took;
+- callbacks: the same with the callback endpoint served locally; the workflow posts
+  progress and the result instead of being polled. Shows the progress events of one
+  job as they are streamed;
+- expiry: a finished job's result is gone once the store's TTL has passed;
+- across turns: a job started in one `asyncio.run` on its own thread, the way Agent
+  Engine runs each turn, is read back with its result from another.
+
+    python -m benchmarks.jobs --jobs 12 --concurrency 4 --delay 1.0
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from agents.tools.cache import tool_cache
+from agents.tools.job_tools import get_job_status, start_seo_keywords_job, wait_for_job
+from agents.tools.jobs import InMemoryJobStore, job_scheduler, serve_callbacks
+from agents.tools.seo_keyword_generator import generate_seo_keywords
+from benchmarks.stub_webhooks import build_app, free_port, point_tools_at, serve_in_thread
+
+
+def reset_scheduler(concurrency: int, ttl: float = 3600) -> None:
+    job_scheduler.store = InMemoryJobStore(ttl=ttl)
+    job_scheduler.concurrency = concurrency
+    job_scheduler._semaphores.clear()
+    job_scheduler.running = job_scheduler.peak_running = 0
+
+
+async def run_jobs(count: int, timeout: float) -> tuple:
+    started = time.perf_counter()
+    ids = [(await start_seo_keywords_job(product_name=f"Product {i}"))["job_id"] for i in range(count)]
+    reports = await asyncio.gather(*(wait_for_job(job_id, timeout) for job_id in ids))
+    return reports, time.perf_counter() - started
+
+
+async def run(args) -> None:
+    app = build_app(latency=args.delay, job_delay=args.delay)
+    server, base_url = serve_in_thread(app)
+    point_tools_at(base_url)
+    stats = app.state.stats
+    tool_cache.enabled = False
+    job_scheduler.poll_interval = args.poll_interval
+    try:
+        started = time.perf_counter()
+        await generate_seo_keywords(product_name="Sync product")
+        sync_turn = time.perf_counter() - started
+        os.environ["N8N_SEO_WEBHOOK_URL"] = f"{base_url}/seo_async"
+        reset_scheduler(args.concurrency)
+        started = time.perf_counter()
+        job_id = (await start_seo_keywords_job(product_name="Async product"))["job_id"]
+        job_turn = time.perf_counter() - started
+        await wait_for_job(job_id, 60)
+        print(f"turn time: synchronous call {sync_turn * 1000:.0f} ms, starting a job {job_turn * 1000:.2f} ms")
+
+        reset_scheduler(args.concurrency)
+        reports, seconds = await run_jobs(args.jobs, 60)
+        succeeded = sum(r["status"] == "succeeded" for r in reports)
+        print(f"polling:   {succeeded}/{args.jobs} succeeded in {seconds:.2f} s, peak running "
+              f"{job_scheduler.peak_running} (limit {args.concurrency}), {stats['job_polls']} status polls")
+
+        port = free_port()
+        serve_callbacks(port=port)
+        job_scheduler.callback_url = f"http://127.0.0.1:{port}"
+        reset_scheduler(args.concurrency)
+        stream_from = (await start_seo_keywords_job(product_name="Streamed product"))["job_id"]
+        streamed = [event async for event in job_scheduler.events(stream_from)]
+        reports, seconds = await run_jobs(args.jobs, 60)
+        succeeded = sum(r["status"] == "succeeded" for r in reports)
+        print(f"callbacks: {succeeded}/{args.jobs} succeeded in {seconds:.2f} s, peak running "
+              f"{job_scheduler.peak_running}, {stats['job_callbacks']} callbacks, no further polls "
+              f"({stats['job_polls']} in total)")
+        print("  streamed events: " + ", ".join(
+            f"{e['status']}" + (f" {e['progress']:.0%}" if "progress" in e else "") for e in streamed))
+
+        reset_scheduler(args.concurrency, ttl=0.5)
+        job_id = (await start_seo_keywords_job(product_name="Short-lived product"))["job_id"]
+        finished = (await wait_for_job(job_id, 60))["status"]
+        await asyncio.sleep(0.6)
+        print(f"expiry:    {finished} then {(await get_job_status(job_id))['status']} after the 0.5 s TTL")
+        reset_scheduler(args.concurrency)
+        first, second = await asyncio.to_thread(across_turns)
+        print(f"across turns: {first} when the starting turn ended, then {second['status']} "
+              f"with result: {second.get('result') is not None}")
+    finally:
+        server.should_exit = True
+
+
+def across_turns() -> tuple:
+    # Each turn is a fresh asyncio.run, whose loop is closed when it returns
+    started = asyncio.run(start_seo_keywords_job(product_name="Product across turns"))
+    return started["status"], asyncio.run(wait_for_job(started["job_id"], 60))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=12)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--delay", type=float, default=1.0, help="Seconds the stub workflow takes.")
+    parser.add_argument("--poll-interval", type=float, default=0.2)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Batched, durable lead delivery against the stub lead webhooks.
+
+Four checks with `--leads` leads:
+
+- direct vs pipeline: posting every lead on its own (the tool's previous behaviour)
+  against queueing them with the lead pipeline, which posts arrays of up to
+  `--batch-size`. Reports how long the tool call takes, the webhook requests made and the
+  time until every lead was delivered;
+- retries: the batch webhook fails `--failure-rate` of requests with a 503 and every
+  lead must still arrive;
+- restart: a pipeline is dropped mid-delivery and a new one on the same spool file
+  delivers what was left as soon as its spool is opened, with no new submission;
+- turns: each agent turn is its own `asyncio.run`, as under Agent Engine. A lead
+  submitted in one turn is delivered after that turn's loop has closed, and a turn that
+  ends while it is posting a batch itself puts the batch back in the queue.
+
+    python -m benchmarks.lead_pipeline --leads 2000 --batch-size 50 --latency 0.05
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import statistics
+import tempfile
+import time
+
+from agents.tools.lead_pipeline import LeadPipeline
+from agents.tools.webhook_client import webhook_client
+from benchmarks.stub_webhooks import build_app, point_tools_at, serve_in_thread
+
+
+def lead(i: int) -> dict:
+    return {"Full Name": f"Lead {i}", "Email": f"lead{i}@example.com", "Company": "Acme", "Lead Source": "Import"}
+
+
+async def direct(leads: int, concurrency: int) -> tuple:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def send(i):
+        async with semaphore:
+            started = time.perf_counter()
+            response = await webhook_client.apost("lead_nurturing", json=lead(i))
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(send(i) for i in range(leads)))
+    return latencies
+
+
+async def queued(pipeline: LeadPipeline, leads: int) -> tuple:
+    latencies = []
+    ids = []
+    for i in range(leads):
+        started = time.perf_counter()
+        ids.append(await pipeline.submit(lead(i)))
+        latencies.append(time.perf_counter() - started)
+    return latencies, ids
+
+
+async def wait_delivered(pipeline: LeadPipeline, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        counts = pipeline.spool.counts()
+        if not counts.get("queued") and not counts.get("sending"):
+            return
+        await asyncio.sleep(0.05)
+    raise RuntimeError(f"Leads still undelivered: {pipeline.spool.counts()}")
+
+
+def ms(values) -> str:
+    values = sorted(values)
+    return f"p50 {statistics.median(values) * 1000:.2f} ms, p99 {values[int(len(values) * 0.99) - 1] * 1000:.2f} ms"
+
+
+async def run(args, spool_dir: str) -> None:
+    app = build_app(latency=args.latency, lead_failure_rate=0.0)
+    server, base_url = serve_in_thread(app)
+    point_tools_at(base_url)
+    stats = app.state.stats
+    try:
+        started = time.perf_counter()
+        latencies = await direct(args.leads, args.concurrency)
+        print(f"direct:   tool call {ms(latencies)}, {stats['lead_nurturing']} requests, "
+              f"all delivered in {time.perf_counter() - started:.2f} s")
+
+        pipeline = LeadPipeline(os.path.join(spool_dir, "bench.sqlite3"), batch_size=args.batch_size, batch_window=args.window)
+        started = time.perf_counter()
+        latencies, _ = await queued(pipeline, args.leads)
+        await wait_delivered(pipeline, 120)
+        await pipeline.aclose()
+        print(f"pipeline: tool call {ms(latencies)}, {stats['lead_nurturing_batch']} requests, "
+              f"all delivered in {time.perf_counter() - started:.2f} s, received {stats['leads_received']}")
+    finally:
+        server.should_exit = True
+
+    app = build_app(latency=args.latency, lead_failure_rate=args.failure_rate)
+    server, base_url = serve_in_thread(app)
+    point_tools_at(base_url)
+    stats = app.state.stats
+    try:
+        pipeline = LeadPipeline(os.path.join(spool_dir, "retries.sqlite3"), batch_size=args.batch_size,
+                                batch_window=args.window, max_attempts=10, backoff_base=0.05, backoff_max=1.0)
+        await queued(pipeline, args.leads)
+        await wait_delivered(pipeline, 120)
+        await pipeline.aclose()
+        webhook_retries = webhook_client.resilience.metrics().get("lead_nurturing_batch", {}).get("retries", 0)
+        print(f"retries:  {args.failure_rate:.0%} of requests failed, {webhook_retries} retried by the webhook client, "
+              f"{pipeline.batch_failures} batches re-queued by the pipeline, "
+              f"{len(stats['lead_emails'])}/{args.leads} distinct leads delivered, status {pipeline.spool.counts()}")
+    finally:
+        server.should_exit = True
+
+    app = build_app(latency=args.latency)
+    server, base_url = serve_in_thread(app)
+    point_tools_at(base_url)
+    stats = app.state.stats
+    path = os.path.join(spool_dir, "restart.sqlite3")
+    try:
+        first = LeadPipeline(path, batch_size=args.batch_size, batch_window=args.window)
+        await queued(first, args.leads)
+        await asyncio.sleep(args.latency * 2)
+        await first.aclose()  # The process "dies" with batches queued and in flight
+        left = first.spool.counts()
+        # Only opening the spool; its worker must pick up the leftovers without a new submission
+        second = LeadPipeline(path, batch_size=args.batch_size, batch_window=args.window)
+        started = time.monotonic()
+        while time.monotonic() - started < 120:
+            counts = second.metrics()["leads"]
+            if not counts.get("queued") and not counts.get("sending"):
+                break
+            await asyncio.sleep(0.1)
+        await second.aclose()
+        print(f"restart:  left behind {left}, after restart {second.spool.counts()}, "
+              f"{len(stats['lead_emails'])}/{args.leads} distinct leads delivered")
+        delivered, interrupted = await asyncio.to_thread(across_turns, os.path.join(spool_dir, "turns.sqlite3"), args)
+        print(f"turns:    submitted in an ended turn: {delivered}; posting when its turn ended: {interrupted}")
+    finally:
+        server.should_exit = True
+
+
+def across_turns(path: str, args) -> tuple:
+    pipeline = LeadPipeline(path, batch_size=args.batch_size, batch_window=args.window)
+    tracking_id = asyncio.run(pipeline.submit(lead(0)))
+    time.sleep(args.window + args.latency * 10)
+    delivered = asyncio.run(pipeline.status(tracking_id))["status"]
+    # Without the worker, so the turn's own flush is the only one sending
+    asyncio.run(pipeline.aclose())
+    (tracking_id,) = pipeline.spool.add([lead(1)])
+
+    async def ended_turn():
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(pipeline.flush_due(), args.latency / 2)
+
+    asyncio.run(ended_turn())
+    return delivered, pipeline.spool.get(tracking_id)["status"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--leads", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--window", type=float, default=0.2, help="Batch window in seconds.")
+    parser.add_argument("--latency", type=float, default=0.05, help="Stub webhook latency in seconds.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Parallel direct posts.")
+    parser.add_argument("--failure-rate", type=float, default=0.3)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as spool_dir:
+        asyncio.run(run(args, spool_dir))
+
+
+if __name__ == "__main__":
+    main()
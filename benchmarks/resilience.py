@@ -0,0 +1,108 @@
+"""
+Fault injection against the stub Reddit webhook, through `get_reddit_content_ideas`.
+
+- flaky: `--error-rate` of requests fail with a 503. Success rate of the tool without
+  retries and with the default retry policy;
+- dead: every request fails. Requests that reach the webhook with and without a circuit
+  breaker, then the half-open probe that closes it again once the webhook recovers;
+- slow tail: `--slow-rate` of requests take `--slow` seconds. Tool latency percentiles
+  without and with hedging at the webhook's observed p95, and the extra requests sent.
+
+    python -m benchmarks.resilience --calls 200 --error-rate 0.3
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import time
+
+from agents.tools.cache import tool_cache
+from agents.tools.reddit_content_idea_scraper import get_reddit_content_ideas
+from agents.tools.resilience import Resilience
+from agents.tools.webhook_client import webhook_client
+from benchmarks.stub_webhooks import build_app, point_tools_at, serve_in_thread
+
+
+async def call_many(calls: int, concurrency: int, pause: float = 0.0) -> tuple:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    ok = 0
+
+    async def one(i):
+        nonlocal ok
+        async with semaphore:
+            started = time.perf_counter()
+            ideas = await get_reddit_content_ideas(f"topic {i}", "r/marketing")
+            latencies.append(time.perf_counter() - started)
+            ok += bool(ideas)
+            if pause:
+                await asyncio.sleep(pause)
+
+    with contextlib.redirect_stdout(io.StringIO()):  # The tool prints its errors
+        await asyncio.gather(*(one(i) for i in range(calls)))
+    return ok, sorted(latencies)
+
+
+def pct(latencies, q: float) -> str:
+    return f"{latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000:.0f} ms"
+
+
+async def run(args) -> None:
+    app = build_app(latency=args.latency)
+    server, base_url = serve_in_thread(app)
+    point_tools_at(base_url)
+    stats, faults = app.state.stats, app.state.faults
+    tool_cache.enabled = False
+    try:
+        faults["reddit"] = {"error_rate": args.error_rate}
+        for label, policy in (("no retries", Resilience(max_attempts=1, failure_threshold=10**6)),
+                              ("retries", Resilience(backoff_base=0.05, failure_threshold=10**6))):
+            webhook_client.resilience = policy
+            before = stats["reddit"]
+            ok, _ = await call_many(args.calls, args.concurrency)
+            m = policy.metrics()["reddit"]
+            print(f"flaky ({args.error_rate:.0%} 503s), {label:>10}: {ok}/{args.calls} tool calls succeeded, "
+                  f"{stats['reddit'] - before} webhook requests, {m['retries']} retries")
+
+        faults["reddit"] = {"error_rate": 1.0}
+        for label, policy in (("no breaker", Resilience(max_attempts=1, failure_threshold=10**6)),
+                              ("breaker", Resilience(max_attempts=1, failure_threshold=5, reset_timeout=1.0))):
+            webhook_client.resilience = policy
+            before = stats["reddit"]
+            await call_many(args.calls, 1, pause=0.005)
+            m = policy.metrics()["reddit"]
+            print(f"dead webhook, {label:>10}: {stats['reddit'] - before} of {args.calls} calls reached it, "
+                  f"breaker {m['state']}, rejected {m['rejected']}")
+        faults.pop("reddit")
+        await asyncio.sleep(1.0)
+        ok, _ = await call_many(3, 1)
+        print(f"  after recovery: {ok}/3 succeeded, breaker {policy.metrics()['reddit']['state']}, "
+              f"opened {policy.metrics()['reddit']['times_opened']} time(s)")
+
+        faults["reddit"] = {"slow_rate": args.slow_rate, "slow_latency": args.slow}
+        for label, policy in (("no hedging", Resilience()), ("hedged", Resilience(hedge_after=0))):
+            webhook_client.resilience = policy
+            await call_many(40, args.concurrency)  # Warm-up, gives the hedge its latency samples
+            before = stats["reddit"]
+            ok, latencies = await call_many(args.calls, args.concurrency)
+            m = policy.metrics()["reddit"]
+            print(f"slow tail ({args.slow_rate:.0%} take {args.slow:.1f} s), {label:>10}: p50 {pct(latencies, 0.5)}, "
+                  f"p95 {pct(latencies, 0.95)}, p99 {pct(latencies, 0.99)}, "
+                  f"{stats['reddit'] - before - args.calls} extra requests, hedges won {m['hedge_wins']}")
+    finally:
+        server.should_exit = True
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.05, help="Normal stub latency in seconds.")
+    parser.add_argument("--error-rate", type=float, default=0.3)
+    parser.add_argument("--slow-rate", type=float, default=0.05)
+    parser.add_argument("--slow", type=float, default=1.0, help="Latency of the slow requests in seconds.")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
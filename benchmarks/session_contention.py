@@ -0,0 +1,209 @@
+"""
+Session services under thread contention, bulk operations, and a create-race check.
+
+- contention: every thread runs `--ops` operations of a mixed workload (80% get, 15%
+  save, 5% create) over a shared pool of sessions, at each of `--threads`. Compares
+  `InMemorySessionService` with one lock (`shards=1`) against `--shards` lock stripes;
+  reports operations per second and p99 latency;
+- bulk: `--batch` sessions saved, read and deleted one call at a time against the
+  `*_many` methods, on SQLite and in memory;
+- async: the same reads through `asyncio.gather` over `aget_session`;
+- create race: `--race-threads` threads call `create_session` on the same IDs at once.
+  The history of each ID is linearizable if every caller got the session of a single
+  winning call, that call started before every other call on the ID returned, and a
+  later `get_session` still returns it. A check-then-insert dict without locking, the
+  way the in-memory service used to work, is run through the same check to show it
+  catches the race (with a thread switch forced between check and insert, since
+  otherwise the window is rarely hit).
+
+    python -m benchmarks.session_contention --threads 1 4 16 64 --ops 2000
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+from agents.services.sessions import BaseSessionService, DatabaseSessionService, InMemorySessionService, Session
+
+
+class CheckThenInsertSessionService(BaseSessionService):
+    """A plain dict with no locking, for the race check only."""
+
+    def __init__(self):
+        self.sessions: Dict[str, Session] = {}
+
+    def get_session(self, session_id: str) -> Optional[Session]:
+        return self.sessions.get(session_id)
+
+    def create_session(self, session_id: Optional[str] = None, metadata: Optional[Dict[str, Any]] = None) -> Session:
+        session_id = session_id or str(uuid.uuid4())
+        if session_id in self.sessions:
+            return self.sessions[session_id]
+        time.sleep(0)
+        session = self.sessions[session_id] = Session(session_id, metadata)
+        return session
+
+    def save_session(self, session: Session) -> None:
+        self.sessions[session.session_id] = session
+
+    def delete_session(self, session_id: str) -> None:
+        self.sessions.pop(session_id, None)
+
+
+def percentile(values: list, p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def mixed(service: InMemorySessionService, threads: int, ops: int, pool: int) -> tuple:
+    for i in range(pool):
+        service.create_session(f"pool-{i}", {"turns": 0})
+    latencies = [[] for _ in range(threads)]
+    barrier = threading.Barrier(threads + 1)
+
+    def work(t: int):
+        rng = random.Random(t)
+        own = latencies[t]
+        barrier.wait()
+        for i in range(ops):
+            roll = rng.random()
+            started = time.perf_counter()
+            if roll < 0.80:
+                service.get_session(f"pool-{rng.randrange(pool)}")
+            elif roll < 0.95:
+                session = service.get_session(f"pool-{rng.randrange(pool)}")
+                if session is not None:
+                    session.set("turns", i)
+                    service.save_session(session)
+            else:
+                service.create_session(f"new-{t}-{i}", {"turns": 0})
+            own.append(time.perf_counter() - started)
+
+    workers = [threading.Thread(target=work, args=(t,)) for t in range(threads)]
+    for worker in workers:
+        worker.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+    all_latencies = [x for own in latencies for x in own]
+    return len(all_latencies) / elapsed, percentile(all_latencies, 0.99)
+
+
+def contention(args) -> None:
+    print(f"{'threads':>7} {'shards':>6} {'ops/s':>10} {'p99 us':>8}")
+    for threads in args.threads:
+        for shards in (1, args.shards):
+            service = InMemorySessionService(shards=shards)
+            rate, p99 = mixed(service, threads, args.ops, args.pool)
+            print(f"{threads:>7} {shards:>6} {rate:>10,.0f} {p99 * 1e6:>8.1f}")
+
+
+def timed(func, *args) -> float:
+    started = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - started
+
+
+def bulk(args, directory: str) -> None:
+    services = {
+        "sqlite": lambda: DatabaseSessionService({"path": os.path.join(directory, f"bulk-{uuid.uuid4().hex}.sqlite3")}),
+        "in-memory": lambda: InMemorySessionService(),
+    }
+    for name, factory in services.items():
+        service = factory()
+        sessions = [Session(f"bulk-{i}", {"user_id": f"user-{i}", "history": ["x" * 200] * 4}) for i in range(args.batch)]
+        ids = [s.session_id for s in sessions]
+        single = (
+            timed(lambda: [service.save_session(s) for s in sessions]),
+            timed(lambda: [service.get_session(i) for i in ids]),
+            timed(lambda: [service.delete_session(i) for i in ids]),
+        )
+        many = (timed(service.save_many, sessions), timed(service.get_many, ids), timed(service.delete_many, ids))
+        service.save_many(sessions)
+        assert set(service.get_many(ids + ["missing"])) == set(ids)
+        per = [f"{op} {one * 1e6 / args.batch:.1f} -> {all_ * 1e6 / args.batch:.1f}"
+               for op, one, all_ in zip(("save", "get", "delete"), single, many)]
+        print(f"bulk {name:>9}: us per session, one at a time -> *_many: {', '.join(per)}")
+
+        async def gather_reads() -> float:
+            started = time.perf_counter()
+            found = await asyncio.gather(*(service.aget_session(i) for i in ids))
+            assert all(s is not None for s in found)
+            return time.perf_counter() - started
+
+        print(f"async {name:>8}: {args.batch} aget_session via gather {asyncio.run(gather_reads()) * 1000:.1f} ms")
+        if hasattr(service, "close"):
+            service.close()
+
+
+def create_race(service: BaseSessionService, threads: int, keys: int) -> int:
+    """Runs the race; returns how many IDs had a history that is not linearizable."""
+    histories = {f"race-{k}-{uuid.uuid4().hex[:8]}": [] for k in range(keys)}
+    barrier = threading.Barrier(threads)
+
+    def work(t: int):
+        barrier.wait()
+        for session_id, history in histories.items():
+            started = time.perf_counter()
+            session = service.create_session(session_id, {"creator": t})
+            history.append((started, time.perf_counter(), t, session))
+
+    workers = [threading.Thread(target=work, args=(t,)) for t in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    violations = 0
+    for session_id, history in histories.items():
+        creators = {session.metadata["creator"] for _, _, _, session in history}
+        stored = service.get_session(session_id)
+        if len(creators) != 1 or stored is None or stored.metadata["creator"] not in creators:
+            violations += 1
+            continue
+        winner = next(h for h in history if h[2] == stored.metadata["creator"])
+        if winner[0] > min(end for _, end, _, _ in history):
+            violations += 1
+    return violations
+
+
+def races(args, directory: str) -> None:
+    services = {
+        "check-then-insert dict": CheckThenInsertSessionService(),
+        "in-memory, 1 shard": InMemorySessionService(shards=1),
+        f"in-memory, {args.shards} shards": InMemorySessionService(shards=args.shards),
+        "sqlite": DatabaseSessionService({"path": os.path.join(directory, "race.sqlite3")}),
+    }
+    for name, service in services.items():
+        violations = create_race(service, args.race_threads, args.race_keys)
+        print(f"create race {name:>24}: {violations}/{args.race_keys} IDs not linearizable "
+              f"({args.race_threads} threads each)")
+        if hasattr(service, "close"):
+            service.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--ops", type=int, default=2000, help="Operations per thread.")
+    parser.add_argument("--pool", type=int, default=10_000, help="Sessions the mixed workload reads and saves.")
+    parser.add_argument("--shards", type=int, default=16)
+    parser.add_argument("--batch", type=int, default=1000)
+    parser.add_argument("--race-threads", type=int, default=16)
+    parser.add_argument("--race-keys", type=int, default=200)
+    args = parser.parse_args()
+    contention(args)
+    with tempfile.TemporaryDirectory() as directory:
+        bulk(args, directory)
+        races(args, directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Expiry and eviction in `InMemorySessionService`.
+
+- memory: bytes per session with `--sessions` sessions held, against the same session
+  class without slots;
+- cost per operation: create (each one evicting the least recently used session) and
+  get, with 10,000 and with `--sessions` sessions held. Flat numbers mean O(1);
+- limits: idle TTL, absolute TTL, max entries and max bytes on a simulated clock, with
+  the eviction metrics the service reports;
+- sweeper: sessions nobody looks up again are removed by the background sweeper.
+
+    python -m benchmarks.session_eviction --sessions 1000000
+"""
+import argparse
+import gc
+import threading
+import time
+import tracemalloc
+
+from agents.services.sessions import InMemorySessionService, Session
+
+
+class DictSession:
+    """`Session`'s attributes without slots, for comparison."""
+
+    def __init__(self, session_id, metadata=None, created_at=None):
+        self.session_id = session_id
+        self.metadata = metadata if metadata is not None else {}
+        self.created_at = created_at if created_at is not None else time.time()
+        self.last_accessed_at = self.created_at
+        self._dirty = None
+        self._lock = threading.Lock()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def bytes_per_object(cls, count: int) -> float:
+    gc.collect()
+    tracemalloc.start()
+    objects = [cls(f"session-{i:07d}") for i in range(count)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    return size / count
+
+
+def bytes_per_session(count: int) -> float:
+    gc.collect()
+    tracemalloc.start()
+    service = InMemorySessionService(idle_ttl=3600, absolute_ttl=86400, sweep_interval=0)
+    for i in range(count):
+        service.create_session(f"session-{i:07d}")
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del service
+    return size / count
+
+
+def op_costs(held: int, ops: int) -> tuple:
+    service = InMemorySessionService(idle_ttl=3600, max_entries=held, sweep_interval=0)
+    for i in range(held):
+        service.create_session(f"held-{i}")
+    started = time.perf_counter()
+    for i in range(ops):
+        service.create_session(f"new-{i}")
+    create = (time.perf_counter() - started) / ops
+    ids = [f"new-{i}" for i in range(ops)]
+    started = time.perf_counter()
+    for session_id in ids:
+        service.get_session(session_id)
+    get = (time.perf_counter() - started) / ops
+    assert len(service) == held and service.metrics()["evictions"]["max_entries"] == ops
+    return create, get
+
+
+def limits() -> None:
+    clock = FakeClock()
+    service = InMemorySessionService(idle_ttl=60, absolute_ttl=600, max_entries=100, max_bytes=20_000, clock=clock)
+    for i in range(100):
+        service.create_session(f"idle-{i}", {"n": i})
+    clock.now += 61
+    expired = sum(service.get_session(f"idle-{i}") is None for i in range(100))
+    print(f"idle TTL:     {expired}/100 sessions untouched for 61 s are gone")
+
+    keep = service.create_session("kept-alive")
+    for _ in range(11):
+        clock.now += 55
+        service.get_session("kept-alive")
+    print(f"absolute TTL: a session read every 55 s is {'gone' if service.get_session('kept-alive') is None else 'still there'} "
+          f"after {clock.now - keep.created_at:.0f} s (limit 600 s)")
+
+    for i in range(150):
+        service.create_session(f"entry-{i}")
+    print(f"max entries:  150 created, {len(service)} held (limit 100)")
+
+    for i in range(50):
+        service.save_session(Session(f"big-{i}", {"history": "x" * 1000}))
+    m = service.metrics()
+    print(f"max bytes:    {m['bytes']} bytes held (limit 20000), {len(service)} sessions")
+    print(f"metrics:      {m}")
+    service.close()
+
+
+def sweeper() -> None:
+    service = InMemorySessionService(idle_ttl=0.2, sweep_interval=0.1)
+    for i in range(10_000):
+        service.create_session(f"abandoned-{i}")
+    held = len(service)
+    time.sleep(0.5)
+    print(f"sweeper:      {held} sessions abandoned, {len(service)} left after 0.5 s "
+          f"({service.metrics()['sweeps']} sweeps, {service.metrics()['evictions']['idle_ttl']} expired)")
+    service.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=1_000_000)
+    parser.add_argument("--ops", type=int, default=100_000)
+    args = parser.parse_args()
+
+    slotted, plain = bytes_per_object(Session, args.sessions), bytes_per_object(DictSession, args.sessions)
+    print(f"memory:       Session {slotted:.0f} B with slots vs {plain:.0f} B without; "
+          f"{bytes_per_session(args.sessions):.0f} B per session in the service at {args.sessions:,} sessions")
+    for held in (10_000, args.sessions):
+        create, get = op_costs(held, args.ops)
+        print(f"per op:       {held:>9,} held: create+evict {create * 1e6:.2f} us, get {get * 1e6:.2f} us")
+    limits()
+    sweeper()
+
+
+if __name__ == "__main__":
+    main()
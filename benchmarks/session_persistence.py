@@ -0,0 +1,125 @@
+"""
+Delta and write-behind persistence in `DatabaseSessionService`, against full rewrites.
+
+`--sessions` chat sessions hold about `--metadata-kb` KB of metadata each (a profile,
+retrieved documents and earlier history). Each turn reads a session, sets
+`--keys-per-turn` small keys (the routed tools, the turn count, a summary, ...) and
+saves it. There are `--turns` turns, cycling over the sessions, and they run in
+three modes:
+
+- full rewrite: every save writes the whole session, the way saves used to work;
+- delta: every save writes only the keys that changed;
+- write-behind: saves are queued and flushed every `--interval` seconds, and
+  `close()` writes what is left.
+
+For each mode this reports saves per second, bytes the process wrote to the database
+files (from /proc/self/io, where available), and bytes of JSON serialized for values.
+It checks that every mode leaves the same data on disk. It also checks that a process
+which saves in write-behind mode and exits without calling `close()` still has its
+last saves on disk.
+
+    python -m benchmarks.session_persistence --sessions 50 --turns 2000 --metadata-kb 32
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import textwrap
+import time
+from typing import Optional
+
+from agents.services.sessions import DatabaseSessionService
+
+
+def written_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/io") as f:
+            for line in f:
+                if line.startswith("wchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+def make_metadata(i: int, kb: int) -> dict:
+    chunk = max(1, kb * 1024 // 4)
+    return {
+        "user_id": f"user-{i}",
+        "profile": {"company": "FleetIQ", "notes": "n" * (chunk // 4)},
+        "documents": ["d" * 200 for _ in range(chunk // 200)],
+        "history": [{"role": "user", "text": "h" * 200} for _ in range(2 * chunk // 200)],
+        "turn": 0,
+    }
+
+
+def run_mode(mode: str, path: str, args) -> tuple:
+    details = {"path": path}
+    if mode == "write-behind":
+        details["write_behind_seconds"] = args.interval
+    service = DatabaseSessionService(details)
+    ids = [f"session-{i}" for i in range(args.sessions)]
+    for i, session_id in enumerate(ids):
+        service.create_session(session_id, make_metadata(i, args.metadata_kb))
+    before = written_bytes()
+    started = time.perf_counter()
+    for turn in range(args.turns):
+        session = service.get_session(ids[turn % len(ids)])
+        session.set("turn", session.get("turn") + 1)
+        for k in range(args.keys_per_turn - 1):
+            session.set(f"state_{k}", f"turn {turn} value {k}")
+        if mode == "full rewrite":
+            session.mark_dirty()
+        service.save_session(session)
+    service.close()
+    seconds = time.perf_counter() - started
+    after = written_bytes()
+    metrics = service.metrics()
+    reader = DatabaseSessionService({"path": path})
+    state = {session_id: s.metadata for session_id, s in reader.get_many(ids).items()}
+    reader.close()
+    return args.turns / seconds, None if before is None else after - before, metrics, state
+
+
+def exit_without_close(path: str) -> bool:
+    script = textwrap.dedent(f"""
+        from agents.services.sessions import DatabaseSessionService
+        service = DatabaseSessionService({{"path": {path!r}, "write_behind_seconds": 3600}})
+        session = service.create_session("exiting", {{"turn": 0}})
+        for turn in range(1, 51):
+            session.set("turn", turn)
+            service.save_session(session)
+    """)
+    subprocess.run([sys.executable, "-c", script], check=True, cwd=os.getcwd())
+    reader = DatabaseSessionService({"path": path})
+    session = reader.get_session("exiting")
+    reader.close()
+    return session is not None and session.get("turn") == 50
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=2000)
+    parser.add_argument("--metadata-kb", type=int, default=32)
+    parser.add_argument("--keys-per-turn", type=int, default=3)
+    parser.add_argument("--interval", type=float, default=0.05, help="Write-behind flush interval in seconds.")
+    args = parser.parse_args()
+
+    states = []
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"{'mode':>13} {'saves/s':>9} {'written':>12} {'serialized':>12} {'full':>5} {'delta':>6} {'flushes':>8}")
+        for mode in ("full rewrite", "delta", "write-behind"):
+            rate, written, m, state = run_mode(mode, os.path.join(directory, f"{mode.replace(' ', '-')}.sqlite3"), args)
+            states.append(state)
+            shown = "n/a" if written is None else f"{written / 1e6:,.1f} MB"
+            print(f"{mode:>13} {rate:>9,.0f} {shown:>12} {m['bytes_serialized'] / 1e6:>9,.1f} MB "
+                  f"{m['full_writes']:>5} {m['delta_writes']:>6} {m['flushes']:>8}")
+        print(f"same data on disk in every mode: {all(state == states[0] for state in states)}")
+        print(f"write-behind saves survive exit without close(): "
+              f"{exit_without_close(os.path.join(directory, 'exit.sqlite3'))}")
+
+
+if __name__ == "__main__":
+    main()
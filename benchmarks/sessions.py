@@ -0,0 +1,93 @@
+"""
+Throughput and latency of the session services under multi-threaded load.
+
+For each service and thread count, every thread runs `--ops` operations of one kind:
+create (new sessions), get, save (one key changed) and delete (existing sessions).
+Metadata is a realistic chat session of about `--metadata-kb` KB. Reports operations
+per second and p50/p99 latency per operation.
+
+    python -m benchmarks.sessions --threads 1 4 8 --ops 2000
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+from agents.services.sessions import DatabaseSessionService, InMemorySessionService
+
+
+def make_metadata(kb: int) -> dict:
+    turns = max(1, kb * 1024 // 200)
+    return {
+        "user_id": "user-42",
+        "product": "FleetIQ",
+        "history": [{"role": "user" if i % 2 else "model", "text": f"message {i} " + "x" * 160} for i in range(turns)],
+    }
+
+
+def run_op(service, op: str, threads: int, ops: int, metadata: dict) -> tuple:
+    ids = [[f"{op}-{t}-{i}" for i in range(ops)] for t in range(threads)]
+    if op != "create":
+        for thread_ids in ids:
+            for session_id in thread_ids:
+                service.create_session(session_id, dict(metadata))
+    latencies = [[] for _ in range(threads)]
+    barrier = threading.Barrier(threads + 1)
+
+    def work(t: int):
+        own = latencies[t]
+        barrier.wait()
+        for session_id in ids[t]:
+            started = time.perf_counter()
+            if op == "create":
+                service.create_session(session_id, dict(metadata))
+            elif op == "get":
+                service.get_session(session_id)
+            elif op == "save":
+                session = service.get_session(session_id)
+                session.set("last_turn", random.random())
+                service.save_session(session)
+            else:
+                service.delete_session(session_id)
+            own.append(time.perf_counter() - started)
+
+    workers = [threading.Thread(target=work, args=(t,)) for t in range(threads)]
+    for worker in workers:
+        worker.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    seconds = time.perf_counter() - started
+    merged = sorted(x for own in latencies for x in own)
+    return threads * ops / seconds, merged[len(merged) // 2], merged[int(len(merged) * 0.99) - 1]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--ops", type=int, default=2000, help="Operations per thread.")
+    parser.add_argument("--metadata-kb", type=int, default=2)
+    args = parser.parse_args()
+    metadata = make_metadata(args.metadata_kb)
+
+    with tempfile.TemporaryDirectory() as directory:
+        services = {
+            "in-memory": lambda threads: InMemorySessionService(),
+            "sqlite": lambda threads: DatabaseSessionService({"path": os.path.join(directory, f"sessions-{threads}.sqlite3")}),
+        }
+        print(f"{'service':>10} {'threads':>7} {'op':>7} {'ops/s':>10} {'p50':>9} {'p99':>9}")
+        for name, factory in services.items():
+            for threads in args.threads:
+                service = factory(threads)
+                for op in ("create", "get", "save", "delete"):
+                    rate, p50, p99 = run_op(service, op, threads, args.ops, metadata)
+                    print(f"{name:>10} {threads:>7} {op:>7} {rate:>10.0f} {p50 * 1e6:>7.0f}us {p99 * 1e6:>7.0f}us")
+                if hasattr(service, "close"):
+                    service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+A local stand-in for the n8n webhooks the agent tools call.
+
+Every tool's webhook gets a route that waits `latency` seconds (or its own entry in
+`latencies`) and answers with a response shaped like the real workflow's. `build_app`
+also counts requests per route, and can fail a share of lead batches with a 503 to
+exercise retries. Faults can be injected into the JSON routes at run time through
+`app.state.faults`, e.g. `{"reddit": {"error_rate": 0.3, "slow_rate": 0.05,
+"slow_latency": 1.0}}`.
+
+`/seo_async` behaves like an SEO workflow set to respond immediately: it answers 202
+and finishes after `job_delay` seconds. With an X-Job-Callback-Url header it posts
+progress and the result there; without one it returns a `status_url` to poll.
+Run it standalone with:
+
+    uvicorn benchmarks.stub_webhooks:app --port 9002
+"""
+import asyncio
+import os
+import random
+import uuid
+import socket
+import threading
+import time
+
+import httpx
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+# Tool name -> environment variable holding its webhook URL
+WEBHOOK_ENV = {
+    "seo": "N8N_SEO_WEBHOOK_URL",
+    "reddit": "N8N_REDDIT_CONTENT_IDEA_WEBHOOK_URL",
+    "twitter": "N8N_YOUTUBE_TO_TWITTER_WEBHOOK_URL",
+    "lead_nurturing": "N8N_LEADNURTURE_WEBHOOK_URL",
+    "lead_nurturing_batch": "N8N_LEADNURTURE_BATCH_WEBHOOK_URL",
+    "google_trends": "N8N_GTRENDS_WEBHOOK_URL",
+}
+
+
+def _seo(body: dict):
+    return [{"keyword": f"{body.get('product_name', 'product')} keyword {i}"} for i in range(10)]
+
+
+def _reddit(body: dict):
+    return [
+        {"title": f"{keyword.strip()} idea from r/{subreddit.strip()}", "url": f"https://reddit.com/r/{subreddit.strip()}/{keyword.strip().replace(' ', '_')}_{i}"}
+        for i, (keyword, subreddit) in enumerate(
+            (k, s) for k in str(body.get("Keyword", "")).split(",") for s in str(body.get("Subreddit", "")).split(",")
+        )
+    ]
+
+
+def _twitter(body: dict):
+    keyword = body.get("Keyword", "")
+    result = {"video_title": f"All about {keyword}", "video_url": "https://youtube.com/watch?v=stub", "status": "success"}
+    for i in range(1, 4):
+        result[f"thread_{i}_title"] = f"{keyword} thread {i}"
+        result[f"thread_{i}_content"] = f"1/ Why {keyword} matters to {body.get('Target audience', 'you')}..."
+    return result
+
+
+def _trends_csv(rows: int, rows_per_chunk: int = 20000):
+    """Yields the CSV in chunks, so exports of hundreds of MB are never built in memory."""
+    yield "keyword,interest,week,region,trend\n"
+    for start in range(0, rows, rows_per_chunk):
+        yield "".join(
+            f"trend keyword {i},{i % 100},2026-{i % 12 + 1:02d}-{i % 28 + 1:02d},US-{i % 50:02d},{'rising' if i % 3 else 'steady'}\n"
+            for i in range(start, min(rows, start + rows_per_chunk))
+        )
+
+
+def build_app(
+    latency: float = 0.05,
+    trends_rows: int = 1000,
+    latencies: dict = None,
+    lead_failure_rate: float = 0.0,
+    job_delay: float = 2.0,
+) -> Starlette:
+    stats = {name: 0 for name in WEBHOOK_ENV}
+    stats.update(seo_async=0, job_polls=0, job_callbacks=0)
+    jobs = {}  # Stub job ID -> (started_at, request body)
+    stats["leads_received"] = 0
+    stats["lead_emails"] = set()
+    latencies = latencies or {}
+
+    faults = {}  # Route name -> injected faults, changeable while the app runs
+
+    def json_route(name, build):
+        async def handler(request: Request):
+            stats[name] += 1
+            body = await request.json() if await request.body() else {}
+            fault = faults.get(name, {})
+            delay = latencies.get(name, latency)
+            if random.random() < fault.get("slow_rate", 0.0):
+                delay = fault["slow_latency"]
+            if delay:
+                await asyncio.sleep(delay)
+            if random.random() < fault.get("error_rate", 0.0):
+                return JSONResponse({"error": "injected fault"}, status_code=fault.get("status", 503))
+            return JSONResponse(build(body))
+        return Route(f"/{name}", handler, methods=["POST"])
+
+    async def trends(request: Request):
+        stats["google_trends"] += 1
+        delay = latencies.get("google_trends", latency)
+        if delay:
+            await asyncio.sleep(delay)
+        return StreamingResponse(_trends_csv(trends_rows), media_type="text/csv")
+
+    async def lead_batch(request: Request):
+        stats["lead_nurturing_batch"] += 1
+        leads = await request.json()
+        delay = latencies.get("lead_nurturing_batch", latency)
+        if delay:
+            await asyncio.sleep(delay)
+        if random.random() < lead_failure_rate:
+            return JSONResponse({"error": "stub failure"}, status_code=503)
+        stats["leads_received"] += len(leads)
+        stats["lead_emails"].update(lead.get("Email") for lead in leads)
+        return JSONResponse({"ok": True, "received": len(leads)})
+
+    async def seo_async(request: Request):
+        stats["seo_async"] += 1
+        body = await request.json()
+        job_id = uuid.uuid4().hex
+        callback_url = request.headers.get("x-job-callback-url")
+        if callback_url:
+            asyncio.ensure_future(report_by_callback(callback_url, body))
+            return JSONResponse({"job_id": job_id}, status_code=202)
+        jobs[job_id] = (time.monotonic(), body)
+        return JSONResponse({"job_id": job_id, "status_url": f"{str(request.base_url).rstrip('/')}/jobs/{job_id}"}, status_code=202)
+
+    async def report_by_callback(callback_url: str, body: dict):
+        async with httpx.AsyncClient() as client:
+            for step in range(1, 4):
+                await asyncio.sleep(job_delay / 4)
+                stats["job_callbacks"] += 1
+                await client.post(f"{callback_url}/progress", json={"progress": step / 4, "message": f"Step {step} of 4"})
+            await asyncio.sleep(job_delay / 4)
+            stats["job_callbacks"] += 1
+            await client.post(f"{callback_url}/complete", json={"result": _seo(body)})
+
+    async def job_status(request: Request):
+        stats["job_polls"] += 1
+        started_at, body = jobs[request.path_params["job_id"]]
+        elapsed = time.monotonic() - started_at
+        if elapsed >= job_delay:
+            return JSONResponse({"status": "succeeded", "result": _seo(body)})
+        return JSONResponse({"status": "running", "progress": round(elapsed / job_delay, 2), "message": "Generating keywords"})
+
+    app = Starlette(routes=[
+        json_route("seo", _seo),
+        json_route("reddit", _reddit),
+        json_route("twitter", _twitter),
+        json_route("lead_nurturing", lambda body: {"ok": True}),
+        Route("/lead_nurturing_batch", lead_batch, methods=["POST"]),
+        Route("/google_trends", trends, methods=["POST"]),
+        Route("/seo_async", seo_async, methods=["POST"]),
+        Route("/jobs/{job_id}", job_status, methods=["GET"]),
+    ])
+    app.state.stats = stats
+    app.state.faults = faults
+    return app
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def serve_in_thread(app, port: int = None, **config_kwargs) -> tuple:
+    """Starts an ASGI app on a uvicorn server in a daemon thread; returns (server, base_url)."""
+    port = port or free_port()
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", **config_kwargs)
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    deadline = time.monotonic() + 10
+    while not server.started:
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"Server on port {port} did not start in time.")
+        time.sleep(0.01)
+    return server, f"http://127.0.0.1:{port}"
+
+
+def point_tools_at(base_url: str) -> None:
+    """Sets the webhook URL environment variables to the stub's routes."""
+    for name, env in WEBHOOK_ENV.items():
+        os.environ[env] = f"{base_url}/{name}"
+    os.environ.setdefault("N8N_GTRENDS_WEBHOOK_API_KEY", "stub-key")
+
+
+app = build_app(
+    latency=float(os.environ.get("STUB_WEBHOOK_LATENCY", 0.05)),
+    trends_rows=int(os.environ.get("STUB_TRENDS_ROWS", 1000)),
+)
@@ -0,0 +1,91 @@
+"""
+Effect of the tool-result cache on repeated n8n tool calls.
+
+A user session asks for Reddit ideas on the same few keyword sets over and over, with
+the keywords in a different order, case or spacing each time, against a stub webhook
+that takes `--latency` seconds. The session runs with the cache off, with the in-memory
+backend and with the SQLite backend, and the benchmark reports the time spent waiting
+on the tool and the webhook calls made. A final check ages entries past their TTL and
+shows that stale results are still served at once while being refreshed.
+
+    python -m benchmarks.tool_cache --calls 40 --latency 0.3
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from agents.tools.cache import InMemoryCacheBackend, SQLiteCacheBackend, tool_cache
+from agents.tools.reddit_content_idea_scraper import get_reddit_content_ideas
+from agents.tools.webhook_client import webhook_client
+from benchmarks.stub_webhooks import build_app, point_tools_at, serve_in_thread
+
+KEYWORD_SETS = [["fleet tracking", "telematics"], ["route planning"], ["fuel cost", "ev fleet", "maintenance"]]
+
+
+def variant(keywords: list, rng: random.Random) -> str:
+    shuffled = keywords[:]
+    rng.shuffle(shuffled)
+    return ", ".join(k.upper() if rng.random() < 0.3 else f"  {k} " for k in shuffled)
+
+
+async def session(calls: int) -> float:
+    rng = random.Random(0)
+    started = time.perf_counter()
+    for _ in range(calls):
+        await get_reddit_content_ideas(variant(rng.choice(KEYWORD_SETS), rng), "r/logistics, r/trucking")
+    return time.perf_counter() - started
+
+
+async def run(args, stub_stats: dict) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        modes = [
+            ("off", None),
+            ("memory", InMemoryCacheBackend()),
+            ("sqlite", SQLiteCacheBackend(os.path.join(tmp, "cache.sqlite3"))),
+        ]
+        for name, backend in modes:
+            tool_cache.enabled = backend is not None
+            if backend is not None:
+                tool_cache.backend = backend
+            tool_cache.counters.clear()
+            before = stub_stats["reddit"]
+            seconds = await session(args.calls)
+            print(f"{name:>7}: {seconds:.2f} s for {args.calls} calls, webhook calls: {stub_stats['reddit'] - before}")
+            if backend is not None:
+                print(f"         {tool_cache.metrics()}")
+
+        # Age every entry past its TTL but inside the stale window
+        real_clock = tool_cache._clock
+        tool_cache._clock = lambda: real_clock() + 3600 + 60
+        before = stub_stats["reddit"]
+        started = time.perf_counter()
+        await get_reddit_content_ideas(", ".join(KEYWORD_SETS[0]), "r/logistics, r/trucking")
+        stale_seconds = time.perf_counter() - started
+        await asyncio.sleep(args.latency * 2)
+        counters = tool_cache.counters["reddit"]
+        print(f"  stale: served in {stale_seconds * 1000:.1f} ms, stale_hits={counters['stale_hits']}, "
+              f"background refreshes={counters['refreshes']}, webhook calls={stub_stats['reddit'] - before}")
+        tool_cache._clock = real_clock
+    await webhook_client.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.3, help="Seconds each stub webhook call takes.")
+    args = parser.parse_args()
+
+    app = build_app(latency=args.latency)
+    server, base_url = serve_in_thread(app)
+    point_tools_at(base_url)
+    try:
+        asyncio.run(run(args, app.state.stats))
+    finally:
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
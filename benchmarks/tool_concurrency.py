@@ -0,0 +1,108 @@
+"""
+Checks that simultaneous agent sessions do not serialize behind one slow webhook.
+
+`--sessions` sessions share one event loop, as they do in an ADK worker. Each calls
+either the slow Reddit webhook (`--slow` seconds) or the fast Twitter webhook. They run
+three ways:
+
+- blocking: the tools' previous behaviour, a synchronous webhook call made on the loop;
+- async: the async tools as registered on the agent;
+- offloaded: the blocking call moved to the bounded tool thread pool with `run_blocking`.
+
+For each mode it reports wall time, the slowest fast-tool call and the longest the
+event loop went without running a heartbeat. With async tools the wall time stays near
+one slow call, however many sessions there are. Offloaded calls keep the loop free too,
+but share TOOL_THREAD_POOL_SIZE threads, so once slow calls fill the pool the fast ones
+queue behind them.
+
+    python -m benchmarks.tool_concurrency --sessions 16 --slow 1.0
+"""
+import argparse
+import asyncio
+import time
+
+from agents.tools.cache import tool_cache
+from agents.tools.offload import run_blocking
+from agents.tools.reddit_content_idea_scraper import get_reddit_content_ideas
+from agents.tools.webhook_client import webhook_client
+from agents.tools.youtube_to_twitter_thread_generator import generate_twitter_threads
+from benchmarks.stub_webhooks import build_app, point_tools_at, serve_in_thread
+
+
+def blocking_call(name: str, payload: dict):
+    response = webhook_client.post(name, json=payload)
+    response.raise_for_status()
+    return response.json()
+
+
+REDDIT = {"Keyword": "fleet", "Subreddit": "logistics"}
+TWITTER = {"Keyword": "fleet", "Target audience": "ops", "Content type": "Educational"}
+
+
+async def session(mode: str, slow: bool) -> float:
+    started = time.perf_counter()
+    if mode == "blocking":
+        blocking_call("reddit" if slow else "twitter", REDDIT if slow else TWITTER)
+    elif mode == "offloaded":
+        await run_blocking(blocking_call, "reddit" if slow else "twitter", REDDIT if slow else TWITTER)
+    elif slow:
+        await get_reddit_content_ideas("fleet", "r/logistics")
+    else:
+        await generate_twitter_threads("fleet", "ops", "Educational")
+    return time.perf_counter() - started
+
+
+async def heartbeat(stop: asyncio.Event, interval: float = 0.01) -> float:
+    worst = 0.0
+    last = time.perf_counter()
+    while not stop.is_set():
+        await asyncio.sleep(interval)
+        now = time.perf_counter()
+        worst = max(worst, now - last - interval)
+        last = now
+    return worst
+
+
+async def run_mode(mode: str, sessions: int) -> dict:
+    stop = asyncio.Event()
+    beat = asyncio.ensure_future(heartbeat(stop))
+    await asyncio.sleep(0.02)
+    started = time.perf_counter()
+    durations = await asyncio.gather(*(session(mode, slow=(i % 2 == 0)) for i in range(sessions)))
+    wall = time.perf_counter() - started
+    stop.set()
+    return {
+        "wall_s": round(wall, 3),
+        "slowest_fast_call_s": round(max(durations[1::2]), 3),
+        "max_loop_stall_s": round(await beat, 3),
+    }
+
+
+async def run(args) -> None:
+    tool_cache.enabled = False  # Every session must reach the stub
+    # Warm the pools so the first mode does not pay connection setup alone
+    await generate_twitter_threads("warmup", "ops", "Educational")
+    blocking_call("twitter", TWITTER)
+    for mode in ("blocking", "async", "offloaded"):
+        report = await run_mode(mode, args.sessions)
+        print(f"{mode:>10}: " + ", ".join(f"{k}={v}" for k, v in report.items()))
+    await webhook_client.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=16)
+    parser.add_argument("--slow", type=float, default=1.0, help="Seconds the slow (Reddit) webhook takes.")
+    parser.add_argument("--fast", type=float, default=0.02, help="Seconds the fast (Twitter) webhook takes.")
+    args = parser.parse_args()
+
+    server, base_url = serve_in_thread(build_app(latency=args.fast, latencies={"reddit": args.slow}))
+    point_tools_at(base_url)
+    try:
+        asyncio.run(run(args))
+    finally:
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
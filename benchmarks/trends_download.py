@@ -0,0 +1,127 @@
+"""
+Memory use and event-loop stalls while `google_trends_scraper` saves a large export.
+
+The stub Google Trends webhook, in its own process so it is neither traced nor competing
+for the GIL, streams a CSV of about `--mb` megabytes. It is saved two ways:
+
+- buffered: the tool's previous behaviour, the whole body read into `response.text`
+  and written in one go (on the tool thread pool);
+- streamed: the tool as it is now, the body copied to a temporary file chunk by chunk
+  and renamed into place.
+
+For each it reports wall time, peak Python memory traced during the download and the
+longest the event loop went without running a heartbeat, and checks the saved file.
+
+    python -m benchmarks.trends_download --mb 300
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from agents.tools.cache import tool_cache
+from agents.tools.google_trends_scraper import google_trends_scraper
+from agents.tools.offload import run_blocking
+from agents.tools.webhook_client import webhook_client
+from benchmarks.stub_webhooks import free_port, point_tools_at
+
+ROW_BYTES = 48  # Roughly, for the stub's trend rows
+
+
+def _write_text(path: str, text: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+async def buffered(path: str) -> dict:
+    response = await webhook_client.apost("google_trends", headers={"Authorization": "stub-key"})
+    response.raise_for_status()
+    text = response.text
+    await run_blocking(_write_text, path, text)
+    return {"rows": text.count("\n") - 1, "bytes": len(response.content)}
+
+
+async def streamed(path: str) -> dict:
+    return await google_trends_scraper(output_filename=path)
+
+
+async def heartbeat(stop: asyncio.Event, interval: float = 0.01) -> float:
+    worst = 0.0
+    last = time.perf_counter()
+    while not stop.is_set():
+        await asyncio.sleep(interval)
+        now = time.perf_counter()
+        worst = max(worst, now - last - interval)
+        last = now
+    return worst
+
+
+async def measure(download, path: str) -> tuple:
+    stop = asyncio.Event()
+    beat = asyncio.ensure_future(heartbeat(stop))
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        result = await download(path)
+    finally:
+        seconds = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        stop.set()
+    return result, seconds, peak, await beat
+
+
+def start_stub(rows: int) -> tuple:
+    port = free_port()
+    env = dict(os.environ, STUB_WEBHOOK_LATENCY="0", STUB_TRENDS_ROWS=str(rows))
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "benchmarks.stub_webhooks:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return server, f"http://127.0.0.1:{port}"
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError("The stub webhook server did not start in time.")
+
+
+async def run(args) -> None:
+    rows = args.mb * 1024 * 1024 // ROW_BYTES
+    server, base_url = start_stub(rows)
+    point_tools_at(base_url)
+    tool_cache.enabled = False
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            for name, download in (("buffered", buffered), ("streamed", streamed)):
+                path = os.path.join(directory, f"{name}.csv")
+                result, seconds, peak, stall = await measure(download, path)
+                on_disk = os.path.getsize(path)
+                print(f"{name:>8}: {seconds:.2f} s, peak memory {peak / 2**20:.1f} MiB, "
+                      f"longest loop stall {stall * 1000:.0f} ms, {result['rows']} rows, "
+                      f"{on_disk / 2**20:.1f} MiB on disk{'' if on_disk == result['bytes'] else ' (size mismatch!)'}")
+                if name == "streamed":
+                    print(f"          preview: {result['preview'][:2]}")
+                os.remove(path)
+    finally:
+        await webhook_client.aclose()
+        server.terminate()
+        server.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mb", type=int, default=300, help="Approximate size of the CSV export.")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
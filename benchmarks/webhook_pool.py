@@ -0,0 +1,128 @@
+"""
+Connections opened per agent turn: shared webhook pool vs a new client per call.
+
+An "agent turn" here calls the SEO, Reddit and Twitter webhooks from blocking code and
+the lead nurturing and Google Trends webhooks from a coroutine, against the local stub
+webhook server. The turn is run `--turns` times with a fresh client per call (what the
+tools did before) and through the shared `webhook_client`. Connections are counted with
+httpcore's trace hook; against a real n8n host each one is a TCP and a TLS handshake.
+
+The shared pool is then run with each turn on its own event loop in a new thread, as
+Agent Engine runs turns, with a streamed download added; connections should still be
+reused and no per-loop client left open once its loop has finished.
+
+Run from the repository root:
+
+    python -m benchmarks.webhook_pool --turns 50 --latency 0.02
+"""
+import argparse
+import asyncio
+import threading
+import time
+
+import httpx
+
+from agents.tools.webhook_client import WebhookClient, webhook_client
+from benchmarks.stub_webhooks import build_app, point_tools_at, serve_in_thread
+
+PAYLOADS = {
+    "seo": {"product_name": "FleetIQ"},
+    "reddit": {"Keyword": "fleet", "Subreddit": "logistics"},
+    "twitter": {"Keyword": "fleet", "Target audience": "ops", "Content type": "Educational"},
+    "lead_nurturing": {"Full Name": "Ada", "Email": "ada@example.com"},
+    "google_trends": None,
+}
+SYNC_CALLS = ("seo", "reddit", "twitter")
+ASYNC_CALLS = ("lead_nurturing", "google_trends")
+
+
+class ConnectionCounter:
+    def __init__(self):
+        self.opened = 0
+
+    def trace(self, event_name, info):
+        if event_name == "connection.connect_tcp.complete":
+            self.opened += 1
+
+    async def atrace(self, event_name, info):
+        self.trace(event_name, info)
+
+
+async def turn_per_call_clients(counter: ConnectionCounter) -> None:
+    urls = WebhookClient()
+    for name in SYNC_CALLS:
+        with httpx.Client() as client:
+            client.post(urls.url(name), json=PAYLOADS[name], timeout=urls.timeout(name), extensions={"trace": counter.trace}).raise_for_status()
+    for name in ASYNC_CALLS:
+        async with httpx.AsyncClient() as client:
+            response = await client.post(urls.url(name), json=PAYLOADS[name], timeout=urls.timeout(name), extensions={"trace": counter.atrace})
+            response.raise_for_status()
+
+
+async def turn_shared_pool() -> None:
+    for name in SYNC_CALLS:
+        webhook_client.post(name, json=PAYLOADS[name]).raise_for_status()
+    for name in ASYNC_CALLS:
+        (await webhook_client.apost(name, json=PAYLOADS[name])).raise_for_status()
+
+
+async def run(turns: int) -> None:
+    counter = ConnectionCounter()
+    started = time.perf_counter()
+    for _ in range(turns):
+        await turn_per_call_clients(counter)
+    per_call_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for _ in range(turns):
+        await turn_shared_pool()
+    shared_seconds = time.perf_counter() - started
+    stats = webhook_client.stats()
+    await webhook_client.aclose()
+
+    calls = turns * (len(SYNC_CALLS) + len(ASYNC_CALLS))
+    print(f"{turns} turns, {calls} webhook calls")
+    print(f"  per-call clients: {counter.opened} connections, {counter.opened / turns:.2f} per turn, {per_call_seconds / turns * 1000:.1f} ms per turn")
+    print(f"  shared pool:      {stats['connections_opened']} connections, {stats['connections_opened'] / turns:.2f} per turn, {shared_seconds / turns * 1000:.1f} ms per turn")
+    print(f"  handshakes saved per turn: {(counter.opened - stats['connections_opened']) / turns:.2f}")
+    for name, webhook in stats["webhooks"].items():
+        print(f"  {name:>15}: {webhook}")
+
+
+async def turn_own_loop() -> None:
+    await turn_shared_pool()
+    async with webhook_client.astream("google_trends") as response:
+        await response.aread()
+
+
+def separate_loops(turns: int) -> None:
+    before = webhook_client.stats()["connections_opened"]
+    started = time.perf_counter()
+    for _ in range(turns):
+        thread = threading.Thread(target=asyncio.run, args=(turn_own_loop(),))
+        thread.start()
+        thread.join()
+    seconds = time.perf_counter() - started
+    opened = webhook_client.stats()["connections_opened"] - before
+    left_open = sum(not client.is_closed for client in list(webhook_client._async_clients.values())) - 1  # The background loop's
+    print(f"  one loop per turn: {opened} connections, {opened / turns:.2f} per turn, {seconds / turns * 1000:.1f} ms per turn, "
+          f"{left_open} per-loop clients left open")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.02, help="Seconds each stub webhook takes to answer.")
+    args = parser.parse_args()
+
+    server, base_url = serve_in_thread(build_app(latency=args.latency))
+    point_tools_at(base_url)
+    try:
+        asyncio.run(run(args.turns))
+        separate_loops(args.turns)
+    finally:
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()